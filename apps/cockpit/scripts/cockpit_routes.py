@@ -0,0 +1,53 @@
+"""
+Cockpit routes and demo session state shared by the Playwright scripts in
+this directory (screenshot-all-routes.py, soak-routes.py, sse-fanout-bench.py).
+"""
+
+BASE = "http://localhost:5173"
+DATASET = "meridian-demo"
+THEME   = "default"
+
+# The cockpit sets data-route-settled="true" on <html> once the router is idle,
+# no queries are in flight and animations have finished (src/lib/route-settled.ts).
+# Dev server only; production builds need VITE_PORTARIUM_ROUTE_SETTLED_SIGNAL=true.
+SETTLE_TIMEOUT_MS = 10000
+SETTLED_JS = "() => document.documentElement.dataset.routeSettled === 'true'"
+
+ROUTES = [
+    ("00-inbox",                 "/inbox"),
+    ("01-dashboard",             "/dashboard"),
+    ("02-work-items",            "/work-items"),
+    ("03-work-item-detail",      "/work-items/wi-m0001"),
+    ("04-runs",                  "/runs"),
+    ("05-run-detail",            "/runs/run-m0001"),
+    ("06-approvals-pending",     "/approvals"),
+    ("07-approvals-triage",      "/approvals?tab=triage"),
+    ("08-approval-detail",       "/approvals/apr-m0001"),
+    ("09-evidence",              "/evidence"),
+    ("10-workforce",             "/workforce"),
+    ("11-workforce-member",      "/workforce/wfm-m001"),
+    ("12-workforce-queues",      "/workforce/queues"),
+    ("13-config-agents",         "/config/agents"),
+    ("14-config-agent-detail",   "/config/agents/agent-order-router"),
+    ("15-config-adapters",       "/config/adapters"),
+    ("16-config-settings",       "/config/settings"),
+    ("17-explore-observability", "/explore/observability"),
+    ("18-explore-events",        "/explore/events"),
+    ("19-explore-governance",    "/explore/governance"),
+    ("20-explore-objects",       "/explore/objects"),
+    ("21-robotics-robots",       "/robotics/robots"),
+    ("22-robotics-missions",     "/robotics/missions"),
+    ("23-robotics-safety",       "/robotics/safety"),
+    ("24-robotics-gateways",     "/robotics/gateways"),
+]
+
+STORAGE_STATE = {
+    "cookies": [],
+    "origins": [{
+        "origin": BASE,
+        "localStorage": [
+            {"name": "portarium-dataset", "value": DATASET},
+            {"name": "portarium-theme",   "value": THEME},
+        ]
+    }]
+}
@@ -0,0 +1,102 @@
+"""
+Per-route front-end performance profiling for screenshot-all-routes.py --profile.
+
+An init script registers PerformanceObservers before the app boots; once the
+route has settled the page is asked for navigation timing, LCP, CLS, long
+tasks, JS heap and resource counts. Each route is checked against budgets
+(perf-budgets.json) and, optionally, against a previous report.
+"""
+import json
+import os
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf-budgets.json")
+
+# Chromium flag that makes performance.memory report unquantized heap sizes.
+CHROMIUM_ARGS = ["--enable-precise-memory-info"]
+
+# Relative growth over the baseline report that counts as a regression, plus
+# an absolute floor per metric so tiny values do not flap.
+BASELINE_TOLERANCE = 0.2
+BASELINE_SLACK = {
+    "ttfb_ms": 50,
+    "dom_content_loaded_ms": 100,
+    "load_ms": 100,
+    "lcp_ms": 100,
+    "cls": 0.02,
+    "long_tasks": 2,
+    "long_task_total_ms": 50,
+    "js_heap_mb": 5,
+    "requests": 5,
+    "transfer_kb": 50,
+}
+
+INIT_JS = """
+(() => {
+  const perf = { lcp: 0, cls: 0, longTasks: 0, longTaskTotal: 0 };
+  window.__portariumPerf = perf;
+  const observe = (type, onEntry) => {
+    try {
+      new PerformanceObserver((list) => list.getEntries().forEach(onEntry))
+        .observe({ type, buffered: true });
+    } catch (e) { /* entry type not supported */ }
+  };
+  observe('largest-contentful-paint', (e) => { perf.lcp = e.startTime; });
+  observe('layout-shift', (e) => { if (!e.hadRecentInput) perf.cls += e.value; });
+  observe('longtask', (e) => { perf.longTasks += 1; perf.longTaskTotal += e.duration; });
+})();
+"""
+
+COLLECT_JS = """() => {
+  const perf = window.__portariumPerf || {};
+  const nav = performance.getEntriesByType('navigation')[0];
+  const resources = performance.getEntriesByType('resource');
+  const transfer = resources.reduce((sum, r) => sum + (r.transferSize || 0), nav ? nav.transferSize : 0);
+  return {
+    ttfb_ms: nav ? nav.responseStart : null,
+    dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd : null,
+    load_ms: nav ? nav.loadEventEnd : null,
+    lcp_ms: perf.lcp || null,
+    cls: perf.cls || 0,
+    long_tasks: perf.longTasks || 0,
+    long_task_total_ms: perf.longTaskTotal || 0,
+    js_heap_mb: performance.memory ? performance.memory.usedJSHeapSize / 1048576 : null,
+    requests: resources.length + 1,
+    transfer_kb: transfer / 1024,
+  };
+}"""
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        return {r["name"]: r["metrics"] for r in json.load(f)["routes"]}
+
+async def collect(page):
+    metrics = await page.evaluate(COLLECT_JS)
+    return {k: (round(v, 3) if isinstance(v, float) else v) for k, v in metrics.items()}
+
+def budget_for(budgets, name):
+    return {**budgets.get("default", {}), **budgets.get("routes", {}).get(name, {})}
+
+def check(name, metrics, budgets, baseline=None):
+    """Return human-readable violations of the route's budget and baseline."""
+    violations = []
+    for metric, limit in budget_for(budgets, name).items():
+        value = metrics.get(metric)
+        if value is not None and value > limit:
+            violations.append(f"{metric}={value:g} over budget {limit:g}")
+    previous = (baseline or {}).get(name) or {}
+    for metric, before in previous.items():
+        value = metrics.get(metric)
+        if value is None or before is None:
+            continue
+        allowed = before * (1 + BASELINE_TOLERANCE) + BASELINE_SLACK.get(metric, 0)
+        if value > allowed:
+            violations.append(f"{metric}={value:g} regressed from baseline {before:g}")
+    return violations
+
+def write_report(path, routes, budgets):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"budgets": budgets, "routes": routes}, f, indent=2)
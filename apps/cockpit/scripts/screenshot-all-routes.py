@@ -1,97 +1,259 @@
 """
 Screenshot every cockpit route at localhost:5173
-Run: python apps/cockpit/scripts/screenshot-all-routes.py
+Run: python apps/cockpit/scripts/screenshot-all-routes.py [--concurrency N] [--force]
+                                                        [--baseline DIR]
+                                                        [--profile [--profile-baseline REPORT]]
+
+Runs are incremental: a route whose fingerprint (served JS/CSS assets, demo
+dataset, theme and rendered DOM) matches the last run keeps its previous PNG
+instead of being screenshotted again. Pass --force to re-capture every route.
+
+With --baseline, every capture is diffed against DIR/<route>.png (see
+visual_diff.py); scores, changed regions and diff images go into the summary
+and summary.json, and routes above --diff-threshold are reported as changed.
+
+With --profile, each route's navigation timing, LCP, CLS, long tasks, JS heap,
+request count and transferred bytes are written to perf-report.json and
+checked against perf-budgets.json (and --profile-baseline, if given). Routes
+are then visited one at a time, each in a fresh browser context so every load
+starts with a cold HTTP cache, and the script exits non-zero on any violation
+or on any route that crashed before it was measured.
 """
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
 import asyncio
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+import perf_profile
+from cockpit_routes import (
+    BASE, DATASET, THEME, ROUTES, SETTLE_TIMEOUT_MS, SETTLED_JS, STORAGE_STATE,
+)
 
-BASE = "http://localhost:5173"
 OUT  = "apps/cockpit/screenshots"
+MANIFEST = os.path.join(OUT, "manifest.json")
+SUMMARY  = os.path.join(OUT, "summary.json")
+DIFF_OUT = os.path.join(OUT, "diff")
+PERF_REPORT = os.path.join(OUT, "perf-report.json")
 
-ROUTES = [
-    ("00-inbox",                 "/inbox"),
-    ("01-dashboard",             "/dashboard"),
-    ("02-work-items",            "/work-items"),
-    ("03-work-item-detail",      "/work-items/wi-m0001"),
-    ("04-runs",                  "/runs"),
-    ("05-run-detail",            "/runs/run-m0001"),
-    ("06-approvals-pending",     "/approvals"),
-    ("07-approvals-triage",      "/approvals?tab=triage"),
-    ("08-approval-detail",       "/approvals/apr-m0001"),
-    ("09-evidence",              "/evidence"),
-    ("10-workforce",             "/workforce"),
-    ("11-workforce-member",      "/workforce/wfm-m001"),
-    ("12-workforce-queues",      "/workforce/queues"),
-    ("13-config-agents",         "/config/agents"),
-    ("14-config-agent-detail",   "/config/agents/agent-order-router"),
-    ("15-config-adapters",       "/config/adapters"),
-    ("16-config-settings",       "/config/settings"),
-    ("17-explore-observability", "/explore/observability"),
-    ("18-explore-events",        "/explore/events"),
-    ("19-explore-governance",    "/explore/governance"),
-    ("20-explore-objects",       "/explore/objects"),
-    ("21-robotics-robots",       "/robotics/robots"),
-    ("22-robotics-missions",     "/robotics/missions"),
-    ("23-robotics-safety",       "/robotics/safety"),
-    ("24-robotics-gateways",     "/robotics/gateways"),
-]
+def parse_args():
+    parser = argparse.ArgumentParser(description="Screenshot every cockpit route.")
+    parser.add_argument(
+        "-j", "--concurrency",
+        type=int,
+        default=4,
+        help="Number of browser contexts capturing routes in parallel (default: 4).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-capture every route even if its fingerprint is unchanged.",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Directory of baseline PNGs to diff every capture against.",
+    )
+    parser.add_argument(
+        "--diff-threshold",
+        type=float,
+        default=0.001,
+        help="Changed-pixel fraction above which a route counts as changed (default: 0.001).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record per-route performance metrics and enforce budgets.",
+    )
+    parser.add_argument(
+        "--profile-baseline",
+        help="Previous perf-report.json; routes that regress past it fail the run.",
+    )
+    return parser.parse_args()
 
-async def main():
-    os.makedirs(OUT, exist_ok=True)
+def load_manifest():
+    try:
+        with open(MANIFEST, encoding="utf-8") as f:
+            return json.load(f).get("routes", {})
+    except (OSError, ValueError):
+        return {}
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            viewport={"width": 1440, "height": 900},
-            storage_state={
-                "cookies": [],
-                "origins": [{
-                    "origin": BASE,
-                    "localStorage": [
-                        {"name": "portarium-dataset", "value": "meridian-demo"},
-                        {"name": "portarium-theme",   "value": "default"},
-                    ]
-                }]
-            }
+def write_manifest(results):
+    routes = {
+        r["name"]: {
+            "path": r["path"],
+            "fingerprint": r["fingerprint"],
+            "dataset": DATASET,
+            "theme": THEME,
+            "assets": r["assets"],
+            "dom": r["dom"],
+        }
+        for r in results
+        if r["fingerprint"] and r["status"] == "ok"
+    }
+    with open(MANIFEST, "w", encoding="utf-8") as f:
+        json.dump({"routes": routes}, f, indent=2, sort_keys=True)
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+async def capture_route(context, name, path, args, previous):
+    page = await context.new_page()
+    metrics = None
+    if args.profile:
+        await page.add_init_script(perf_profile.INIT_JS)
+    status = "ok"
+    error  = None
+    reused = False
+    assets_hash = dom_hash = fingerprint = None
+
+    # Fingerprint the JS/CSS the route actually loads. Validators (ETag /
+    # Last-Modified) change whenever a module or a hashed bundle changes.
+    assets = {}
+    def on_response(response):
+        if response.request.resource_type in ("script", "stylesheet"):
+            headers = response.headers
+            assets[response.url] = headers.get("etag") or headers.get("last-modified") or ""
+    page.on("response", on_response)
+
+    try:
+        await page.goto(f"{BASE}{path}", wait_until="load", timeout=20000)
+        try:
+            await page.wait_for_function(SETTLED_JS, timeout=SETTLE_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            status = "not-settled"
+
+        body = await page.text_content("body") or ""
+        if "Something went wrong" in body:
+            status = "error-boundary-triggered"
+
+        main_el = await page.query_selector("#main-content")
+        if not main_el:
+            status = f"{status}+missing-main-id"
+
+        if args.profile:
+            metrics = await perf_profile.collect(page)
+
+        assets_hash = sha256(json.dumps(sorted(assets.items())))
+        dom_hash = sha256(await page.content())
+        fingerprint = sha256(json.dumps([assets_hash, DATASET, THEME, dom_hash]))
+
+        out_path = os.path.join(OUT, f"{name}.png")
+        unchanged = previous is not None and previous.get("fingerprint") == fingerprint
+        if unchanged and status == "ok" and not args.force and os.path.exists(out_path):
+            reused = True
+            print(f"  [=]   {name} (unchanged)")
+        else:
+            await page.screenshot(path=out_path, full_page=True)
+            print(f"  [OK]  {name}")
+    except Exception as e:
+        status = "crash"
+        error  = str(e)
+        print(f"  [ERR] {name}: {e}")
+        try:
+            await page.screenshot(path=os.path.join(OUT, f"{name}-ERROR.png"))
+        except:
+            pass
+
+    await page.close()
+
+    diff = None
+    baseline_path = os.path.join(args.baseline, f"{name}.png") if args.baseline else None
+    if baseline_path and status != "crash" and os.path.exists(baseline_path):
+        import visual_diff  # needs NumPy + Pillow, so only loaded with --baseline
+        # NumPy releases the GIL, so diffs overlap with the other workers' captures.
+        diff = await asyncio.to_thread(
+            visual_diff.diff_files,
+            baseline_path,
+            os.path.join(OUT, f"{name}.png"),
+            os.path.join(DIFF_OUT, f"{name}.png"),
         )
+        diff["changed"] = diff["score"] > args.diff_threshold
 
-        results = []
+    return {
+        "name": name, "path": path, "status": status, "error": error,
+        "reused": reused, "fingerprint": fingerprint, "assets": assets_hash, "dom": dom_hash,
+        "diff": diff, "metrics": metrics,
+    }
 
-        for name, path in ROUTES:
-            page = await context.new_page()
-            status = "ok"
-            error  = None
+async def new_context(browser):
+    return await browser.new_context(
+        viewport={"width": 1440, "height": 900},
+        storage_state=STORAGE_STATE,
+    )
 
+async def worker(browser, queue, results, args, manifest):
+    # Each worker owns a context, so storage state never leaks between workers.
+    # Profiled routes each get a fresh one instead: a shared HTTP cache would
+    # serve later routes warm and skew their load metrics against the budgets.
+    context = None if args.profile else await new_context(browser)
+    while True:
+        try:
+            index, (name, path) = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        if args.profile:
+            route_context = await new_context(browser)
             try:
-                await page.goto(f"{BASE}{path}", wait_until="networkidle", timeout=20000)
-                await page.wait_for_timeout(2000)
-
-                body = await page.text_content("body") or ""
-                if "Something went wrong" in body:
-                    status = "error-boundary-triggered"
-
-                main_el = await page.query_selector("#main-content")
-                if not main_el:
-                    status = f"{status}+missing-main-id"
-
-                out_path = os.path.join(OUT, f"{name}.png")
-                await page.screenshot(path=out_path, full_page=True)
-                print(f"  [OK]  {name}")
-            except Exception as e:
-                status = "crash"
-                error  = str(e)
-                print(f"  [ERR] {name}: {e}")
-                try:
-                    await page.screenshot(path=os.path.join(OUT, f"{name}-ERROR.png"))
-                except:
-                    pass
-
-            results.append({"name": name, "path": path, "status": status, "error": error})
-            await page.close()
+                results[index] = await capture_route(route_context, name, path, args, manifest.get(name))
+            finally:
+                await route_context.close()
+        else:
+            results[index] = await capture_route(context, name, path, args, manifest.get(name))
+    if context is not None:
+        await context.close()
 
+async def main():
+    args = parse_args()
+    os.makedirs(OUT, exist_ok=True)
+    manifest = load_manifest()
+    if args.baseline:
+        os.makedirs(DIFF_OUT, exist_ok=True)
+
+    queue = asyncio.Queue()
+    for item in enumerate(ROUTES):
+        queue.put_nowait(item)
+    # Results are slotted by route index so the summary order is deterministic.
+    results = [None] * len(ROUTES)
+    workers = max(1, min(args.concurrency, len(ROUTES)))
+    if args.profile:
+        # Parallel captures compete for CPU and would skew timings.
+        workers = 1
+    started = time.monotonic()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
+            headless=True,
+            args=perf_profile.CHROMIUM_ARGS if args.profile else [],
+        )
+        await asyncio.gather(*(
+            worker(browser, queue, results, args, manifest) for _ in range(workers)
+        ))
         await browser.close()
 
+    write_manifest(results)
+    with open(SUMMARY, "w", encoding="utf-8") as f:
+        json.dump({"routes": results}, f, indent=2)
+
+    perf_failures = []
+    if args.profile:
+        budgets = perf_profile.load_budgets()
+        baseline = perf_profile.load_baseline(args.profile_baseline) if args.profile_baseline else None
+        report = []
+        for r in results:
+            if r["metrics"] is None:
+                # A route that crashed before it could be measured fails the gate.
+                violations = [f"not profiled: {r['status']} ({r['error']})"]
+            else:
+                violations = perf_profile.check(r["name"], r["metrics"], budgets, baseline)
+            report.append({"name": r["name"], "path": r["path"],
+                           "metrics": r["metrics"], "violations": violations})
+            if violations:
+                perf_failures.append((r["name"], violations))
+        perf_profile.write_report(PERF_REPORT, report, budgets)
+
     # Summary
     ok    = [r for r in results if r["status"] == "ok"]
     warn  = [r for r in results if r["status"] not in ("ok", "crash") ]
@@ -99,12 +261,27 @@ async def main():
 
     print("\n-- SUMMARY " + "-" * 40)
     print(f"  OK:    {len(ok)}/{len(results)}")
+    print(f"  Reused: {sum(r['reused'] for r in results)} unchanged route(s)")
+    print(f"  Time:  {time.monotonic() - started:.1f}s with {workers} worker(s)")
     if warn:
         print(f"  Warn:  {len(warn)}  ->  {', '.join(r['name'] for r in warn)}")
     if crash:
         print(f"  Crash: {len(crash)}  ->  {', '.join(r['name'] for r in crash)}")
         for r in crash:
             print(f"       {r['name']}: {r['error']}")
+    if args.baseline:
+        diffed  = [r for r in results if r["diff"]]
+        changed = [r for r in diffed if r["diff"]["changed"]]
+        print(f"  Diff:  {len(diffed)} route(s) vs {args.baseline}, {len(changed)} changed")
+        for r in changed:
+            d = r["diff"]
+            print(f"       {r['name']}: score={d['score']:.4f} regions={len(d['regions'])}"
+                  f"  ->  {d['diff_image']}")
+    if args.profile:
+        print(f"  Perf:  {len(perf_failures)} route(s) over budget/baseline  ->  {PERF_REPORT}")
+        for name, violations in perf_failures:
+            print(f"       {name}: {'; '.join(violations)}")
     print(f"\n  Screenshots saved to: {OUT}/")
+    return 1 if perf_failures else 0
 
-asyncio.run(main())
+sys.exit(asyncio.run(main()))
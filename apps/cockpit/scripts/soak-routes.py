@@ -0,0 +1,206 @@
+"""
+SPA memory-leak soak test across cockpit navigations at localhost:5173
+Run: python apps/cockpit/scripts/soak-routes.py [--iterations N] [--leak-threshold-kb KB]
+
+Keeps one page open and cycles through ROUTES with client-side navigations,
+the way an operator leaves the cockpit open all day. After every visit the
+page is garbage-collected through CDP and JS heap and DOM node counts are
+sampled. The report contains:
+  - the overall heap / DOM-node growth trend (least-squares slope per visit),
+  - per-route retained growth: the mean heap change caused by visiting the
+    route, averaged over all cycles after the warm-up cycle,
+  - before/after heap snapshots for the worst offenders, loadable in the
+    DevTools Memory panel for comparison.
+Exits non-zero when any route retains more than --leak-threshold-kb per visit.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import asyncio
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+from cockpit_routes import BASE, ROUTES, SETTLE_TIMEOUT_MS, SETTLED_JS, STORAGE_STATE
+
+OUT    = "apps/cockpit/screenshots/soak"
+REPORT = os.path.join(OUT, "soak-report.json")
+
+# Client-side navigation: TanStack Router's browser history follows popstate.
+NAVIGATE_JS = """(path) => {
+  window.history.pushState({}, '', path);
+  window.dispatchEvent(new PopStateEvent('popstate', { state: {} }));
+}"""
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Soak-test cockpit navigations for memory leaks.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=2000,
+        help="Total number of route visits (default: 2000).",
+    )
+    parser.add_argument(
+        "--leak-threshold-kb",
+        type=float,
+        default=64,
+        help="Mean retained heap per visit above which a route is reported as leaking (default: 64).",
+    )
+    parser.add_argument(
+        "--snapshots",
+        type=int,
+        default=3,
+        help="Number of worst routes to attach heap snapshots for (default: 3).",
+    )
+    parser.add_argument(
+        "--snapshot-visits",
+        type=int,
+        default=25,
+        help="Extra visits between the before/after heap snapshots (default: 25).",
+    )
+    return parser.parse_args()
+
+def slope(values):
+    """Least-squares slope of values against their index."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    num = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    den = sum((x - mean_x) ** 2 for x in range(n))
+    return num / den
+
+async def visit(page, path):
+    await page.evaluate(NAVIGATE_JS, path)
+    # Let the router flip the signal to busy before waiting for it to settle.
+    await page.evaluate("() => new Promise((r) => requestAnimationFrame(() => requestAnimationFrame(r)))")
+    try:
+        await page.wait_for_function(SETTLED_JS, timeout=SETTLE_TIMEOUT_MS)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+async def sample(cdp):
+    await cdp.send("HeapProfiler.collectGarbage")
+    heap = await cdp.send("Runtime.getHeapUsage")
+    counters = await cdp.send("Memory.getDOMCounters")
+    return {
+        "heap": heap["usedSize"],
+        "nodes": counters["nodes"],
+        "listeners": counters["jsEventListeners"],
+    }
+
+async def heap_snapshot(cdp, path):
+    chunks = []
+    def on_chunk(event):
+        chunks.append(event["chunk"])
+    cdp.on("HeapProfiler.addHeapSnapshotChunk", on_chunk)
+    await cdp.send("HeapProfiler.collectGarbage")
+    await cdp.send("HeapProfiler.takeHeapSnapshot", {"reportProgress": False})
+    cdp.remove_listener("HeapProfiler.addHeapSnapshotChunk", on_chunk)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(chunks))
+    return path
+
+async def main():
+    args = parse_args()
+    os.makedirs(OUT, exist_ok=True)
+    started = time.monotonic()
+
+    samples = []
+    retained = {name: [] for name, _ in ROUTES}
+    unsettled = {name: 0 for name, _ in ROUTES}
+    snapshots = {}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context(
+            viewport={"width": 1440, "height": 900},
+            storage_state=STORAGE_STATE,
+        )
+        page = await context.new_page()
+        cdp = await context.new_cdp_session(page)
+        await cdp.send("HeapProfiler.enable")
+
+        await page.goto(f"{BASE}{ROUTES[0][1]}", wait_until="load", timeout=20000)
+        try:
+            await page.wait_for_function(SETTLED_JS, timeout=SETTLE_TIMEOUT_MS)
+        except PlaywrightTimeoutError:
+            unsettled[ROUTES[0][0]] += 1
+        previous = await sample(cdp)
+
+        for i in range(args.iterations):
+            cycle, index = divmod(i, len(ROUTES))
+            name, path = ROUTES[index]
+            if not await visit(page, path):
+                unsettled[name] += 1
+            current = await sample(cdp)
+            samples.append({"visit": i, "route": name, **current})
+            # The first cycle warms caches and lazily loaded chunks.
+            if cycle > 0:
+                retained[name].append(current["heap"] - previous["heap"])
+            previous = current
+            if (i + 1) % len(ROUTES) == 0:
+                print(f"  cycle {cycle + 1}: heap={current['heap'] / 1048576:.1f} MB nodes={current['nodes']}")
+
+        per_route = []
+        for name, path in ROUTES:
+            deltas = retained[name]
+            mean = sum(deltas) / len(deltas) if deltas else 0.0
+            per_route.append({
+                "name": name,
+                "path": path,
+                "visits": len(deltas),
+                "mean_retained_kb": round(mean / 1024, 2),
+                "unsettled_visits": unsettled[name],
+            })
+        per_route.sort(key=lambda r: r["mean_retained_kb"], reverse=True)
+        leaking = [r for r in per_route if r["mean_retained_kb"] > args.leak_threshold_kb]
+
+        # Before/after snapshots around repeated visits of the worst offenders.
+        route_paths = dict(ROUTES)
+        for r in leaking[:args.snapshots]:
+            name = r["name"]
+            other = ROUTES[0][1] if route_paths[name] != ROUTES[0][1] else ROUTES[1][1]
+            await visit(page, route_paths[name])
+            before = await heap_snapshot(cdp, os.path.join(OUT, f"{name}-before.heapsnapshot"))
+            for _ in range(args.snapshot_visits):
+                await visit(page, other)
+                await visit(page, route_paths[name])
+            after = await heap_snapshot(cdp, os.path.join(OUT, f"{name}-after.heapsnapshot"))
+            snapshots[name] = {"before": before, "after": after}
+
+        await browser.close()
+
+    trend = {
+        "heap_bytes_per_visit": round(slope([s["heap"] for s in samples]), 1),
+        "dom_nodes_per_visit": round(slope([s["nodes"] for s in samples]), 3),
+        "listeners_per_visit": round(slope([s["listeners"] for s in samples]), 3),
+    }
+    with open(REPORT, "w", encoding="utf-8") as f:
+        json.dump({
+            "iterations": args.iterations,
+            "trend": trend,
+            "routes": per_route,
+            "snapshots": snapshots,
+            "samples": samples,
+        }, f, indent=2)
+
+    # Summary
+    print("\n-- SOAK SUMMARY " + "-" * 35)
+    print(f"  Visits: {args.iterations} over {len(ROUTES)} routes in {time.monotonic() - started:.0f}s")
+    print(f"  Trend:  {trend['heap_bytes_per_visit'] / 1024:+.1f} KB heap, "
+          f"{trend['dom_nodes_per_visit']:+.2f} DOM nodes per visit")
+    if leaking:
+        print(f"  Leaks:  {len(leaking)} route(s) over {args.leak_threshold_kb:g} KB/visit")
+        for r in leaking:
+            print(f"       {r['name']}: {r['mean_retained_kb']:+.1f} KB/visit")
+    else:
+        print("  Leaks:  none over threshold")
+    for name, snap in snapshots.items():
+        print(f"  Snapshots for {name}: {snap['before']} -> {snap['after']}")
+    print(f"\n  Report saved to: {REPORT}")
+    return 1 if leaking else 0
+
+sys.exit(asyncio.run(main()))
@@ -0,0 +1,290 @@
+"""
+Multi-user SSE fan-out latency benchmark for the approvals triage view
+Run: python apps/cockpit/scripts/sse-fanout-bench.py [--sessions 1,5,10,25,50]
+                                                    [--rate 2] [--events 20]
+
+Needs the cockpit running against a live control plane, not the mock handlers:
+  VITE_PORTARIUM_API_BASE_URL=http://localhost:8080 VITE_PORTARIUM_ENABLE_MSW=false npm run cockpit:dev
+The control plane is addressed with PORTARIUM_URL, PORTARIUM_WORKSPACE_ID and
+PORTARIUM_BEARER_TOKEN (defaults: http://localhost:8080, ws-local-dev, dev-token).
+
+For every concurrency step, N browser contexts each create a dev session, open
+/approvals?tab=triage and hold their own events:stream connection. Approval
+events are then published at --rate per second by proposing HumanApprove
+agent actions, which the control plane broadcasts as ApprovalRequested.
+Every approval the benchmark created is denied when it exits, even on failure,
+so no bench approvals are left pending in the workspace.
+
+Every page records when it refetched the approvals list and when its DOM last
+changed. For each event and session, latency runs from the moment the propose
+request was sent (an upper bound on the publish time) to the first DOM update
+after the refetch the event triggered. The report lists p50/p90/p99/max per
+step plus events that never reached a session, and flags the first step whose
+p99 exceeds --p99-budget-ms.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import asyncio
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+from cockpit_routes import BASE, SETTLE_TIMEOUT_MS, SETTLED_JS
+
+OUT    = "apps/cockpit/screenshots/sse-fanout"
+REPORT = os.path.join(OUT, "fanout-report.json")
+TRIAGE = "/approvals?tab=triage"
+
+CONTROL_PLANE = os.environ.get("PORTARIUM_URL", "http://localhost:8080")
+WORKSPACE_ID  = os.environ.get("PORTARIUM_WORKSPACE_ID", "ws-local-dev")
+TOKEN         = os.environ.get("PORTARIUM_BEARER_TOKEN", "dev-token")
+
+CLEANUP_RATIONALE = "SSE fan-out benchmark cleanup."
+
+# Installed before the app boots. Times are epoch milliseconds so they compare
+# directly with the publisher's clock (browser and script share the host).
+INIT_JS = """
+(() => {
+  const marks = { fetches: [], mutations: [] };
+  window.__portariumFanout = marks;
+  const now = () => performance.timeOrigin + performance.now();
+  new PerformanceObserver((list) => {
+    for (const e of list.getEntries()) {
+      if (e.name.split('?')[0].endsWith('/approvals')) {
+        marks.fetches.push([performance.timeOrigin + e.startTime, performance.timeOrigin + e.responseEnd]);
+      }
+    }
+  }).observe({ type: 'resource', buffered: true });
+  const start = () => new MutationObserver(() => { marks.mutations.push(now()); })
+    .observe(document.body, { childList: true, subtree: true, characterData: true });
+  if (document.body) start(); else document.addEventListener('DOMContentLoaded', start);
+})();
+"""
+
+RESET_JS   = "() => { const m = window.__portariumFanout; m.fetches.length = 0; m.mutations.length = 0; }"
+COLLECT_JS = "() => window.__portariumFanout"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark approvals SSE fan-out latency.")
+    parser.add_argument(
+        "--sessions",
+        default="1,5,10,25,50",
+        help="Comma-separated concurrency steps (default: 1,5,10,25,50).",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2,
+        help="Approval events published per second (default: 2).",
+    )
+    parser.add_argument(
+        "--events",
+        type=int,
+        default=20,
+        help="Events published per concurrency step (default: 20).",
+    )
+    parser.add_argument(
+        "--drain-seconds",
+        type=float,
+        default=5,
+        help="Time to wait for stragglers after the last event (default: 5).",
+    )
+    parser.add_argument(
+        "--p99-budget-ms",
+        type=float,
+        default=1000,
+        help="p99 latency above which a step counts as past the fan-out limit (default: 1000).",
+    )
+    return parser.parse_args()
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def latencies(published, marks):
+    """
+    Match published events to one session's refetches and DOM updates.
+
+    Returns (latencies_ms, missed). An event is matched to the first approvals
+    refetch that started after it was sent, and to the first DOM mutation after
+    that refetch completed. Refetches are consumed in order, so a burst that
+    coalesces into one refetch shows up as missed events rather than being
+    counted twice.
+    """
+    fetches = sorted(marks["fetches"])
+    mutations = sorted(marks["mutations"])
+    result, missed = [], 0
+    fi = mi = 0
+    for sent in published:
+        while fi < len(fetches) and fetches[fi][0] < sent:
+            fi += 1
+        if fi == len(fetches):
+            missed += 1
+            continue
+        fetched = fetches[fi][1]
+        fi += 1
+        while mi < len(mutations) and mutations[mi] < fetched:
+            mi += 1
+        if mi == len(mutations):
+            missed += 1
+            continue
+        result.append(mutations[mi] - sent)
+    return result, missed
+
+async def open_session(browser):
+    context = await browser.new_context(viewport={"width": 1440, "height": 900})
+    response = await context.request.post(f"{BASE}/auth/dev-session", headers={"X-Portarium-Request": "1"})
+    if not response.ok:
+        await context.close()
+        raise RuntimeError(f"dev session failed with HTTP {response.status}; is the cockpit proxying a dev-auth control plane?")
+    page = await context.new_page()
+    await page.add_init_script(INIT_JS)
+    async with page.expect_response(lambda r: "events:stream" in r.url, timeout=20000):
+        await page.goto(f"{BASE}{TRIAGE}", wait_until="load", timeout=20000)
+    try:
+        await page.wait_for_function(SETTLED_JS, timeout=SETTLE_TIMEOUT_MS)
+    except PlaywrightTimeoutError:
+        pass
+    return context, page
+
+async def publish(api, run_id, seq, created):
+    sent = time.time() * 1000
+    response = await api.post(
+        f"/v1/workspaces/{WORKSPACE_ID}/agent-actions:propose",
+        data={
+            "agentId": "agent-fanout-bench",
+            "actionKind": "tool_call",
+            "toolName": "send_email",
+            # Unique parameters keep the control plane's idempotency dedup out of the way.
+            "parameters": {"to": "ops@example.com", "subject": f"fan-out bench {run_id} #{seq}"},
+            "rationale": "SSE fan-out latency benchmark event.",
+            "executionTier": "HumanApprove",
+            "policyIds": ["default-governance"],
+            "correlationId": f"fanout-{run_id}-{seq}",
+        },
+    )
+    body = await response.json() if response.ok else {}
+    if body.get("approvalId"):
+        created.append(body["approvalId"])
+    if body.get("decision") != "NeedsApproval":
+        raise RuntimeError(f"propose returned HTTP {response.status} {body or await response.text()}")
+    return sent
+
+async def deny_all(api, approval_ids):
+    """Deny the approvals the benchmark created. Returns the IDs left undecided."""
+    failed = []
+    for approval_id in approval_ids:
+        try:
+            response = await api.post(
+                f"/v1/workspaces/{WORKSPACE_ID}/approvals/{approval_id}/decide",
+                data={"decision": "Denied", "rationale": CLEANUP_RATIONALE},
+            )
+            ok = response.ok
+        except Exception:
+            ok = False
+        if not ok:
+            failed.append(approval_id)
+    return failed
+
+async def run_step(browser, api, sessions, args, created):
+    opened = await asyncio.gather(*(open_session(browser) for _ in range(sessions)))
+    pages = [page for _, page in opened]
+    await asyncio.gather(*(page.evaluate(RESET_JS) for page in pages))
+
+    run_id = uuid.uuid4().hex[:8]
+    interval = 1 / args.rate
+    started = time.monotonic()
+    published = []
+    for seq in range(args.events):
+        # Fixed schedule from the step start, so slow requests do not lower the rate.
+        delay = started + seq * interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        published.append(await publish(api, run_id, seq, created))
+    await asyncio.sleep(args.drain_seconds)
+
+    marks = await asyncio.gather(*(page.evaluate(COLLECT_JS) for page in pages))
+    await asyncio.gather(*(context.close() for context, _ in opened))
+
+    samples, missed = [], 0
+    per_session = []
+    for m in marks:
+        values, lost = latencies(published, m)
+        samples.extend(values)
+        missed += lost
+        per_session.append(round(percentile(values, 50), 1) if values else None)
+    stats = {p: percentile(samples, p) for p in (50, 90, 99)}
+    return {
+        "sessions": sessions,
+        "events": len(published),
+        "deliveries": len(samples),
+        "missed": missed,
+        "p50_ms": round(stats[50], 1) if samples else None,
+        "p90_ms": round(stats[90], 1) if samples else None,
+        "p99_ms": round(stats[99], 1) if samples else None,
+        "max_ms": round(max(samples), 1) if samples else None,
+        "session_p50_ms": per_session,
+    }
+
+async def main():
+    args = parse_args()
+    steps = [int(s) for s in args.sessions.split(",") if s.strip()]
+    os.makedirs(OUT, exist_ok=True)
+    results = []
+    limit = None
+    created = []
+
+    async with async_playwright() as p:
+        api = await p.request.new_context(
+            base_url=CONTROL_PLANE,
+            extra_http_headers={"authorization": f"Bearer {TOKEN}"},
+        )
+        try:
+            browser = await p.chromium.launch(headless=True)
+            for sessions in steps:
+                print(f"  {sessions} session(s): publishing {args.events} event(s) at {args.rate:g}/s ...")
+                step = await run_step(browser, api, sessions, args, created)
+                results.append(step)
+                print(f"      p50={step['p50_ms']} p90={step['p90_ms']} p99={step['p99_ms']} "
+                      f"max={step['max_ms']} ms, missed {step['missed']}/{step['events'] * sessions}")
+                if limit is None and (step["p99_ms"] is None or step["p99_ms"] > args.p99_budget_ms):
+                    limit = sessions
+            await browser.close()
+        finally:
+            failed = await deny_all(api, created)
+            print(f"  Denied {len(created) - len(failed)}/{len(created)} bench approval(s)")
+            if failed:
+                print(f"  Could not deny, still pending: {', '.join(failed)}")
+            await api.dispose()
+
+    with open(REPORT, "w", encoding="utf-8") as f:
+        json.dump({
+            "route": TRIAGE,
+            "control_plane": CONTROL_PLANE,
+            "workspace": WORKSPACE_ID,
+            "rate_per_second": args.rate,
+            "p99_budget_ms": args.p99_budget_ms,
+            "steps": results,
+        }, f, indent=2)
+
+    # Summary
+    print("\n-- FAN-OUT SUMMARY " + "-" * 32)
+    print(f"  {'sessions':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'missed':>8}")
+    for s in results:
+        cells = [f"{s[k]:>8}" if s[k] is not None else f"{'-':>8}" for k in ("p50_ms", "p90_ms", "p99_ms", "max_ms")]
+        print(f"  {s['sessions']:>8} {' '.join(cells)} {s['missed']:>8}")
+    if limit is None:
+        print(f"\n  p99 stayed under {args.p99_budget_ms:g} ms up to {steps[-1]} session(s)")
+    else:
+        print(f"\n  p99 exceeded {args.p99_budget_ms:g} ms at {limit} session(s)")
+    print(f"  Report saved to: {REPORT}")
+    return 0
+
+sys.exit(asyncio.run(main()))
@@ -0,0 +1,168 @@
+"""
+Vectorized visual diff for cockpit screenshots.
+
+Compares a screenshot with its baseline using NumPy only:
+  1. Both images are cut into TILE x TILE tiles and compared tile-wise in one
+     vectorized pass over 64-bit words; identical tiles (the vast majority)
+     are skipped.
+  2. Only the remaining tiles get a per-pixel comparison with a per-channel
+     tolerance, which absorbs anti-aliasing and font-rendering noise.
+  3. Changed tiles are grouped into 8-connected regions and each region's
+     bounding box is tightened to its changed pixels.
+
+A full-page 1440-wide capture diffs in milliseconds.
+
+Usage: python apps/cockpit/scripts/visual_diff.py BASELINE.png CURRENT.png [DIFF.png]
+"""
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+TILE = 16
+TOLERANCE = 16  # max per-channel difference still considered equal
+
+def load_rgb(path):
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB"))
+
+def _pad_to(arr, height, width):
+    if arr.shape[0] == height and arr.shape[1] == width:
+        return np.ascontiguousarray(arr)
+    out = np.zeros((height, width, 3), dtype=np.uint8)
+    out[:arr.shape[0], :arr.shape[1]] = arr
+    return out
+
+def _tiles(arr):
+    h, w, _ = arr.shape
+    return arr.reshape(h // TILE, TILE, w // TILE, TILE, 3).swapaxes(1, 2)
+
+def _regions(changed_tiles):
+    """Group changed tiles into 8-connected regions; returns lists of (ty, tx)."""
+    remaining = set(zip(*np.nonzero(changed_tiles)))
+    regions = []
+    while remaining:
+        stack = [remaining.pop()]
+        region = []
+        while stack:
+            ty, tx = stack.pop()
+            region.append((ty, tx))
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    neighbour = (ty + dy, tx + dx)
+                    if neighbour in remaining:
+                        remaining.remove(neighbour)
+                        stack.append(neighbour)
+        regions.append(region)
+    return regions
+
+def diff_arrays(baseline, current, tolerance=TOLERANCE):
+    """
+    Diff two RGB uint8 arrays.
+
+    Returns (score, boxes, mask): the fraction of changed pixels, the changed
+    regions as [x, y, width, height] boxes, and a boolean changed-pixel mask
+    in the coordinates of the larger image (None when nothing changed). Size
+    differences count as changed.
+    """
+    height = max(baseline.shape[0], current.shape[0])
+    width = max(baseline.shape[1], current.shape[1])
+    padded_h = -(-height // TILE) * TILE
+    padded_w = -(-width // TILE) * TILE
+    a = _pad_to(baseline, padded_h, padded_w)
+    b = _pad_to(current, padded_h, padded_w)
+
+    # Area that exists in only one image is always a change.
+    outside = np.ones((padded_h, padded_w), dtype=bool)
+    common_h = min(baseline.shape[0], current.shape[0])
+    common_w = min(baseline.shape[1], current.shape[1])
+    outside[:common_h, :common_w] = False
+    outside[height:, :] = False
+    outside[:, width:] = False
+    outside_tiles = outside.reshape(padded_h // TILE, TILE, padded_w // TILE, TILE).swapaxes(1, 2)
+
+    # Tile prefilter: each tile row is 3 * TILE bytes, compared as uint64
+    # words, so the whole image is checked with a handful of array ops.
+    tiles_h, tiles_w = padded_h // TILE, padded_w // TILE
+    words = 3 * TILE // 8
+    wa = a.reshape(padded_h, tiles_w, 3 * TILE).view(np.uint64)
+    wb = b.reshape(padded_h, tiles_w, 3 * TILE).view(np.uint64)
+    candidates = (wa != wb).reshape(tiles_h, TILE, tiles_w, words).any(axis=(1, 3))
+    candidates |= outside_tiles.any(axis=(2, 3))
+
+    # Per-pixel tolerance check on candidate tiles only. max - min avoids
+    # uint8 wrap-around without widening to a larger dtype.
+    ta, tb = _tiles(a), _tiles(b)
+    sa, sb = ta[candidates], tb[candidates]
+    delta = (np.maximum(sa, sb) - np.minimum(sa, sb)).max(axis=3)
+    tile_masks = (delta > tolerance) | outside_tiles[candidates]
+
+    # Tight extents of the changed pixels inside every candidate tile.
+    rows_any = tile_masks.any(axis=2)
+    cols_any = tile_masks.any(axis=1)
+    changed = rows_any.any(axis=1)
+    extents = np.zeros((tiles_h, tiles_w, 4), dtype=np.int64)
+    extents[candidates] = np.stack([
+        cols_any.argmax(axis=1),
+        rows_any.argmax(axis=1),
+        TILE - 1 - cols_any[:, ::-1].argmax(axis=1),
+        TILE - 1 - rows_any[:, ::-1].argmax(axis=1),
+    ], axis=1)
+    changed_tiles = np.zeros((tiles_h, tiles_w), dtype=bool)
+    changed_tiles[candidates] = changed
+
+    boxes = []
+    for region in _regions(changed_tiles):
+        ys, xs = np.array(region).T
+        ext = extents[ys, xs]
+        x0 = int((xs * TILE + ext[:, 0]).min())
+        y0 = int((ys * TILE + ext[:, 1]).min())
+        x1 = int((xs * TILE + ext[:, 2]).max())
+        y1 = int((ys * TILE + ext[:, 3]).max())
+        boxes.append([x0, y0, x1 - x0 + 1, y1 - y0 + 1])
+    boxes.sort(key=lambda box: (box[1], box[0]))
+
+    score = float(tile_masks.sum()) / float(height * width)
+    mask = None
+    if boxes:
+        mask_tiles = np.zeros((tiles_h, tiles_w, TILE, TILE), dtype=bool)
+        mask_tiles[candidates] = tile_masks
+        mask = mask_tiles.swapaxes(1, 2).reshape(padded_h, padded_w)[:height, :width]
+    return score, boxes, mask
+
+def render_diff(current, mask, boxes):
+    """Dimmed grayscale of the current image with changes in red and boxes outlined."""
+    height, width = mask.shape
+    base = _pad_to(current, height, width)[:height, :width]
+    gray = (base.mean(axis=2) * 0.35 + 160).astype(np.uint8)
+    out = np.repeat(gray[:, :, None], 3, axis=2)
+    out[mask] = (230, 30, 40)
+    for x, y, w, h in boxes:
+        out[y, x:x + w] = out[y + h - 1, x:x + w] = (255, 140, 0)
+        out[y:y + h, x] = out[y:y + h, x + w - 1] = (255, 140, 0)
+    return out
+
+def diff_files(baseline_path, current_path, diff_path=None, tolerance=TOLERANCE):
+    """Diff two PNG files; writes a diff image when something changed."""
+    started = time.perf_counter()
+    current = load_rgb(current_path)
+    score, boxes, mask = diff_arrays(load_rgb(baseline_path), current, tolerance)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if diff_path and boxes:
+        Image.fromarray(render_diff(current, mask, boxes)).save(diff_path, compress_level=1)
+    return {
+        "score": round(score, 6),
+        "regions": boxes,
+        "diff_image": diff_path if boxes else None,
+        "elapsed_ms": round(elapsed_ms, 1),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(2)
+    result = diff_files(*sys.argv[1:])
+    print(f"score={result['score']} regions={len(result['regions'])} ({result['elapsed_ms']} ms)")
+    for box in result["regions"]:
+        print(f"  x={box[0]} y={box[1]} w={box[2]} h={box[3]}")
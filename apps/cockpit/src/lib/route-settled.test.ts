@@ -0,0 +1,138 @@
+// @vitest-environment jsdom
+
+import { QueryClient } from '@tanstack/react-query';
+import { afterEach, describe, expect, it, vi } from 'vitest';
+
+import {
+  ROUTE_SETTLED_ATTRIBUTE,
+  ROUTE_SETTLED_EVENT,
+  installRouteSettledSignal,
+  shouldInstallRouteSettledSignal,
+  type RouteSettledRouter,
+} from './route-settled';
+
+type RouterEvent = 'onBeforeNavigate' | 'onResolved';
+
+function createFakeRouter() {
+  const listeners = new Map<RouterEvent, Set<() => void>>();
+  const state = { status: 'idle', isLoading: false, location: { href: '/inbox' } };
+  const router: RouteSettledRouter = {
+    state,
+    subscribe(eventType, fn) {
+      const set = listeners.get(eventType) ?? new Set();
+      set.add(fn);
+      listeners.set(eventType, set);
+      return () => set.delete(fn);
+    },
+  };
+  const emit = (eventType: RouterEvent) => listeners.get(eventType)?.forEach((fn) => fn());
+  return { router, state, emit };
+}
+
+function settledAttribute(): string | null {
+  return document.documentElement.getAttribute(ROUTE_SETTLED_ATTRIBUTE);
+}
+
+describe('route settled signal', () => {
+  afterEach(() => {
+    vi.useRealTimers();
+  });
+
+  it('is installed in dev builds and in production only when opted in', () => {
+    expect(shouldInstallRouteSettledSignal({ DEV: true })).toBe(true);
+    expect(shouldInstallRouteSettledSignal({ DEV: false })).toBe(false);
+    expect(
+      shouldInstallRouteSettledSignal({ DEV: false, VITE_PORTARIUM_ROUTE_SETTLED_SIGNAL: 'true' }),
+    ).toBe(true);
+  });
+
+  it('marks the root settled after the quiet window', () => {
+    vi.useFakeTimers();
+    const { router } = createFakeRouter();
+    const stop = installRouteSettledSignal({ router, queryClient: new QueryClient(), quietMs: 50 });
+    const onSettled = vi.fn();
+    document.documentElement.addEventListener(ROUTE_SETTLED_EVENT, onSettled);
+    try {
+      expect(settledAttribute()).toBe('false');
+      vi.advanceTimersByTime(50);
+      expect(settledAttribute()).toBe('true');
+      expect(onSettled).toHaveBeenCalledOnce();
+    } finally {
+      document.documentElement.removeEventListener(ROUTE_SETTLED_EVENT, onSettled);
+      stop();
+    }
+    expect(settledAttribute()).toBeNull();
+  });
+
+  it('stays busy while a navigation is pending and settles once it resolves', () => {
+    vi.useFakeTimers();
+    const { router, state, emit } = createFakeRouter();
+    const stop = installRouteSettledSignal({ router, queryClient: new QueryClient(), quietMs: 50 });
+    try {
+      vi.advanceTimersByTime(50);
+      state.status = 'pending';
+      emit('onBeforeNavigate');
+      expect(settledAttribute()).toBe('false');
+
+      vi.advanceTimersByTime(200);
+      expect(settledAttribute()).toBe('false');
+
+      state.status = 'idle';
+      state.location = { href: '/runs' };
+      emit('onResolved');
+      vi.advanceTimersByTime(50);
+      expect(settledAttribute()).toBe('true');
+    } finally {
+      stop();
+    }
+  });
+
+  it('waits for in-flight queries to finish', async () => {
+    vi.useFakeTimers();
+    const { router } = createFakeRouter();
+    const queryClient = new QueryClient();
+    const stop = installRouteSettledSignal({ router, queryClient, quietMs: 50 });
+    try {
+      let resolveQuery: (value: string) => void = () => {};
+      const pending = queryClient.fetchQuery({
+        queryKey: ['runs'],
+        queryFn: () => new Promise<string>((resolve) => (resolveQuery = resolve)),
+      });
+      vi.advanceTimersByTime(200);
+      expect(settledAttribute()).toBe('false');
+
+      resolveQuery('done');
+      await pending;
+      vi.advanceTimersByTime(50);
+      expect(settledAttribute()).toBe('true');
+    } finally {
+      stop();
+    }
+  });
+
+  it('settles once a running Web Animations API animation finishes', async () => {
+    vi.useFakeTimers();
+    let finish: () => void = () => {};
+    const animation = {
+      playState: 'running',
+      effect: { getTiming: () => ({ iterations: 1 }) },
+      finished: new Promise<void>((resolve) => (finish = resolve)),
+    } as unknown as Animation;
+    document.getAnimations = () => [animation];
+    const { router } = createFakeRouter();
+    const stop = installRouteSettledSignal({ router, queryClient: new QueryClient(), quietMs: 50 });
+    try {
+      vi.advanceTimersByTime(200);
+      expect(settledAttribute()).toBe('false');
+
+      (animation as { playState: string }).playState = 'finished';
+      finish();
+      await animation.finished;
+      vi.advanceTimersByTime(50);
+      expect(settledAttribute()).toBe('true');
+    } finally {
+      stop();
+      delete (document as { getAnimations?: unknown }).getAnimations;
+    }
+  });
+});
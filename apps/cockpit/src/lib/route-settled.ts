@@ -0,0 +1,154 @@
+import type { QueryClient } from '@tanstack/react-query';
+
+import { cockpitFlagEnabled } from './cockpit-runtime';
+
+/**
+ * "Route settled" readiness signal for automation (screenshots, profiling, e2e).
+ *
+ * The root element carries `data-route-settled="true"` once the router is idle,
+ * no queries or mutations are in flight, and no finite animations are running,
+ * and has stayed that way for a short quiet window. It flips to `"false"` as
+ * soon as any of those becomes busy again. Each transition to settled also
+ * dispatches `portarium:route-settled` on the root element.
+ *
+ * CSS animations and transitions, and Web Animations API animations running
+ * when readiness is checked, are waited for. A WAAPI animation started after
+ * the route settled fires no DOM event, so it does not flip the root back to
+ * busy.
+ *
+ * Installed in dev builds only, or when VITE_PORTARIUM_ROUTE_SETTLED_SIGNAL
+ * opts a production build in (e.g. to profile a preview build).
+ */
+export const ROUTE_SETTLED_ATTRIBUTE = 'data-route-settled';
+export const ROUTE_SETTLED_EVENT = 'portarium:route-settled';
+
+const ROUTE_SETTLED_QUIET_MS = 100;
+const ANIMATION_EVENTS = [
+  'animationstart',
+  'animationend',
+  'animationcancel',
+  'transitionstart',
+  'transitionend',
+  'transitioncancel',
+];
+
+export interface RouteSettledRouter {
+  readonly state: {
+    readonly status: string;
+    readonly isLoading: boolean;
+    readonly location: { readonly href: string };
+  };
+  subscribe(eventType: 'onBeforeNavigate' | 'onResolved', fn: () => void): () => void;
+}
+
+export type RouteSettledQueryClient = Pick<
+  QueryClient,
+  'isFetching' | 'isMutating' | 'getQueryCache' | 'getMutationCache'
+>;
+
+export interface RouteSettledOptions {
+  readonly router: RouteSettledRouter;
+  readonly queryClient: RouteSettledQueryClient;
+  readonly root?: HTMLElement;
+  readonly quietMs?: number;
+}
+
+interface RouteSettledEnvLike {
+  readonly DEV?: boolean;
+  readonly VITE_PORTARIUM_ROUTE_SETTLED_SIGNAL?: string;
+}
+
+export function shouldInstallRouteSettledSignal(
+  env: RouteSettledEnvLike = import.meta.env,
+): boolean {
+  return env.DEV === true || cockpitFlagEnabled(env.VITE_PORTARIUM_ROUTE_SETTLED_SIGNAL, false);
+}
+
+function runningFiniteAnimations(doc: Document): Animation[] {
+  if (typeof doc.getAnimations !== 'function') return [];
+  return doc.getAnimations().filter((animation) => {
+    if (animation.playState !== 'running') return false;
+    // Spinners and skeleton pulses loop forever and must not block readiness.
+    const iterations = animation.effect?.getTiming().iterations ?? 1;
+    return Number.isFinite(iterations);
+  });
+}
+
+export function isRouteSettled(
+  router: RouteSettledRouter,
+  queryClient: RouteSettledQueryClient,
+  doc: Document,
+): boolean {
+  if (router.state.status !== 'idle' || router.state.isLoading) return false;
+  if (queryClient.isFetching() > 0 || queryClient.isMutating() > 0) return false;
+  return runningFiniteAnimations(doc).length === 0;
+}
+
+export function installRouteSettledSignal(options: RouteSettledOptions): () => void {
+  const { router, queryClient } = options;
+  const root = options.root ?? document.documentElement;
+  const doc = root.ownerDocument;
+  const quietMs = options.quietMs ?? ROUTE_SETTLED_QUIET_MS;
+  let quietTimer: ReturnType<typeof setTimeout> | undefined;
+  let stopped = false;
+  // WAAPI animations fire no DOM events, so re-check when each one ends.
+  const watchedAnimations = new WeakSet<Animation>();
+
+  const markBusy = () => {
+    if (quietTimer !== undefined) clearTimeout(quietTimer);
+    quietTimer = undefined;
+    root.setAttribute(ROUTE_SETTLED_ATTRIBUTE, 'false');
+  };
+
+  const watchAnimations = () => {
+    for (const animation of runningFiniteAnimations(doc)) {
+      if (watchedAnimations.has(animation)) continue;
+      watchedAnimations.add(animation);
+      animation.finished.then(check, check);
+    }
+  };
+
+  const check = () => {
+    if (stopped) return;
+    if (!isRouteSettled(router, queryClient, doc)) {
+      watchAnimations();
+      markBusy();
+      return;
+    }
+    if (quietTimer !== undefined || root.getAttribute(ROUTE_SETTLED_ATTRIBUTE) === 'true') return;
+    quietTimer = setTimeout(() => {
+      quietTimer = undefined;
+      if (!isRouteSettled(router, queryClient, doc)) {
+        watchAnimations();
+        markBusy();
+        return;
+      }
+      root.setAttribute(ROUTE_SETTLED_ATTRIBUTE, 'true');
+      root.dispatchEvent(
+        new CustomEvent(ROUTE_SETTLED_EVENT, { detail: { href: router.state.location.href } }),
+      );
+    }, quietMs);
+  };
+
+  const unsubscribers = [
+    router.subscribe('onBeforeNavigate', markBusy),
+    router.subscribe('onResolved', check),
+    queryClient.getQueryCache().subscribe(check),
+    queryClient.getMutationCache().subscribe(check),
+  ];
+  for (const eventType of ANIMATION_EVENTS) {
+    doc.addEventListener(eventType, check, true);
+  }
+  markBusy();
+  check();
+
+  return () => {
+    stopped = true;
+    if (quietTimer !== undefined) clearTimeout(quietTimer);
+    for (const unsubscribe of unsubscribers) unsubscribe();
+    for (const eventType of ANIMATION_EVENTS) {
+      doc.removeEventListener(eventType, check, true);
+    }
+    root.removeAttribute(ROUTE_SETTLED_ATTRIBUTE);
+  };
+}
@@ -2,7 +2,12 @@ import { StrictMode } from 'react';
 import { createRoot } from 'react-dom/client';
 import { RouterProvider } from '@tanstack/react-router';
 import { router } from './router';
-import { hydrateQueryCacheFromStorage, startQueryCachePersistence } from './lib/query-client';
+import {
+  hydrateQueryCacheFromStorage,
+  queryClient,
+  startQueryCachePersistence,
+} from './lib/query-client';
+import { installRouteSettledSignal, shouldInstallRouteSettledSignal } from './lib/route-settled';
 import { getCockpitDataRetentionPolicy } from './lib/cockpit-data-retention';
 import { shouldEnableCockpitMocks } from './lib/cockpit-runtime';
 import {
@@ -104,6 +109,9 @@ async function bootstrap() {
       <RouterProvider router={router} />
     </StrictMode>,
   );
+  const stopRouteSettledSignal = shouldInstallRouteSettledSignal()
+    ? installRouteSettledSignal({ router, queryClient })
+    : () => {};
 
   if (!import.meta.env.DEV) {
     await registerCockpitPwa({
@@ -141,6 +149,7 @@ async function bootstrap() {
   if (import.meta.hot) {
     import.meta.hot.dispose(() => {
       stopPersist();
+      stopRouteSettledSignal();
     });
   }
 }
@@ -9,6 +9,7 @@ interface ImportMetaEnv {
   readonly VITE_PORTARIUM_SHOW_ADVANCED_TRIAGE?: string;
   readonly VITE_PORTARIUM_ENABLE_LIVE_OFFLINE_CACHE?: string;
   readonly VITE_DEMO_MODE?: string;
+  readonly VITE_PORTARIUM_ROUTE_SETTLED_SIGNAL?: string;
   readonly VITE_COCKPIT_LOCAL_EXTENSION_ALLOW_DIRS?: string;
   readonly VITE_COCKPIT_LOCAL_EXTENSION_ALIASES?: string;
   readonly VITE_COCKPIT_ENABLE_LOCAL_EXTENSIONS?: string;
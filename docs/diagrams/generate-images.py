@@ -3,6 +3,43 @@
 Usage examples:
   python docs/diagrams/generate-images.py
   python docs/diagrams/generate-images.py --dotenv D:\\legate\\.env
+  python docs/diagrams/generate-images.py --concurrency 8 --max-rps 2
+
+Prompts are generated concurrently by a small worker pool. Each worker keeps
+its HTTP connection open between requests, and all workers share one request
+scheduler that spaces requests to --max-rps and pauses everyone when the API
+answers 429/503 with Retry-After. Transient failures are retried with
+exponential backoff. When Gemini returns no image, the Imagen fallback is
+queued on the same pool instead of blocking the remaining prompts.
+
+Generated images are cached by content: each prompt's cache key is a hash of
+the exact request bodies (full prompt, model, temperature, generation and
+Imagen fallback parameters). The key is recorded per item in
+generated-manifest.json, and images are kept in generated/.cache/ named by key,
+so an unchanged prompt is never regenerated (even after reordering PROMPTS),
+while any edit to a prompt's text, model or parameters always is. Cache entries
+not used for --cache-max-age-days, or beyond --cache-max-entries
+(least-recently used first), are evicted at the end of a run. --overwrite
+ignores the cache and regenerates everything.
+
+Responses are never held in memory whole: the JSON body is scanned as it
+arrives, and the first inlineData.data / bytesBase64Encoded string is
+base64-decoded in chunks straight into a file, so peak memory stays at a few
+read buffers whatever the image size.
+
+After generation, every image gets resized WebP (and, where Pillow supports
+it, AVIF) derivatives under generated/derived/, encoded in parallel by a
+process pool and named by the source image's SHA-256, so unchanged images are
+never re-encoded. The derivatives are recorded per item in the manifest, and
+preview-generated.html serves them through <picture>/srcset so the preview
+grid loads thumbnails instead of full-size PNGs. This stage needs Pillow and is
+skipped with a note when it is not installed (or with --no-derivatives).
+
+To try the pipeline without a key or quota, run the local stand-in API (in a
+scratch checkout: --overwrite rewrites generated/ and the manifest):
+  python docs/diagrams/image-api-standin.py --port 8765 &
+  GEMINI_API_KEY=test python docs/diagrams/generate-images.py \\
+    --api-base http://127.0.0.1:8765/v1beta --overwrite
 
 Environment variables accepted for API key:
   GEMINI_API_KEY, GOOGLE_API_KEY, GOOGLE_NANO_BANANA_API_KEY
@@ -11,24 +48,44 @@ Environment variables accepted for API key:
 from __future__ import annotations
 
 import argparse
-import base64
+import binascii
+import hashlib
+import http.client
 import json
 import os
+import random
 import re
+import shutil
+import tempfile
 import textwrap
+import threading
 import time
-import urllib.error
-import urllib.request
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, TypeVar
+from urllib.parse import urlsplit
 
 ROOT = Path(__file__).resolve().parent
 OUT_DIR = ROOT / "generated"
+CACHE_DIR = OUT_DIR / ".cache"
+DERIVED_DIR = OUT_DIR / "derived"
 MANIFEST_PATH = ROOT / "generated-manifest.json"
 PREVIEW_PATH = ROOT / "preview-generated.html"
 API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+IMAGEN_FALLBACK_MODEL = "imagen-4.0-generate-001"
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+STREAM_CHUNK_BYTES = 64 * 1024
+DERIVATIVE_WIDTHS = (480, 960, 1600)
+DERIVATIVE_ENCODERS = {
+    "avif": {"quality": 55, "speed": 6},
+    "webp": {"quality": 80, "method": 5},
+}
+PREVIEW_SIZES = "(max-width: 760px) 100vw, 50vw"
+
+T = TypeVar("T")
 
 BASE_PROMPT = textwrap.dedent(
     """
@@ -141,6 +198,58 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Overwrite existing generated files if present.",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of requests in flight at once (default: 4).",
+    )
+    parser.add_argument(
+        "--max-rps",
+        type=float,
+        default=1.0,
+        help="Maximum request starts per second across all workers; 0 disables (default: 1).",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=4,
+        help="Retries per request on 429/5xx and connection errors (default: 4).",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=180,
+        help="Socket timeout per request in seconds (default: 180).",
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=64,
+        help="Cached images to keep; least-recently used are evicted first (default: 64).",
+    )
+    parser.add_argument(
+        "--cache-max-age-days",
+        type=float,
+        default=90,
+        help="Evict cached images not used for this many days (default: 90).",
+    )
+    parser.add_argument(
+        "--no-derivatives",
+        action="store_true",
+        help="Skip thumbnail/WebP/AVIF derivatives for the preview page.",
+    )
+    parser.add_argument(
+        "--derivative-workers",
+        type=int,
+        default=0,
+        help="Processes encoding derivatives (default: CPU count).",
+    )
+    parser.add_argument(
+        "--api-base",
+        default=API_BASE,
+        help="API base URL; point at the local stand-in server for testing.",
+    )
     return parser.parse_args()
 
 
@@ -188,86 +297,602 @@ def _ext_for_mime(mime: str) -> str:
     return "bin"
 
 
-def _request_json(url: str, body: dict, timeout: int = 180) -> dict:
-    payload = json.dumps(body).encode("utf-8")
-    req = urllib.request.Request(
-        url=url,
-        data=payload,
-        method="POST",
-        headers={"Content-Type": "application/json"},
-    )
-    with urllib.request.urlopen(req, timeout=timeout) as response:
-        return json.loads(response.read())
+class ApiError(RuntimeError):
+    """Non-retryable HTTP failure, or a retryable one that ran out of attempts."""
 
+    def __init__(self, status: int, body: str) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.body = body
 
-def _extract_images_from_generate_content(data: dict) -> list[tuple[str, str]]:
-    images: list[tuple[str, str]] = []
-    for candidate in data.get("candidates", []):
-        content = candidate.get("content", {})
-        for part in content.get("parts", []):
-            inline = part.get("inlineData")
-            if not inline:
+
+def _parse_retry_after(headers: http.client.HTTPMessage, body: bytes) -> float | None:
+    """Seconds to wait from a Retry-After header or a google.rpc.RetryInfo detail."""
+    value = headers.get("Retry-After")
+    if value:
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    try:
+        details = json.loads(body).get("error", {}).get("details", [])
+    except (ValueError, AttributeError):
+        return None
+    for detail in details:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                pass
+    return None
+
+
+class ApiClient:
+    """Thread-safe JSON client with per-thread keep-alive connections.
+
+    Every request first takes a slot from a shared scheduler, which spaces
+    request starts to ``max_rps`` and is pushed back for all threads when the
+    API asks for a pause via Retry-After.
+    """
+
+    def __init__(
+        self,
+        api_base: str,
+        api_key: str,
+        *,
+        max_rps: float = 1.0,
+        retries: int = 4,
+        timeout: float = 180,
+    ) -> None:
+        parts = urlsplit(api_base)
+        self._https = parts.scheme == "https"
+        self._netloc = parts.netloc
+        self._prefix = parts.path.rstrip("/")
+        self._api_key = api_key
+        self._interval = 1.0 / max_rps if max_rps > 0 else 0.0
+        self._retries = retries
+        self._timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            conn = cls(self._netloc, timeout=self._timeout)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _wait_turn(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _pause(self, seconds: float) -> None:
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+    def post(self, path: str, body: dict, read: Callable[[http.client.HTTPResponse], T]) -> T:
+        """POST ``body`` and hand a successful response to ``read``.
+
+        ``read`` consumes the response body itself, so callers can stream it.
+        Error responses are read whole; they are small.
+        """
+        payload = json.dumps(body).encode("utf-8")
+        url = f"{self._prefix}{path}?key={self._api_key}"
+        headers = {"Content-Type": "application/json"}
+        for attempt in range(self._retries + 1):
+            self._wait_turn()
+            conn = self._connection()
+            try:
+                conn.request("POST", url, body=payload, headers=headers)
+                response = conn.getresponse()
+                if response.status == 200:
+                    return read(response)
+                data = response.read()
+            except (OSError, http.client.HTTPException) as exc:
+                # The server may have closed an idle keep-alive connection, or
+                # the body was cut off mid-stream.
+                self._drop_connection()
+                if attempt == self._retries:
+                    raise
+                print(f"  Connection error ({exc}); retrying")
+                time.sleep(_backoff(attempt))
+                continue
+            except Exception:
+                # A reader that gave up leaves unread bytes on the connection.
+                self._drop_connection()
+                raise
+
+            text = data.decode("utf-8", errors="replace")
+            if response.status not in RETRYABLE_STATUSES or attempt == self._retries:
+                raise ApiError(response.status, text)
+            if response.getheader("Connection", "").lower() == "close":
+                self._drop_connection()
+            retry_after = _parse_retry_after(response.headers, data)
+            if retry_after is not None:
+                # Quota is per key, so the pause applies to every worker.
+                print(f"  HTTP {response.status}; pausing requests for {retry_after:.1f}s")
+                self._pause(retry_after)
+            else:
+                time.sleep(_backoff(attempt))
+        raise AssertionError("unreachable")
+
+
+def _backoff(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class _Base64FileSink:
+    """Decodes base64 text fed in arbitrary pieces straight into a file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = path.open("wb")
+        self._pending = b""
+
+    def write(self, text: bytes) -> None:
+        data = self._pending + text.translate(None, b" \t\r\n")
+        usable = len(data) - len(data) % 4
+        if usable:
+            self._file.write(binascii.a2b_base64(data[:usable]))
+        self._pending = data[usable:]
+
+    def close(self) -> None:
+        if self._pending:
+            self._file.write(binascii.a2b_base64(self._pending))
+            self._pending = b""
+        self._file.close()
+
+    def abort(self) -> None:
+        self._file.close()
+
+
+class _ImageStreamExtractor:
+    """Incremental JSON scanner that streams the first inline image to disk.
+
+    Only the structure needed to locate image data is tracked: the stack of
+    containers with each object's current key and ``mimeType``. Strings are
+    skipped with ``bytes.find`` rather than byte by byte. The first
+    ``inlineData.data`` (generateContent) or ``bytesBase64Encoded`` (predict)
+    string is decoded into a temporary file in ``dest_dir``; later images and
+    all other strings are discarded unread.
+    """
+
+    def __init__(self, dest_dir: Path) -> None:
+        self._dest_dir = dest_dir
+        # Frames are [is_object, current_key, mime_type, sink_opened_here].
+        self._stack: list[list] = []
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._buffer: bytearray | None = None  # key or mimeType being read
+        self._buffer_is_key = False
+        self._sink: _Base64FileSink | None = None
+        self._opened = False
+        self.images: list[tuple[Path, str]] = []
+
+    def feed(self, chunk: bytes) -> None:
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._in_string:
+                i = self._scan_string(chunk, i)
                 continue
-            b64 = inline.get("data")
-            mime = inline.get("mimeType", "image/png")
-            if b64:
-                images.append((b64, mime))
-    return images
-
-
-def _extract_images_from_predict(data: dict) -> list[tuple[str, str]]:
-    images: list[tuple[str, str]] = []
-    for prediction in data.get("predictions", []):
-        if isinstance(prediction, dict):
-            if "bytesBase64Encoded" in prediction:
-                images.append((prediction["bytesBase64Encoded"], "image/png"))
+            c = chunk[i]
+            i += 1
+            if c == 0x22:  # "
+                self._start_string()
+            elif c == 0x7B:  # {
+                self._stack.append([True, None, None, False])
+                self._expect_key = True
+            elif c == 0x5B:  # [
+                self._stack.append([False, None, None, False])
+            elif c == 0x7D or c == 0x5D:  # } ]
+                frame = self._stack.pop()
+                if frame[3]:
+                    self.images.append((self._sink_path, frame[2] or "image/png"))
+                self._expect_key = False
+            elif c == 0x3A:  # :
+                self._expect_key = False
+            elif c == 0x2C:  # ,
+                self._expect_key = bool(self._stack) and self._stack[-1][0]
+
+    def _start_string(self) -> None:
+        self._in_string = True
+        top = self._stack[-1] if self._stack else None
+        if top is not None and top[0] and self._expect_key:
+            self._buffer, self._buffer_is_key = bytearray(), True
+            return
+        key = top[1] if top is not None and top[0] else None
+        parent_key = self._stack[-2][1] if len(self._stack) > 1 and self._stack[-2][0] else None
+        is_image = key == "bytesBase64Encoded" or (key == "data" and parent_key == "inlineData")
+        if is_image and not self._opened:
+            fd, name = tempfile.mkstemp(dir=self._dest_dir, prefix="partial-", suffix=".tmp")
+            os.close(fd)
+            self._sink_path = Path(name)
+            self._sink = _Base64FileSink(self._sink_path)
+            self._opened = True
+            top[3] = True
+        elif key == "mimeType":
+            self._buffer, self._buffer_is_key = bytearray(), False
+
+    def _emit(self, data: bytes) -> None:
+        if self._sink is not None:
+            self._sink.write(data)
+        elif self._buffer is not None:
+            self._buffer += data
+
+    def _emit_escape(self, char: int) -> None:
+        if self._sink is not None:
+            # Base64 only ever needs the escaped solidus; escaped whitespace is noise.
+            if char == 0x2F:
+                self._sink.write(b"/")
+        elif self._buffer is not None:
+            self._buffer += b"\\" + bytes([char])
+
+    def _end_string(self) -> None:
+        self._in_string = False
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        elif self._buffer is not None:
+            text = json.loads(b'"' + bytes(self._buffer) + b'"')
+            if self._buffer_is_key:
+                self._stack[-1][1] = text
+            else:
+                self._stack[-1][2] = text
+            self._buffer = None
+
+    def _scan_string(self, chunk: bytes, i: int) -> int:
+        n = len(chunk)
+        while i < n:
+            if self._escape:
+                self._escape = False
+                self._emit_escape(chunk[i])
+                i += 1
                 continue
-            if "image" in prediction and isinstance(prediction["image"], dict):
-                img = prediction["image"]
-                b64 = img.get("bytesBase64Encoded")
-                if b64:
-                    mime = img.get("mimeType", "image/png")
-                    images.append((b64, mime))
-                    continue
-    return images
+            quote = chunk.find(b'"', i)
+            backslash = chunk.find(b"\\", i, quote if quote != -1 else n)
+            if backslash != -1:
+                self._emit(chunk[i:backslash])
+                self._escape = True
+                i = backslash + 1
+            elif quote != -1:
+                self._emit(chunk[i:quote])
+                self._end_string()
+                return quote + 1
+            else:
+                self._emit(chunk[i:])
+                return n
+        return n
 
+    def discard(self) -> None:
+        if self._sink is not None:
+            self._sink.abort()
+            self._sink = None
+        if self._opened:
+            self._sink_path.unlink(missing_ok=True)
+        self.images = []
 
-def generate_with_gemini(api_key: str, prompt: ImagePrompt) -> list[tuple[str, str]]:
-    url = f"{API_BASE}/models/{prompt.model}:generateContent?key={api_key}"
-    body = {
+    def finish(self) -> list[tuple[Path, str]]:
+        if self._in_string or self._stack:
+            self.discard()
+            raise ValueError("response body ended before the JSON document was complete")
+        if self._opened and not self.images:
+            self.discard()
+        return self.images
+
+
+def _stream_images(response: http.client.HTTPResponse, dest_dir: Path) -> list[tuple[Path, str]]:
+    """Read a generateContent/predict response, writing its first image to ``dest_dir``."""
+    extractor = _ImageStreamExtractor(dest_dir)
+    try:
+        while chunk := response.read(STREAM_CHUNK_BYTES):
+            extractor.feed(chunk)
+        return extractor.finish()
+    except BaseException:
+        extractor.discard()
+        raise
+
+
+def _gemini_body(prompt: ImagePrompt) -> dict:
+    return {
         "contents": [{"parts": [{"text": prompt.full_prompt}]}],
         "generationConfig": {
             "temperature": prompt.temperature,
             "responseModalities": ["TEXT", "IMAGE"],
         },
     }
-    data = _request_json(url, body)
-    return _extract_images_from_generate_content(data)
+
+
+def _imagen_body(prompt_text: str, aspect_ratio: str = "16:9") -> dict:
+    return {
+        "instances": [{"prompt": prompt_text}],
+        "parameters": {"sampleCount": 1, "aspectRatio": aspect_ratio},
+    }
+
+
+def generate_with_gemini(
+    client: ApiClient,
+    prompt: ImagePrompt,
+    dest_dir: Path,
+) -> list[tuple[Path, str]]:
+    return client.post(
+        f"/models/{prompt.model}:generateContent",
+        _gemini_body(prompt),
+        lambda response: _stream_images(response, dest_dir),
+    )
 
 
 def generate_with_imagen_predict(
-    api_key: str,
+    client: ApiClient,
     model: str,
     prompt_text: str,
+    dest_dir: Path,
     *,
     aspect_ratio: str = "16:9",
-) -> list[tuple[str, str]]:
-    url = f"{API_BASE}/models/{model}:predict?key={api_key}"
-    body = {
-        "instances": [{"prompt": prompt_text}],
-        "parameters": {"sampleCount": 1, "aspectRatio": aspect_ratio},
+) -> list[tuple[Path, str]]:
+    return client.post(
+        f"/models/{model}:predict",
+        _imagen_body(prompt_text, aspect_ratio),
+        lambda response: _stream_images(response, dest_dir),
+    )
+
+
+def cache_key(prompt: ImagePrompt) -> str:
+    """Hash of everything sent to the API for a prompt, including the fallback."""
+    material = {
+        "gemini": {"model": prompt.model, "body": _gemini_body(prompt)},
+        "imagen": {"model": IMAGEN_FALLBACK_MODEL, "body": _imagen_body(prompt.full_prompt)},
     }
-    data = _request_json(url, body)
-    return _extract_images_from_predict(data)
+    canonical = json.dumps(material, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Content-addressed image store under generated/.cache/.
+
+    Images are stored as ``<cache key>.<ext>``; ``index.json`` records each
+    entry's extension, slug and last use so old entries can be evicted.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.index_path = directory / "index.json"
+        self.used: set[str] = set()
+        try:
+            self.entries: dict[str, dict] = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _path(self, key: str, ext: str) -> Path:
+        return self.directory / f"{key}.{ext}"
+
+    def _touch(self, key: str, ext: str, slug: str) -> Path:
+        self.entries[key] = {
+            "ext": ext,
+            "slug": slug,
+            "lastUsedUtc": datetime.now(timezone.utc).isoformat(),
+        }
+        self.used.add(key)
+        return self._path(key, ext)
+
+    def get(self, key: str, slug: str) -> Path | None:
+        entry = self.entries.get(key)
+        if entry is None or not self._path(key, entry["ext"]).exists():
+            return None
+        return self._touch(key, entry["ext"], slug)
+
+    def put(self, key: str, source: Path, ext: str, slug: str) -> Path:
+        """Move a freshly written image (in the cache directory) into place."""
+        path = self._touch(key, ext, slug)
+        os.replace(source, path)
+        return path
+
+    def adopt(self, key: str, source: Path, slug: str) -> Path:
+        """Seed the cache from an already published image with a known key."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._touch(key, source.suffix.lstrip("."), slug)
+        shutil.copyfile(source, path)
+        return path
+
+    def evict(self, *, max_entries: int, max_age_days: float) -> list[str]:
+        """Drop stale and least-recently used entries; entries used this run stay."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+        by_age = sorted(self.entries, key=lambda k: self.entries[k]["lastUsedUtc"], reverse=True)
+        evicted = []
+        for rank, key in enumerate(by_age):
+            if key in self.used:
+                continue
+            last_used = datetime.fromisoformat(self.entries[key]["lastUsedUtc"])
+            if rank >= max_entries or last_used < cutoff:
+                self._path(key, self.entries.pop(key)["ext"]).unlink(missing_ok=True)
+                evicted.append(key)
+        # Blobs left behind by interrupted runs are not in the index.
+        if self.directory.exists():
+            for path in self.directory.iterdir():
+                if path != self.index_path and path.stem not in self.entries:
+                    path.unlink()
+        return evicted
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def _publish(blob: Path, prefix: str) -> Path:
+    """Place a cached image at generated/<prefix>.<ext>, replacing older variants."""
+    target = OUT_DIR / f"{prefix}{blob.suffix}"
+    # Blobs start out as mkstemp files (0600); the published link shares their mode.
+    os.chmod(blob, 0o644)
+    for stale in OUT_DIR.glob(f"{prefix}.*"):
+        stale.unlink()
+    try:
+        os.link(blob, target)
+    except OSError:
+        shutil.copyfile(blob, target)
+    return target
+
+
+def _load_previous_items() -> tuple[dict[str, dict], dict[str, Path]]:
+    """Previous manifest items by cache key, and images from before caching by slug."""
+    try:
+        items = json.loads(MANIFEST_PATH.read_text(encoding="utf-8")).get("items", [])
+    except (OSError, ValueError):
+        return {}, {}
+    keyed = {item["cacheKey"]: item for item in items if item.get("cacheKey")}
+    legacy = {item["slug"]: ROOT / _href(item["image_rel_path"]) for item in items if not item.get("cacheKey")}
+    return keyed, legacy
+
+
+def _legacy_image(prefix: str, slug: str, legacy: dict[str, Path], keyed: dict[str, dict]) -> Path | None:
+    """An image published before caching for this prompt, matched by slug or file prefix.
+
+    Files a cached run published under another key are stale, not legacy.
+    """
+    keyed_paths = {(ROOT / _href(item["image_rel_path"])).resolve() for item in keyed.values()}
+    candidates = [legacy[slug]] if slug in legacy else []
+    candidates += sorted(OUT_DIR.glob(f"{prefix}.*"))
+    for path in candidates:
+        if path.is_file() and path.resolve() not in keyed_paths:
+            return path
+    return None
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while chunk := handle.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _derivative_formats() -> list[str]:
+    """Derivative formats this Pillow build can encode, best compression first."""
+    from PIL import features
+
+    return [fmt for fmt in DERIVATIVE_ENCODERS if features.check(fmt)]
+
+
+def _derivative_widths(source_width: int) -> list[int]:
+    widths = [w for w in DERIVATIVE_WIDTHS if w < source_width]
+    return widths or [source_width]
+
+
+def _encode_derivatives(source: str, digest: str, fmt: str) -> list[dict]:
+    """Encode one format at every width for one image (runs in a worker process)."""
+    from PIL import Image
+
+    files = []
+    with Image.open(source) as image:
+        image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        for width in _derivative_widths(image.width):
+            target = DERIVED_DIR / f"{digest[:16]}-{width}.{fmt}"
+            if not target.exists():
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                partial = target.with_name(f"{target.name}.partial")
+                resized.save(partial, format=fmt.upper(), **DERIVATIVE_ENCODERS[fmt])
+                os.replace(partial, target)
+            files.append(
+                {
+                    "path": target.relative_to(ROOT).as_posix(),
+                    "format": fmt,
+                    "width": width,
+                    "bytes": target.stat().st_size,
+                }
+            )
+    return files
+
+
+def build_derivatives(rows: list[dict], workers: int = 0) -> None:
+    """Attach resized WebP/AVIF derivatives to manifest rows.
+
+    Derivatives are keyed by the source image's SHA-256, so only new or
+    changed images are encoded; one (image, format) pair is one pool task.
+    Derivatives no row references any more are removed.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Derivatives: Pillow is not installed; preview uses full-size images.")
+        return
+
+    formats = _derivative_formats()
+    DERIVED_DIR.mkdir(parents=True, exist_ok=True)
+    tasks = {}
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        for row in rows:
+            source = ROOT / _href(row["image_rel_path"])
+            digest = _sha256_file(source)
+            with Image.open(source) as image:
+                size = image.size
+            row["derivatives"] = {
+                "sourceSha256": digest,
+                "width": size[0],
+                "height": size[1],
+                "files": [],
+            }
+            for fmt in formats:
+                tasks[pool.submit(_encode_derivatives, str(source), digest, fmt)] = row
+        for future, row in tasks.items():
+            row["derivatives"]["files"].extend(future.result())
+
+    keep = {row["derivatives"]["sourceSha256"][:16] for row in rows}
+    for path in DERIVED_DIR.iterdir():
+        if path.name.split("-", 1)[0] not in keep:
+            path.unlink()
+    total = sum(f["bytes"] for row in rows for f in row["derivatives"]["files"])
+    print(f"Derivatives: {len(rows)} image(s), {', '.join(formats)}, {total / 1024:.0f} KB total")
+
+
+def _href(rel_path: str) -> str:
+    return rel_path.replace("\\", "/")
+
+
+def _picture_html(row: dict, image_rel: str, title: str) -> str:
+    derived = row.get("derivatives")
+    if not derived or not derived["files"]:
+        return f'<img loading="lazy" src="{image_rel}" alt="{title}" />'
+    sources = []
+    for fmt in DERIVATIVE_ENCODERS:
+        files = [f for f in derived["files"] if f["format"] == fmt]
+        if not files:
+            continue
+        srcset = ", ".join(f'{_href(f["path"])} {f["width"]}w' for f in files)
+        sources.append(f'<source type="image/{fmt}" srcset="{srcset}" sizes="{PREVIEW_SIZES}" />')
+    img = (
+        f'<img loading="lazy" decoding="async" src="{image_rel}" '
+        f'width="{derived["width"]}" height="{derived["height"]}" alt="{title}" />'
+    )
+    return f"<picture>{''.join(sources)}{img}</picture>"
 
 
 def write_preview_html(rows: Iterable[dict]) -> None:
     cards = []
     for row in rows:
-        image_rel = row["image_rel_path"].replace("\\", "/")
+        image_rel = _href(row["image_rel_path"])
         title = row["title"]
         model = row["model"]
         slug = row["slug"]
+        picture = _picture_html(row, image_rel, title)
         cards.append(
             f"""
             <article class="card">
@@ -277,7 +902,7 @@ def write_preview_html(rows: Iterable[dict]) -> None:
                 <p><strong>Model:</strong> {model}</p>
                 <p><strong>File:</strong> {image_rel}</p>
               </div>
-              <img loading="lazy" src="{image_rel}" alt="{title}" />
+              {picture}
             </article>
             """.strip()
         )
@@ -364,6 +989,16 @@ def write_preview_html(rows: Iterable[dict]) -> None:
     PREVIEW_PATH.write_text(html, encoding="utf-8")
 
 
+def _manifest_row(prompt: ImagePrompt, path: Path, key: str) -> dict:
+    return {
+        "slug": prompt.slug,
+        "title": prompt.title,
+        "model": prompt.model,
+        "image_rel_path": path.relative_to(ROOT).as_posix(),
+        "cacheKey": key,
+    }
+
+
 def main() -> int:
     args = parse_args()
     try:
@@ -372,74 +1007,102 @@ def main() -> int:
         print(f"Error: {exc}")
         return 1
 
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     prompts = PROMPTS[: args.limit] if args.limit > 0 else PROMPTS
-    manifest_rows: list[dict] = []
-    failures: list[str] = []
-
-    for idx, prompt in enumerate(prompts, start=1):
-        filename_prefix = f"{idx:02d}_{prompt.slug}"
-        existing = list(OUT_DIR.glob(f"{filename_prefix}.*"))
-        if existing and not args.overwrite:
-            print(f"[skip] {prompt.slug} (already exists)")
-            chosen = existing[0]
-            manifest_rows.append(
-                {
-                    "slug": prompt.slug,
-                    "title": prompt.title,
-                    "model": prompt.model,
-                    "image_rel_path": str(chosen.relative_to(ROOT)),
-                }
-            )
-            continue
+    client = ApiClient(
+        args.api_base,
+        api_key,
+        max_rps=args.max_rps,
+        retries=args.retries,
+        timeout=args.timeout,
+    )
+    cache = GenerationCache(CACHE_DIR)
+    previous_items, legacy_images = _load_previous_items()
+    # Rows and failures are keyed by prompt index so output order is stable.
+    rows: dict[int, dict] = {}
+    failed: dict[int, str] = {}
+    started = time.monotonic()
 
-        print(f"[run] {prompt.slug} -> {prompt.model}")
-        try:
-            images = generate_with_gemini(api_key, prompt)
-        except urllib.error.HTTPError as exc:
-            body = exc.read().decode("utf-8", errors="replace")
-            print(f"  HTTP {exc.code}: {body[:400]}")
-            images = []
-        except Exception as exc:  # pragma: no cover - network/runtime issues
-            print(f"  Error: {exc}")
-            images = []
-
-        # Optional fallback to Imagen if no image was returned.
-        if not images:
-            print("  Gemini returned no image; trying Imagen fallback...")
-            try:
-                images = generate_with_imagen_predict(
-                    api_key,
-                    "imagen-4.0-generate-001",
-                    prompt.full_prompt,
-                )
-            except urllib.error.HTTPError as exc:
-                body = exc.read().decode("utf-8", errors="replace")
-                print(f"  Imagen HTTP {exc.code}: {body[:300]}")
-            except Exception as exc:  # pragma: no cover
-                print(f"  Imagen error: {exc}")
-
-        if not images:
-            failures.append(prompt.slug)
-            print("  Failed: no image produced.")
-            time.sleep(1.5)
-            continue
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        jobs: dict[Future, tuple[int, ImagePrompt, str]] = {}
+        for idx, prompt in enumerate(prompts, start=1):
+            key = cache_key(prompt)
+            if not args.overwrite:
+                prefix = f"{idx:02d}_{prompt.slug}"
+                blob = cache.get(key, prompt.slug)
+                previous = previous_items.get(key)
+                if blob is None and previous and (ROOT / _href(previous["image_rel_path"])).exists():
+                    blob = cache.adopt(key, ROOT / _href(previous["image_rel_path"]), prompt.slug)
+                if blob is None:
+                    # Images from before caching have no key; like the uncached
+                    # script, keep them and seed the cache with them.
+                    seed = _legacy_image(prefix, prompt.slug, legacy_images, previous_items)
+                    if seed is not None:
+                        blob = cache.adopt(key, seed, prompt.slug)
+                if blob is not None:
+                    print(f"[cached] {prompt.slug} ({key[:12]})")
+                    rows[idx] = _manifest_row(prompt, _publish(blob, prefix), key)
+                    continue
+            print(f"[queue] {prompt.slug} -> {prompt.model}")
+            jobs[pool.submit(generate_with_gemini, client, prompt, CACHE_DIR)] = (idx, prompt, "gemini")
 
-        b64, mime = images[0]
-        ext = _ext_for_mime(mime)
-        out_path = OUT_DIR / f"{filename_prefix}.{ext}"
-        out_path.write_bytes(base64.b64decode(b64))
-        print(f"  Saved: {out_path}")
-        manifest_rows.append(
-            {
-                "slug": prompt.slug,
-                "title": prompt.title,
-                "model": prompt.model,
-                "image_rel_path": str(out_path.relative_to(ROOT)),
-            }
-        )
-        time.sleep(1.2)
+        while jobs:
+            done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, prompt, stage = jobs.pop(future)
+                label = "" if stage == "gemini" else "Imagen "
+                try:
+                    images = future.result()
+                except ApiError as exc:
+                    print(f"[{prompt.slug}] {label}HTTP {exc.status}: {exc.body[:400]}")
+                    images = []
+                except Exception as exc:  # pragma: no cover - network/runtime issues
+                    print(f"[{prompt.slug}] {label}error: {exc}")
+                    images = []
+
+                # Optional fallback to Imagen if no image was returned; it runs
+                # on the pool alongside the remaining Gemini requests.
+                if not images and stage == "gemini":
+                    print(f"[{prompt.slug}] Gemini returned no image; queueing Imagen fallback")
+                    fallback = pool.submit(
+                        generate_with_imagen_predict,
+                        client,
+                        IMAGEN_FALLBACK_MODEL,
+                        prompt.full_prompt,
+                        CACHE_DIR,
+                    )
+                    jobs[fallback] = (idx, prompt, "imagen")
+                    continue
+
+                if not images:
+                    failed[idx] = prompt.slug
+                    print(f"[{prompt.slug}] Failed: no image produced.")
+                    continue
+
+                image_path, mime = images[0]
+                key = cache_key(prompt)
+                blob = cache.put(key, image_path, _ext_for_mime(mime), prompt.slug)
+                out_path = _publish(blob, f"{idx:02d}_{prompt.slug}")
+                print(f"[{prompt.slug}] Saved: {out_path}")
+                rows[idx] = _manifest_row(prompt, out_path, key)
+
+    manifest_rows = [rows[idx] for idx in sorted(rows)]
+    failures = [failed[idx] for idx in sorted(failed)]
 
+    # Published files from earlier cached runs that no prompt maps to any more
+    # (renamed after a reorder, or superseded by an edit). Their content stays
+    # in the cache until evicted; images from before caching are left alone.
+    # Manifests written on Windows hold backslash paths, so compare resolved paths.
+    current = {(ROOT / _href(row["image_rel_path"])).resolve() for row in manifest_rows}
+    published_slugs = {row["slug"] for row in manifest_rows}
+    for item in previous_items.values():
+        stale = (ROOT / _href(item["image_rel_path"])).resolve()
+        if item["slug"] in published_slugs and stale not in current:
+            stale.unlink(missing_ok=True)
+    evicted = cache.evict(max_entries=args.cache_max_entries, max_age_days=args.cache_max_age_days)
+    cache.save()
+    if not args.no_derivatives and manifest_rows:
+        build_derivatives(manifest_rows, args.derivative_workers)
     manifest = {
         "generatedAtUtc": datetime.now(timezone.utc).isoformat(),
         "count": len(manifest_rows),
@@ -449,9 +1112,11 @@ def main() -> int:
     MANIFEST_PATH.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
     write_preview_html(manifest_rows)
 
-    print("\nDone.")
+    print(f"\nDone in {time.monotonic() - started:.1f}s.")
     print(f"Manifest: {MANIFEST_PATH}")
     print(f"Preview:  {PREVIEW_PATH}")
+    if evicted:
+        print(f"Evicted:  {len(evicted)} cached image(s)")
     if failures:
         print(f"Failures: {', '.join(failures)}")
     return 0
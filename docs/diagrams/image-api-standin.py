@@ -0,0 +1,215 @@
+"""Local stand-in for the Gemini/Imagen image endpoints used by generate-images.py.
+
+Serves ``POST /v1beta/models/<model>:generateContent`` and
+``POST /v1beta/models/<model>:predict`` with small generated PNGs, so the
+generator's concurrency, retry and fallback paths can be exercised without an
+API key or quota.
+
+Usage examples:
+  python docs/diagrams/image-api-standin.py --port 8765
+  python docs/diagrams/image-api-standin.py --latency 2 --throttle-every 3 --no-image-models gemini-3-pro-image-preview
+
+Behaviour knobs:
+  --latency          seconds each request takes (simulates generation time)
+  --throttle-every   every Nth request gets 429 with Retry-After
+  --fail-every       every Nth request gets 503 without Retry-After
+  --no-image-models  models whose generateContent returns text only, which
+                     makes the generator fall back to Imagen
+
+The server speaks HTTP/1.1 keep-alive and prints request counts, peak
+concurrency and connection count on shutdown (Ctrl+C or SIGTERM).
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import re
+import signal
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH_RE = re.compile(r"^/v1beta/models/(?P<model>[^/:?]+):(?P<method>generateContent|predict)(?:\?.*)?$")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini/Imagen image API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765).")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=1.0,
+        help="Seconds each request takes before answering (default: 1.0).",
+    )
+    parser.add_argument(
+        "--throttle-every",
+        type=int,
+        default=0,
+        help="Answer every Nth request with 429 + Retry-After (0 disables).",
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=int,
+        default=1,
+        help="Retry-After seconds sent with throttled responses (default: 1).",
+    )
+    parser.add_argument(
+        "--fail-every",
+        type=int,
+        default=0,
+        help="Answer every Nth request with 503 and no Retry-After (0 disables).",
+    )
+    parser.add_argument(
+        "--no-image-models",
+        default="",
+        help="Comma-separated models whose generateContent returns no image.",
+    )
+    return parser.parse_args()
+
+
+def make_png(width: int, height: int, rgb: tuple[int, int, int]) -> bytes:
+    """Encode a solid-colour RGB PNG."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + bytes(rgb) * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections = 0
+        self.statuses: dict[int, int] = {}
+
+    def begin(self) -> int:
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return self.requests
+
+    def end(self, status: int) -> None:
+        with self.lock:
+            self.in_flight -= 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+def make_handler(args: argparse.Namespace, stats: Stats) -> type[BaseHTTPRequestHandler]:
+    no_image_models = {m.strip() for m in args.no_image_models.split(",") if m.strip()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            with stats.lock:
+                stats.connections += 1
+
+        def log_message(self, format: str, *log_args: object) -> None:
+            print(f"  {self.address_string()} {format % log_args}")
+
+        def _send_json(self, status: int, body: dict, headers: dict[str, str] | None = None) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self) -> None:
+            # The stand-in ignores prompts, but the body must be drained for keep-alive.
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            match = PATH_RE.match(self.path)
+            if not match:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+                return
+
+            seq = stats.begin()
+            status = 200
+            try:
+                time.sleep(args.latency)
+                if args.throttle_every and seq % args.throttle_every == 0:
+                    status = 429
+                    self._send_json(
+                        status,
+                        {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded"}},
+                        {"Retry-After": str(args.retry_after)},
+                    )
+                    return
+                if args.fail_every and seq % args.fail_every == 0:
+                    status = 503
+                    self._send_json(status, {"error": {"code": 503, "status": "UNAVAILABLE", "message": "Overloaded"}})
+                    return
+
+                model, method = match.group("model"), match.group("method")
+                # Vary the colour per request so outputs are distinguishable.
+                png = make_png(64, 36, ((seq * 53) % 256, (seq * 97) % 256, 200))
+                b64 = base64.b64encode(png).decode("ascii")
+                if method == "predict":
+                    body = {"predictions": [{"bytesBase64Encoded": b64, "mimeType": "image/png"}]}
+                elif model in no_image_models:
+                    body = {"candidates": [{"content": {"parts": [{"text": "No image this time."}]}}]}
+                else:
+                    body = {
+                        "candidates": [
+                            {
+                                "content": {
+                                    "parts": [
+                                        {"text": "Here is the diagram."},
+                                        {"inlineData": {"mimeType": "image/png", "data": b64}},
+                                    ]
+                                }
+                            }
+                        ]
+                    }
+                self._send_json(status, body)
+            finally:
+                stats.end(status)
+
+    return Handler
+
+
+def _interrupt(signum: int, frame: object) -> None:
+    raise KeyboardInterrupt
+
+
+def main() -> int:
+    args = parse_args()
+    # Background jobs ignore SIGINT, so treat SIGTERM as a clean stop as well.
+    signal.signal(signal.SIGTERM, _interrupt)
+    stats = Stats()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args, stats))
+    print(f"Image API stand-in on http://{args.host}:{args.port}/v1beta (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(
+        f"\nRequests: {stats.requests}  peak concurrency: {stats.peak_in_flight}  "
+        f"connections: {stats.connections}  statuses: {stats.statuses}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,24 +3,25 @@ Playwright screenshot capture for Nielsen heuristic evaluation.
 Captures Workforce integration screens + key related surfaces.
 """
 from playwright.sync_api import sync_playwright
+from readiness import wait_settled
 import os, time
 
 FILE = "file:///D:/Visual%20Studio%20Projects/VAOP/docs/internal/ui/cockpit/index.html"
 OUT = os.path.dirname(os.path.abspath(__file__))
 
 def shot(page, name):
-    page.wait_for_timeout(500)
+    wait_settled(page)
     path = os.path.join(OUT, f"heuristic-{name}.png")
     page.screenshot(path=path, full_page=False)
     print(f"  OK {name}")
 
 def nav(page, hash_):
     page.evaluate(f"document.querySelector('a[href=\"{hash_}\"]')?.click()")
-    page.wait_for_timeout(300)
+    wait_settled(page)
 
 def set_persona(page, val):
     page.select_option("#persona", val)
-    page.wait_for_timeout(300)
+    wait_settled(page)
 
 with sync_playwright() as p:
     browser = p.chromium.launch()
@@ -47,20 +48,18 @@ with sync_playwright() as p:
 
     # 4. Workforce — click Bob Chen (2nd card) for master-detail
     nav(page, "#workforce")
-    page.wait_for_timeout(200)
     cards = page.query_selector_all(".workforce-card")
     if len(cards) > 1:
         cards[1].click()
-        page.wait_for_timeout(300)
+        wait_settled(page)
     shot(page, "04-workforce-bob-detail")
 
     # 5. Workforce — click Carol Davis (3rd card)
     nav(page, "#workforce")
-    page.wait_for_timeout(200)
     cards = page.query_selector_all(".workforce-card")
     if len(cards) > 2:
         cards[2].click()
-        page.wait_for_timeout(300)
+        wait_settled(page)
     shot(page, "05-workforce-carol-detail")
 
     # 6. Queues screen
@@ -69,11 +68,10 @@ with sync_playwright() as p:
 
     # 7. Queues — click second queue card
     nav(page, "#queues")
-    page.wait_for_timeout(200)
     qcards = page.query_selector_all(".queue-card")
     if len(qcards) > 1:
         qcards[1].click()
-        page.wait_for_timeout(300)
+        wait_settled(page)
     shot(page, "07-queues-detail")
 
     # 8. Work Items list
@@ -83,11 +81,10 @@ with sync_playwright() as p:
 
     # 9. Work Item detail (click first row)
     nav(page, "#work-items")
-    page.wait_for_timeout(200)
     first_row = page.query_selector("tr[data-href], .table__row[data-href], .work-item-row")
     if first_row:
         first_row.click()
-        page.wait_for_timeout(400)
+        wait_settled(page)
     shot(page, "09-work-item-detail")
 
     # 10. Owner picker open (try to find visible trigger in current drawer/panel)
@@ -95,7 +92,7 @@ with sync_playwright() as p:
         picker_trigger = page.query_selector(".owner-picker__trigger, [data-action='open-owner-picker'], .js-owner-picker-trigger")
         if picker_trigger and picker_trigger.is_visible():
             picker_trigger.click(timeout=3000)
-            page.wait_for_timeout(300)
+            wait_settled(page)
     except Exception:
         pass
     shot(page, "10-owner-picker-open")
@@ -108,22 +105,20 @@ with sync_playwright() as p:
     # 12. Run detail — step timeline
     set_persona(page, "operator")
     nav(page, "#runs")
-    page.wait_for_timeout(200)
     first_run = page.query_selector("tr[data-href], .table__row[data-href]")
     if first_run:
         first_run.click()
-        page.wait_for_timeout(400)
+        wait_settled(page)
     shot(page, "12-run-detail-timeline")
 
     # 13. Settings — Workforce tab
     set_persona(page, "admin")
     nav(page, "#settings")
-    page.wait_for_timeout(300)
     # Find workforce tab
     wf_tab = page.query_selector("[data-tab='workforce'], [data-value='workforce'], .tab--workforce, button:has-text('Workforce'), a:has-text('Workforce')")
     if wf_tab:
         wf_tab.click()
-        page.wait_for_timeout(300)
+        wait_settled(page)
     shot(page, "13-settings-workforce-tab")
 
     # 14. Workforce — Admin persona (sees edit controls)
@@ -143,11 +138,10 @@ with sync_playwright() as p:
     # 17. Inbox with Human Tasks filter chip active — Operator
     set_persona(page, "operator")
     nav(page, "#inbox")
-    page.wait_for_timeout(200)
     ht_chip = page.query_selector(".js-filter-human-tasks, [data-filter='human-tasks']")
     if ht_chip:
         ht_chip.click()
-        page.wait_for_timeout(300)
+        wait_settled(page)
     shot(page, "17-inbox-human-tasks-chip")
 
     browser.close()
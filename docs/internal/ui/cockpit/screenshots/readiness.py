@@ -0,0 +1,30 @@
+"""
+Readiness waits shared by the cockpit screenshot scripts.
+
+Instead of fixed sleeps, wait until the page reports that it has settled.
+The React cockpit sets ``data-route-settled`` on <html> (router idle, no
+pending queries, animations done); pages without that signal, such as the
+static prototype, are treated as settled once fonts are loaded and no finite
+animation or transition is running.
+"""
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+SETTLE_TIMEOUT_MS = 5000
+
+SETTLED_JS = """() => {
+  const flag = document.documentElement.dataset.routeSettled;
+  if (flag !== undefined) return flag === 'true';
+  if (document.fonts && document.fonts.status !== 'loaded') return false;
+  return !document.getAnimations().some((a) =>
+    a.playState === 'running' && Number.isFinite(a.effect?.getTiming().iterations ?? 1));
+}"""
+
+# Two animation frames: lets a click or hash change render and start its transitions.
+NEXT_FRAMES_JS = "() => new Promise((r) => requestAnimationFrame(() => requestAnimationFrame(r)))"
+
+def wait_settled(page, timeout=SETTLE_TIMEOUT_MS):
+    page.evaluate(NEXT_FRAMES_JS)
+    try:
+        page.wait_for_function(SETTLED_JS, timeout=timeout)
+    except PlaywrightTimeoutError:
+        print(f"  .. page not settled after {timeout} ms, continuing")
@@ -0,0 +1,129 @@
+"""
+Control example: executes commands from Portarium's StreamFeedback stream.
+
+Usage:
+  python control.py --standin                  # stand-in server sends a synthetic command load
+  python control.py --target localhost:50051   # serve commands from a control plane
+
+With --standin, navigation commands are sent to --robots robots at --rate per
+second, every --estop-every-th command is an estop for a robot that is
+probably mid-navigation, and a share of commands is redelivered to exercise
+the idempotency cache. The summary compares estop and navigation round trips
+as measured by the stand-in.
+"""
+
+import argparse
+import os
+import random
+import time
+
+from dotenv import load_dotenv
+
+from portarium.control.v1 import control_pb2
+from portarium_control import Command, CommandDispatcher
+from portarium_standin import StandinControlService, start_standin
+
+load_dotenv()
+
+
+def navigate_to(command: Command) -> str:
+    """Simulated navigation: a few hundred ms of steps, preemptible between steps."""
+    params = command.request.parameters
+    x, y = params["x"], params["y"]
+    steps = 20
+    for step in range(1, steps + 1):
+        command.checkpoint()
+        time.sleep(0.015)
+        remaining = (1 - step / steps) * (x * x + y * y) ** 0.5
+        command.navigation(x * step / steps, y * step / steps, 0.0, remaining, remaining / 1.5)
+        command.progress(step / steps, phase=control_pb2.MISSION_PHASE_NAVIGATING)
+    return f"arrived at ({x:.1f}, {y:.1f})"
+
+
+def estop(command: Command) -> str:
+    return "motors disabled"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Execute Portarium robot commands at the edge.")
+    parser.add_argument("--target", default=os.getenv("PORTARIUM_GRPC_TARGET", "localhost:50051"))
+    parser.add_argument("--standin", action="store_true", help="Drive commands from an in-process stand-in.")
+    parser.add_argument("--robots", type=int, default=20, help="Simulated robots with --standin (default: 20).")
+    parser.add_argument("--rate", type=float, default=30, help="Commands per second with --standin (default: 30).")
+    parser.add_argument("--seconds", type=float, default=10, help="Run time (default: 10).")
+    parser.add_argument("--estop-every", type=int, default=25, help="Every Nth command is an estop (default: 25).")
+    parser.add_argument("--redeliver", type=float, default=0.05, help="Share of commands sent twice (default: 0.05).")
+    parser.add_argument("--workers", type=int, default=16, help="Command worker threads (default: 16).")
+    return parser.parse_args()
+
+
+def percentiles(samples: list[float]) -> str:
+    if not samples:
+        return "-"
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)] * 1000  # noqa: E731
+    return f"p50 {pick(50):7.2f}  p99 {pick(99):7.2f}  max {ordered[-1] * 1000:7.2f} ms  (n={len(ordered)})"
+
+
+def main() -> None:
+    args = parse_args()
+    server = standin = None
+    target = args.target
+    if args.standin:
+        standin = StandinControlService()
+        server, target, _ = start_standin(control=standin)
+        print(f"Stand-in ControlService on {target}")
+
+    dispatcher = CommandDispatcher(
+        target,
+        workspace_id=os.getenv("PORTARIUM_WORKSPACE_ID", "ws-demo"),
+        gateway_id=os.getenv("PORTARIUM_GATEWAY_ID", "gw-demo"),
+        token=os.getenv("PORTARIUM_TOKEN", "dev-token"),
+        workers=args.workers,
+    )
+    dispatcher.register("navigate_to", navigate_to)
+    dispatcher.register("estop", estop)
+
+    with dispatcher:
+        if standin is None:
+            time.sleep(args.seconds)
+        else:
+            standin.wait_connected()
+            rng = random.Random(7)
+            started, sent = time.monotonic(), 0
+            while time.monotonic() - started < args.seconds:
+                delay = started + sent / args.rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                robot = f"robot-{rng.randrange(args.robots):03d}"
+                sent += 1
+                if sent % args.estop_every == 0:
+                    standin.send_command(robot, "estop", priority=control_pb2.COMMAND_PRIORITY_CRITICAL)
+                    continue
+                key = standin.send_command(
+                    robot, "navigate_to", mission_id=f"mission-{sent}",
+                    parameters={"x": rng.uniform(-20, 20), "y": rng.uniform(-20, 20)},
+                )
+                if rng.random() < args.redeliver:
+                    standin.send_command(robot, "navigate_to", mission_id=f"mission-{sent}", idempotency_key=key)
+            time.sleep(1.0)  # let the last navigations finish
+        m = dispatcher.metrics()
+
+    print("\n-- DISPATCHER SUMMARY " + "-" * 29)
+    print(f"  Commands:  {m.commands_received:,} received, {m.duplicates:,} duplicates, "
+          f"{m.commands_completed:,} completed, {m.commands_preempted:,} preempted, {m.commands_failed:,} failed")
+    print(f"  Feedback:  {m.messages_written:,} messages in {m.batches_written:,} writes, "
+          f"{m.messages_coalesced:,} progress updates coalesced")
+    print(f"  Ack:       p50 {m.ack.p50_ms} p99 {m.ack.p99_ms} ms (gateway side)")
+    print(f"  Queued:    p50 {m.queue_wait.p50_ms} p99 {m.queue_wait.p99_ms} ms")
+    if standin is not None:
+        s = standin.stats
+        print(f"  Server:    {s.acks:,} acks, phases {s.phases}")
+        print(f"  Ack RTT:         {percentiles(s.ack_rtt)}")
+        for command_type, samples in sorted(s.completion_rtt.items()):
+            print(f"  {command_type + ' RTT:':<16} {percentiles(samples)}")
+        server.stop(None)
+
+
+if __name__ == "__main__":
+    main()
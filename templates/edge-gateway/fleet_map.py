@@ -0,0 +1,72 @@
+"""
+Fleet map example: tracks robot positions from Portarium location events.
+
+Usage:
+  python fleet_map.py --frame floor-1 --x 10 --y 4 --radius 5
+  python fleet_map.py --map-layer ml-ws1-floor1
+
+PORTARIUM_BASE_URL, PORTARIUM_TOKEN and PORTARIUM_WORKSPACE_ID configure the
+connection. Every --interval seconds, the query is answered from the local
+index and printed with its latency.
+"""
+
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+from portarium_location import LocationTracker
+
+load_dotenv()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Track robot positions and query them locally.")
+    parser.add_argument("--frame", default="floor-1", help="Coordinate frame for the radius query.")
+    parser.add_argument("--x", type=float, default=0.0)
+    parser.add_argument("--y", type=float, default=0.0)
+    parser.add_argument("--radius", type=float, default=10.0, help="Radius in metres (default: 10).")
+    parser.add_argument("--map-layer", help="Also list robots in this map layer.")
+    parser.add_argument("--history", type=float, default=3600, help="Bootstrap window in seconds (default: 3600).")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between queries (default: 2).")
+    parser.add_argument("--seconds", type=float, default=30, help="Run time (default: 30).")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    tracker = LocationTracker(
+        os.getenv("PORTARIUM_BASE_URL", "http://localhost:8080"),
+        token=os.getenv("PORTARIUM_TOKEN", "dev-token"),
+        workspace_id=os.getenv("PORTARIUM_WORKSPACE_ID", "workspace-1"),
+        history_seconds=args.history,
+    )
+    started = time.monotonic()
+    with tracker:
+        s = tracker.stats()
+        print(f"Bootstrapped {s.robots} robot(s) from {s.events_applied} event(s) in {time.monotonic() - started:.2f}s")
+        while time.monotonic() - started < args.seconds:
+            t = time.perf_counter()
+            near = tracker.within_radius(args.frame, args.x, args.y, args.radius)
+            elapsed_us = (time.perf_counter() - t) * 1e6
+            line = f"  {len(near)} robot(s) within {args.radius:g} m of ({args.x:g}, {args.y:g}) [{elapsed_us:.0f} us]"
+            if args.map_layer:
+                t = time.perf_counter()
+                in_layer = tracker.in_map_layer(args.map_layer)
+                line += f"; {len(in_layer)} in {args.map_layer} [{(time.perf_counter() - t) * 1e6:.0f} us]"
+            print(line)
+            for p in near[:5]:
+                print(f"    {p.robot_id:<16} ({p.x:7.2f}, {p.y:7.2f})  yaw {p.yaw:+.2f}")
+            time.sleep(args.interval)
+        s = tracker.stats()
+
+    print("\n-- TRACKER SUMMARY " + "-" * 32)
+    print(f"  Robots:    {s.robots} in {s.grid_cells} grid cell(s)")
+    print(f"  Events:    {s.events_applied} applied, {s.events_stale} stale, {s.events_duplicate} duplicate, "
+          f"{s.events_invalid} invalid")
+    print(f"  Requests:  {s.pages_fetched} list page(s), {s.reconnects} stream reconnect(s)")
+
+
+if __name__ == "__main__":
+    main()
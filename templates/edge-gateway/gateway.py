@@ -0,0 +1,111 @@
+"""
+Edge gateway example: streams synthetic robot telemetry to Portarium.
+
+Usage:
+  python gateway.py --standin                  # against the in-process stand-in server
+  python gateway.py --target localhost:50051   # against a control plane
+
+PORTARIUM_TOKEN, PORTARIUM_WORKSPACE_ID and PORTARIUM_GATEWAY_ID configure the
+real connection. Progress is printed once per second.
+"""
+
+import argparse
+import math
+import os
+import time
+
+from dotenv import load_dotenv
+
+from portarium_standin import StandinTelemetryService, start_standin
+from portarium_telemetry import CONFLATE, DROP_NEWEST, DROP_OLDEST, BufferPolicy, TelemetryIngestClient
+
+load_dotenv()
+
+BUFFER_POLICIES = {
+    # Pose is a sample stream: under backpressure, keep the newest samples.
+    "pose": BufferPolicy(capacity=50_000, drop_policy=DROP_OLDEST),
+    # Only the latest battery state per robot matters.
+    "battery": BufferPolicy(capacity=5_000, drop_policy=CONFLATE),
+    # Diagnostics are events: keep what is already queued.
+    "diagnostics": BufferPolicy(capacity=20_000, drop_policy=DROP_NEWEST),
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stream synthetic robot telemetry to Portarium.")
+    parser.add_argument("--target", default=os.getenv("PORTARIUM_GRPC_TARGET", "localhost:50051"))
+    parser.add_argument("--standin", action="store_true", help="Start an in-process stand-in server.")
+    parser.add_argument("--robots", type=int, default=200, help="Simulated robots (default: 200).")
+    parser.add_argument("--rate", type=float, default=20_000, help="Frames per second to produce (default: 20000).")
+    parser.add_argument("--seconds", type=float, default=10, help="Run time (default: 10).")
+    parser.add_argument("--clock-skew", type=float, default=0.0, help="Stand-in server clock skew in seconds.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    server = standin = None
+    target = args.target
+    if args.standin:
+        server, target, standin = start_standin(
+            telemetry=StandinTelemetryService(clock_skew_seconds=args.clock_skew)
+        )
+        print(f"Stand-in TelemetryService on {target}")
+
+    client = TelemetryIngestClient(
+        target,
+        workspace_id=os.getenv("PORTARIUM_WORKSPACE_ID", "ws-demo"),
+        gateway_id=os.getenv("PORTARIUM_GATEWAY_ID", "gw-demo"),
+        token=os.getenv("PORTARIUM_TOKEN", "dev-token"),
+        buffer_policies=BUFFER_POLICIES,
+    )
+    robots = [f"robot-{i:04d}" for i in range(args.robots)]
+    interval = 1.0 / args.rate
+    started = next_report = time.monotonic()
+    produced = 0
+
+    with client:
+        while (now := time.monotonic()) - started < args.seconds:
+            # Produce in small bursts to hold the target rate without busy-waiting.
+            due = int((now - started) / interval) - produced
+            for _ in range(min(due, 1000)):
+                robot = robots[produced % len(robots)]
+                tick = produced // len(robots)
+                if tick % 50 == 0:
+                    client.submit(robot, "battery", {"soc": 0.9 - tick * 1e-5, "charging": False})
+                elif tick % 97 == 0:
+                    client.submit(robot, "diagnostics", {"level": "info", "code": "MOTOR_TEMP", "value": 41.5})
+                else:
+                    angle = tick * 0.01
+                    client.submit(robot, "pose", {"x": math.cos(angle), "y": math.sin(angle), "theta": angle})
+                produced += 1
+            if due <= 0:
+                time.sleep(interval * 100)
+            if now >= next_report:
+                next_report += 1.0
+                m = client.metrics()
+                print(
+                    f"  sent {m.frames_per_second:>9,.0f} frames/s  buffered {m.frames_buffered:>6}  "
+                    f"dropped {sum(m.dropped.values()):>6}  clock offset {m.clock.offset_seconds * 1000:+.1f} ms"
+                )
+    final = client.metrics()
+
+    elapsed = time.monotonic() - started
+    print("\n-- GATEWAY SUMMARY " + "-" * 32)
+    print(f"  Submitted: {final.frames_submitted:,} in {elapsed:.1f}s ({final.frames_submitted / elapsed:,.0f}/s)")
+    print(f"  Sent:      {final.frames_sent:,} frames, {final.bytes_sent / 1e6:.1f} MB in {final.batches_sent:,} batches")
+    print(f"  Accepted:  {final.frames_accepted:,}  rejected {final.frames_rejected:,}")
+    print(f"  Dropped:   {final.dropped or 'none'}")
+    rtt = final.clock.rtt_seconds
+    print(
+        f"  Clock:     offset {final.clock.offset_seconds * 1000:+.2f} ms"
+        + (f" (rtt {rtt * 1000:.2f} ms, {final.clock.samples} samples)" if rtt is not None else "")
+    )
+    if standin is not None:
+        s = standin.stats
+        print(f"  Server:    {s.frames:,} frames over {s.streams} stream(s), {s.sequence_gaps:,} sequence gaps")
+        server.stop(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,623 @@
+"""
+Portarium command dispatcher for edge gateways.
+
+Keeps one long-lived ``ControlService.StreamFeedback`` stream per gateway:
+
+- Commands arriving on the stream are deduplicated by ``idempotency_key`` in
+  a bounded LRU, acknowledged, and scheduled through a priority queue. Each
+  robot runs one command at a time. A ``COMMAND_PRIORITY_CRITICAL`` command
+  (e.g. ``estop``) preempts the robot's running and queued lower-priority
+  commands, and a worker is reserved for critical commands, so an estop never
+  waits behind long navigations.
+- Acks and feedback go through an outbox that writes them in batches. Progress
+  updates for the same robot and mission are conflated, and safety events and
+  terminal phases are flushed immediately.
+- ``metrics()`` reports queue depth, duplicates, preemptions, batching, and
+  latency percentiles: ack (receipt to ack written), queue wait, and command
+  round trip (control-plane send time to completion written).
+
+Commands carry no command ID on the stream, so every feedback message for a
+command is a ``MissionFeedback`` whose metadata holds its ``idempotency_key``
+and ``command_type``. The ack is phase ``MISSION_PHASE_QUEUED``.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+import grpc
+from google.protobuf import struct_pb2, timestamp_pb2
+
+from portarium.control.v1 import control_pb2, control_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+CRITICAL = control_pb2.COMMAND_PRIORITY_CRITICAL
+TERMINAL_PHASES = (
+    control_pb2.MISSION_PHASE_COMPLETED,
+    control_pb2.MISSION_PHASE_FAILED,
+    control_pb2.MISSION_PHASE_CANCELLED,
+)
+
+
+class CommandPreempted(Exception):
+    """Raised by ``Command.checkpoint()`` once the command has been preempted or cancelled."""
+
+
+@dataclass
+class LatencyStats:
+    count: int = 0
+    p50_ms: float | None = None
+    p99_ms: float | None = None
+    max_ms: float | None = None
+
+
+@dataclass
+class DispatcherMetrics:
+    commands_received: int = 0
+    commands_completed: int = 0
+    commands_failed: int = 0
+    commands_preempted: int = 0
+    duplicates: int = 0  # dropped by the idempotency cache
+    queue_depth: int = 0
+    messages_written: int = 0
+    batches_written: int = 0
+    messages_coalesced: int = 0  # progress updates replaced before they were written
+    reconnects: int = 0
+    ack: LatencyStats = field(default_factory=LatencyStats)
+    queue_wait: LatencyStats = field(default_factory=LatencyStats)
+    round_trip: LatencyStats = field(default_factory=LatencyStats)
+    round_trip_by_type: dict[str, LatencyStats] = field(default_factory=dict)
+
+
+class _LatencyWindow:
+    """Most recent samples, in seconds, for percentile reporting."""
+
+    def __init__(self, size: int = 4096) -> None:
+        self.samples: deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+
+    def stats(self) -> LatencyStats:
+        if not self.samples:
+            return LatencyStats(count=self.count)
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            return round(ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)] * 1000, 3)
+
+        return LatencyStats(count=self.count, p50_ms=pct(50), p99_ms=pct(99), max_ms=pct(100))
+
+
+def _timestamp(seconds: float) -> timestamp_pb2.Timestamp:
+    whole = int(seconds)
+    return timestamp_pb2.Timestamp(seconds=whole, nanos=int((seconds - whole) * 1e9))
+
+
+class Command:
+    """A command being executed, handed to the registered handler.
+
+    Handlers should call ``checkpoint()`` (or check ``cancelled``) between
+    steps so that an estop or cancellation stops them promptly.
+    """
+
+    def __init__(self, dispatcher: "CommandDispatcher", request: control_pb2.DispatchCommandRequest,
+                 sent_at: float | None) -> None:
+        self.request = request
+        self.cancelled = threading.Event()
+        self.cancel_reason = ""
+        self.received_at = time.monotonic()
+        self.sent_at = sent_at  # control-plane send time, epoch seconds
+        self.priority = request.priority or control_pb2.COMMAND_PRIORITY_NORMAL
+        self._dispatcher = dispatcher
+
+    @property
+    def robot_id(self) -> str:
+        return self.request.robot_id
+
+    @property
+    def key(self) -> str:
+        return self.request.idempotency_key
+
+    def checkpoint(self) -> None:
+        if self.cancelled.is_set():
+            raise CommandPreempted(self.cancel_reason)
+
+    def progress(self, progress_pct: float, detail: str = "",
+                 phase: int = control_pb2.MISSION_PHASE_EXECUTING_ACTION) -> None:
+        """Report progress; updates are conflated until the next batch is written."""
+        self._dispatcher._feedback(self, phase, detail, progress_pct=progress_pct)
+
+    def navigation(self, x: float, y: float, yaw: float, remaining_distance: float,
+                   estimated_time_remaining: float) -> None:
+        """Report navigation progress; conflated like ``progress()``."""
+        self._dispatcher._navigation(self, control_pb2.NavigationProgress(
+            mission_id=self.request.mission_id, current_x=x, current_y=y, current_yaw=yaw,
+            remaining_distance=remaining_distance, estimated_time_remaining=estimated_time_remaining,
+        ))
+
+    def _cancel(self, reason: str) -> None:
+        self.cancel_reason = reason
+        self.cancelled.set()
+
+
+class _Outbox:
+    """Pending feedback, written in batches.
+
+    Entries are ``(message, on_written)``; conflated entries share a key and
+    keep the position of the first one queued.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int) -> None:
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.cond = threading.Condition()
+        self.pending: OrderedDict[Any, tuple] = OrderedDict()
+        self.first_at: float | None = None
+        self.urgent = False
+        self.closed = False
+        self.coalesced = 0
+        self._ids = itertools.count()
+
+    def put(self, message, on_written: Callable[[], None] | None = None, *,
+            conflate_key: Any = None, urgent: bool = False) -> None:
+        with self.cond:
+            key = conflate_key if conflate_key is not None else next(self._ids)
+            if key in self.pending:
+                self.coalesced += 1
+            self.pending[key] = (message, on_written)
+            if self.first_at is None:
+                self.first_at = time.monotonic()
+            if urgent or len(self.pending) >= self.max_batch:
+                self.urgent = True
+                self.cond.notify()
+            elif len(self.pending) == 1:
+                self.cond.notify()
+
+    def take(self, ended: threading.Event) -> list[tuple] | None:
+        """Wait for a batch of ``(key, message, on_written)`` to be due.
+
+        Returns None once closed and empty, or once ``ended`` is set.
+        """
+        with self.cond:
+            while True:
+                if ended.is_set():
+                    return None
+                if self.pending and (self.urgent or self.closed):
+                    break
+                if not self.pending:
+                    if self.closed:
+                        return None
+                    self.cond.wait()
+                    continue
+                wait = self.first_at + self.flush_interval - time.monotonic()
+                if wait <= 0:
+                    break
+                self.cond.wait(wait)
+            batch = [(key, *entry) for key, entry in self.pending.items()]
+            self.pending.clear()
+            self.first_at = None
+            self.urgent = False
+            return batch
+
+    def requeue(self, entries: list[tuple]) -> None:
+        """Put unconfirmed entries back at the front, unless a newer conflated one is queued."""
+        with self.cond:
+            for key, message, on_written in reversed(entries):
+                if key in self.pending:
+                    continue
+                self.pending[key] = (message, on_written)
+                self.pending.move_to_end(key, last=False)
+            if self.pending:
+                self.first_at = self.first_at or time.monotonic()
+                self.urgent = True
+            self.cond.notify_all()
+
+    def wake(self) -> None:
+        with self.cond:
+            self.cond.notify_all()
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class _Handoff:
+    """One call's view of the outbox.
+
+    ``unconfirmed`` holds the entries taken for the call that gRPC has not
+    asked past yet. When the call ends they go back to the outbox, so the
+    next call writes them instead of a dead one swallowing them.
+    """
+
+    def __init__(self, outbox: _Outbox) -> None:
+        self.outbox = outbox
+        self.lock = threading.Lock()
+        self.ended = threading.Event()
+        self.unconfirmed: list[tuple] = []
+
+    def end(self) -> None:
+        with self.lock:
+            self.ended.set()
+            entries, self.unconfirmed = self.unconfirmed, []
+        if entries:
+            self.outbox.requeue(entries)
+        self.outbox.wake()
+
+
+class CommandDispatcher:
+    """Bidirectional StreamFeedback client with priority command scheduling.
+
+    Args:
+        target: gRPC target such as ``"localhost:50051"``; ignored if ``channel`` is given.
+        workspace_id: Workspace the gateway belongs to.
+        gateway_id: Identifier of this edge gateway.
+        token: Workspace-scoped bearer token sent as call metadata.
+        channel: An existing channel to use instead of ``target``.
+        workers: Threads executing commands of any priority.
+        flush_interval_seconds: Longest time feedback waits to be batched.
+        max_batch: Feedback messages that force a write.
+        idempotency_cache_size: Idempotency keys remembered (LRU).
+        clock_offset_seconds: Server clock minus gateway clock, for round-trip
+            latency; e.g. ``TelemetryIngestClient.metrics().clock.offset_seconds``.
+        on_config: Called with the ``Struct`` of each ConfigUpdate.
+    """
+
+    def __init__(
+        self,
+        target: str | None,
+        workspace_id: str,
+        gateway_id: str,
+        token: str,
+        *,
+        channel: grpc.Channel | None = None,
+        workers: int = 4,
+        flush_interval_seconds: float = 0.01,
+        max_batch: int = 256,
+        idempotency_cache_size: int = 10_000,
+        clock_offset_seconds: float = 0.0,
+        on_config: Callable[[struct_pb2.Struct], None] | None = None,
+    ) -> None:
+        if channel is None:
+            channel = grpc.insecure_channel(
+                target,
+                options=[
+                    ("grpc.keepalive_time_ms", 10_000),
+                    ("grpc.keepalive_permit_without_calls", 1),
+                ],
+            )
+            self._owns_channel = True
+        else:
+            self._owns_channel = False
+        self._channel = channel
+        self._stub = control_pb2_grpc.ControlServiceStub(channel)
+        self._metadata = (("authorization", f"Bearer {token}"), ("x-workspace-id", workspace_id))
+        self._workspace_id = workspace_id
+        self._gateway_id = gateway_id
+        self._workers = workers
+        self._cache_size = idempotency_cache_size
+        self.clock_offset_seconds = clock_offset_seconds
+        self._on_config = on_config
+        self._handlers: dict[str, Callable[[Command], str | None]] = {}
+
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._queue: list[tuple[int, int, Command]] = []  # (-priority, arrival, command)
+        self._arrivals = itertools.count()
+        self._running: dict[str, list[Command]] = {}  # robot_id -> commands executing
+        self._seen: OrderedDict[str, int] = OrderedDict()  # idempotency_key -> last phase sent
+        self._outbox = _Outbox(flush_interval_seconds, max_batch)
+        self._metrics = DispatcherMetrics()
+        self._ack = _LatencyWindow()
+        self._queue_wait = _LatencyWindow()
+        self._round_trip = _LatencyWindow()
+        self._round_trip_by_type: dict[str, _LatencyWindow] = {}
+        self._call = None
+        self._closing = False
+        self._threads: list[threading.Thread] = []
+
+    def register(self, command_type: str, handler: Callable[[Command], str | None]) -> None:
+        """Run ``handler(command)`` for commands of ``command_type``.
+
+        The handler's return value becomes the completion detail. Raising
+        ``CommandPreempted`` reports the command as cancelled, and any other
+        exception reports it as failed.
+        """
+        self._handlers[command_type] = handler
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self) -> "CommandDispatcher":
+        self._threads = [threading.Thread(target=self._stream_loop, name="control-stream", daemon=True)]
+        self._threads.append(
+            threading.Thread(target=self._worker, args=(True,), name="control-critical", daemon=True)
+        )
+        for i in range(self._workers):
+            self._threads.append(threading.Thread(target=self._worker, args=(False,), name=f"control-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self, timeout: float = 5.0) -> DispatcherMetrics:
+        """Cancel outstanding commands, flush feedback and close the stream."""
+        with self._work:
+            self._closing = True
+            for _, _, command in self._queue:
+                command._cancel("gateway shutting down")
+            for commands in self._running.values():
+                for command in commands:
+                    command._cancel("gateway shutting down")
+            self._work.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads[1:]:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self._outbox.close()
+        self._threads[0].join(max(deadline - time.monotonic(), 0))
+        if self._call is not None:
+            self._call.cancel()
+        if self._owns_channel:
+            self._channel.close()
+        return self.metrics()
+
+    def __enter__(self) -> "CommandDispatcher":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def metrics(self) -> DispatcherMetrics:
+        with self._lock:
+            metrics = DispatcherMetrics(**{
+                name: getattr(self._metrics, name)
+                for name in ("commands_received", "commands_completed", "commands_failed",
+                             "commands_preempted", "duplicates", "reconnects")
+            })
+            metrics.queue_depth = len(self._queue)
+            metrics.ack = self._ack.stats()
+            metrics.queue_wait = self._queue_wait.stats()
+            metrics.round_trip = self._round_trip.stats()
+            metrics.round_trip_by_type = {t: w.stats() for t, w in self._round_trip_by_type.items()}
+        metrics.messages_written = self._metrics.messages_written
+        metrics.batches_written = self._metrics.batches_written
+        metrics.messages_coalesced = self._outbox.coalesced
+        return metrics
+
+    # -- gateway-originated events -------------------------------------------
+
+    def safety_event(self, robot_id: str, event_type: int, detail: str = "",
+                     metadata: dict[str, Any] | None = None) -> None:
+        """Report a safety event; written immediately, ahead of the batch timer."""
+        event = control_pb2.SafetyEvent(robot_id=robot_id, event_type=event_type, detail=detail)
+        if metadata:
+            event.metadata.update(metadata)
+        self._outbox.put(self._message(robot_id, safety_event=event), urgent=True)
+
+    # -- stream --------------------------------------------------------------
+
+    def _message(self, robot_id: str, **payload) -> control_pb2.FeedbackMessage:
+        return control_pb2.FeedbackMessage(
+            workspace_id=self._workspace_id,
+            gateway_id=self._gateway_id,
+            robot_id=robot_id,
+            timestamp=_timestamp(time.time()),
+            **payload,
+        )
+
+    def _outgoing(self, handoff: _Handoff) -> Iterator[control_pb2.FeedbackMessage]:
+        while True:
+            batch = self._outbox.take(handoff.ended)
+            if batch is None:
+                return
+            with handoff.lock:
+                if handoff.ended.is_set():
+                    self._outbox.requeue(batch)
+                    return
+                handoff.unconfirmed = list(batch)
+            for _, message, _ in batch:
+                yield message
+                # gRPC asks for the next message once this one is written.
+                with handoff.lock:
+                    if handoff.ended.is_set():
+                        return
+                    _, _, on_written = handoff.unconfirmed.pop(0)
+                if on_written is not None:
+                    on_written()
+                self._metrics.messages_written += 1
+            self._metrics.batches_written += 1
+
+    def _stream_loop(self) -> None:
+        backoff = 0.5
+        while not self._closing:
+            handoff = _Handoff(self._outbox)
+            try:
+                self._call = self._stub.StreamFeedback(self._outgoing(handoff), metadata=self._metadata,
+                                                       wait_for_ready=True)
+                for message in self._call:
+                    self._receive(message)
+                    backoff = 0.5
+                if self._closing:
+                    return
+                logger.warning("Control stream ended by the server; reconnecting in %.1fs", backoff)
+            except grpc.RpcError as exc:
+                if self._closing:
+                    return
+                if exc.code() not in RETRYABLE_CODES:
+                    logger.error("Control stream failed: %s %s", exc.code(), exc.details())
+                    return
+                logger.warning("Control stream interrupted (%s); reconnecting in %.1fs", exc.code(), backoff)
+            finally:
+                handoff.end()
+            with self._lock:
+                self._metrics.reconnects += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _receive(self, message: control_pb2.ControlMessage) -> None:
+        kind = message.WhichOneof("payload")
+        if kind == "command":
+            sent_at = None
+            if message.HasField("timestamp"):
+                sent_at = message.timestamp.seconds + message.timestamp.nanos / 1e9 - self.clock_offset_seconds
+            self._accept(Command(self, message.command, sent_at))
+        elif kind == "cancellation":
+            self._cancel_mission(message.cancellation.mission_id, message.cancellation.reason)
+        elif kind == "config_update" and self._on_config is not None:
+            self._on_config(message.config_update.config)
+
+    # -- scheduling ----------------------------------------------------------
+
+    def _accept(self, command: Command) -> None:
+        with self._work:
+            self._metrics.commands_received += 1
+            key = command.key
+            if key and key in self._seen:
+                # A redelivery, e.g. after a reconnect: re-send the latest phase, do not run again.
+                self._seen.move_to_end(key)
+                self._metrics.duplicates += 1
+                phase = self._seen[key]
+            else:
+                phase = None
+                if key:
+                    self._seen[key] = control_pb2.MISSION_PHASE_QUEUED
+                    while len(self._seen) > self._cache_size:
+                        self._seen.popitem(last=False)
+                if command.priority >= CRITICAL:
+                    self._preempt(command.robot_id, command.priority,
+                                  f"preempted by {command.request.command_type or 'critical command'}")
+                heapq.heappush(self._queue, (-command.priority, next(self._arrivals), command))
+                self._work.notify_all()
+        if phase is None:
+            self._feedback(command, control_pb2.MISSION_PHASE_QUEUED, "accepted",
+                           on_written=lambda: self._record(self._ack, time.monotonic() - command.received_at),
+                           urgent=command.priority >= CRITICAL)
+        else:
+            self._feedback(command, phase, "duplicate")
+
+    def _preempt(self, robot_id: str, priority: int, reason: str) -> None:
+        """Cancel the robot's lower-priority work; callers hold the lock."""
+        # Cancelled entries stay queued and are reported as soon as a worker pops them.
+        for command in self._running.get(robot_id, []) + [entry[2] for entry in self._queue]:
+            if command.robot_id == robot_id and command.priority < priority:
+                command._cancel(reason)
+
+    def _cancel_mission(self, mission_id: str, reason: str) -> None:
+        with self._work:
+            running = [c for commands in self._running.values() for c in commands]
+            for command in [c for _, _, c in self._queue] + running:
+                if command.request.mission_id == mission_id:
+                    command._cancel(reason or "mission cancelled")
+            self._work.notify_all()
+
+    def _next_command(self, critical_only: bool) -> Command | None:
+        """Pop the highest-priority command whose robot is idle; None on close."""
+        with self._work:
+            while True:
+                if self._closing and not any(c.cancelled.is_set() for _, _, c in self._queue):
+                    return None
+                skipped, found = [], None
+                while self._queue:
+                    entry = heapq.heappop(self._queue)
+                    command = entry[2]
+                    if command.cancelled.is_set():
+                        found = command  # report the cancellation without running it
+                        break
+                    if critical_only and command.priority < CRITICAL:
+                        skipped.append(entry)
+                        break  # nothing more urgent is queued
+                    # A critical command may start while preempted work is still winding down.
+                    if any(not r.cancelled.is_set() or command.priority < CRITICAL
+                           for r in self._running.get(command.robot_id, ())):
+                        skipped.append(entry)
+                        continue
+                    found = command
+                    break
+                for entry in skipped:
+                    heapq.heappush(self._queue, entry)
+                if found is not None:
+                    if not found.cancelled.is_set():
+                        self._running.setdefault(found.robot_id, []).append(found)
+                    return found
+                self._work.wait()
+
+    def _worker(self, critical_only: bool) -> None:
+        while (command := self._next_command(critical_only)) is not None:
+            if command.cancelled.is_set():
+                self._finish(command, control_pb2.MISSION_PHASE_CANCELLED, command.cancel_reason, running=False)
+                continue
+            self._record(self._queue_wait, time.monotonic() - command.received_at)
+            handler = self._handlers.get(command.request.command_type)
+            if handler is None:
+                self._finish(command, control_pb2.MISSION_PHASE_FAILED,
+                             f"unsupported command type {command.request.command_type!r}")
+                continue
+            try:
+                detail = handler(command)
+            except CommandPreempted as exc:
+                self._finish(command, control_pb2.MISSION_PHASE_CANCELLED, str(exc) or command.cancel_reason)
+            except Exception as exc:
+                logger.exception("Command %s failed", command.key or command.request.command_type)
+                self._finish(command, control_pb2.MISSION_PHASE_FAILED, str(exc))
+            else:
+                self._finish(command, control_pb2.MISSION_PHASE_COMPLETED, detail or "")
+
+    def _finish(self, command: Command, phase: int, detail: str, *, running: bool = True) -> None:
+        with self._work:
+            commands = self._running.get(command.robot_id, [])
+            if running and command in commands:
+                commands.remove(command)
+                if not commands:
+                    del self._running[command.robot_id]
+            if phase == control_pb2.MISSION_PHASE_COMPLETED:
+                self._metrics.commands_completed += 1
+            elif phase == control_pb2.MISSION_PHASE_FAILED:
+                self._metrics.commands_failed += 1
+            else:
+                self._metrics.commands_preempted += 1
+            self._work.notify_all()
+
+        def written() -> None:
+            if command.sent_at is not None:
+                elapsed = time.time() - command.sent_at
+                window = self._round_trip_by_type.setdefault(command.request.command_type, _LatencyWindow())
+                self._record(self._round_trip, elapsed)
+                self._record(window, elapsed)
+
+        self._feedback(command, phase, detail, on_written=written, urgent=True)
+
+    # -- feedback ------------------------------------------------------------
+
+    def _record(self, window: _LatencyWindow, seconds: float) -> None:
+        with self._lock:
+            window.add(seconds)
+
+    def _feedback(self, command: Command, phase: int, detail: str, *, progress_pct: float | None = None,
+                  on_written: Callable[[], None] | None = None, urgent: bool = False) -> None:
+        feedback = control_pb2.MissionFeedback(mission_id=command.request.mission_id, phase=phase, detail=detail)
+        if progress_pct is not None:
+            feedback.progress_pct = progress_pct
+        elif phase == control_pb2.MISSION_PHASE_COMPLETED:
+            feedback.progress_pct = 1.0
+        feedback.metadata.update({"idempotency_key": command.key, "command_type": command.request.command_type})
+        if command.key and phase != control_pb2.MISSION_PHASE_QUEUED:
+            with self._lock:
+                if command.key in self._seen:
+                    self._seen[command.key] = phase
+        # Progress is conflated per command; acks and terminal phases never are.
+        conflate = (command.robot_id, command.key, "progress") if progress_pct is not None else None
+        self._outbox.put(self._message(command.robot_id, mission_feedback=feedback), on_written,
+                         conflate_key=conflate, urgent=urgent or phase in TERMINAL_PHASES)
+
+    def _navigation(self, command: Command, progress: control_pb2.NavigationProgress) -> None:
+        self._outbox.put(self._message(command.robot_id, navigation_progress=progress),
+                         conflate_key=(command.robot_id, command.key, "navigation"))
@@ -0,0 +1,457 @@
+"""
+Live robot positions from Portarium location events, with a spatial index.
+
+``LocationTracker`` keeps the latest pose of every robot in memory and
+answers spatial queries without going back to the control plane:
+
+- On start it bootstraps from ``GET /v1/workspaces/:ws/location-events``,
+  paging forward by ``observedAtIso`` over a bounded history window.
+- It then tails ``GET /v1/workspaces/:ws/location-events:stream`` (SSE).
+  Whenever the stream ends or fails, it reconnects with ``Last-Event-ID``
+  (if the server sent IDs) and first catches up through the list endpoint
+  from the newest observation it has, so no update is lost in the gap.
+- Each update moves one robot between the cells of a uniform grid per
+  coordinate frame. ``within_radius()`` only visits the cells that overlap
+  the query circle, and ``in_map_layer()`` reads the frame's robot set.
+
+Memory is bounded by the number of robots: one ``RobotPosition`` and one
+grid entry per robot, plus a fixed-size window of recent event IDs used to
+drop events seen on both the stream and the list endpoint.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PAGE_LIMIT = 5_000  # the control plane's maximum page size
+# Longest list window the control plane accepts (maxHistoryWindowHours); it
+# answers 400 for anything wider.
+MAX_HISTORY_SECONDS = 7 * 24 * 3600
+
+
+@dataclass(frozen=True)
+class RobotPosition:
+    robot_id: str  # robotId, or assetId for assets without a robot
+    asset_id: str
+    coordinate_frame: str
+    x: float
+    y: float
+    z: float
+    yaw: float
+    observed_at: float  # epoch seconds
+    location_event_id: str
+
+
+@dataclass
+class TrackerStats:
+    events_applied: int = 0
+    events_stale: int = 0  # older than the position already held
+    events_duplicate: int = 0
+    events_invalid: int = 0
+    pages_fetched: int = 0
+    reconnects: int = 0
+    robots: int = 0
+    grid_cells: int = 0
+    last_observed_at: float | None = None
+    stream_metadata: dict[str, Any] = field(default_factory=dict)  # latest stream-metadata event
+
+
+def _epoch(iso: str) -> float:
+    return datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp()
+
+
+def _iso(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class GridIndex:
+    """Latest position per robot in a uniform grid, one grid per coordinate frame.
+
+    Not thread-safe; ``LocationTracker`` serializes access.
+
+    Args:
+        cell_size: Cell edge in metres. Pick roughly the typical query radius.
+    """
+
+    def __init__(self, cell_size: float = 5.0) -> None:
+        self.cell_size = cell_size
+        self.positions: dict[str, RobotPosition] = {}
+        self._cells: dict[tuple[str, int, int], set[str]] = {}
+        self._frames: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _cell(self, position: RobotPosition) -> tuple[str, int, int]:
+        return (
+            position.coordinate_frame,
+            math.floor(position.x / self.cell_size),
+            math.floor(position.y / self.cell_size),
+        )
+
+    def _discard(self, key: tuple, robot_id: str, index: dict) -> None:
+        members = index.get(key)
+        if members is not None:
+            members.discard(robot_id)
+            if not members:
+                del index[key]
+
+    def update(self, position: RobotPosition) -> bool:
+        """Store the position unless an equal or newer one is held; returns whether it was stored."""
+        previous = self.positions.get(position.robot_id)
+        if previous is not None:
+            if previous.observed_at >= position.observed_at:
+                return False
+            old_cell, new_cell = self._cell(previous), self._cell(position)
+            if old_cell != new_cell:
+                self._discard(old_cell, position.robot_id, self._cells)
+                self._cells.setdefault(new_cell, set()).add(position.robot_id)
+            if previous.coordinate_frame != position.coordinate_frame:
+                self._discard(previous.coordinate_frame, position.robot_id, self._frames)
+                self._frames.setdefault(position.coordinate_frame, set()).add(position.robot_id)
+        else:
+            self._cells.setdefault(self._cell(position), set()).add(position.robot_id)
+            self._frames.setdefault(position.coordinate_frame, set()).add(position.robot_id)
+        self.positions[position.robot_id] = position
+        return True
+
+    def remove(self, robot_id: str) -> None:
+        position = self.positions.pop(robot_id, None)
+        if position is not None:
+            self._discard(self._cell(position), robot_id, self._cells)
+            self._discard(position.coordinate_frame, robot_id, self._frames)
+
+    def within_radius(self, coordinate_frame: str, x: float, y: float, radius: float) -> list[RobotPosition]:
+        """Robots in ``coordinate_frame`` within ``radius`` metres of (x, y), nearest first."""
+        size = self.cell_size
+        x0, x1 = math.floor((x - radius) / size), math.floor((x + radius) / size)
+        y0, y1 = math.floor((y - radius) / size), math.floor((y + radius) / size)
+        members = self._frames.get(coordinate_frame, ())
+        if (x1 - x0 + 1) * (y1 - y0 + 1) >= len(members):
+            # A query wider than the fleet is cheaper as a scan of the frame.
+            candidates = members
+        else:
+            candidates = [
+                robot_id
+                for cx in range(x0, x1 + 1)
+                for cy in range(y0, y1 + 1)
+                for robot_id in self._cells.get((coordinate_frame, cx, cy), ())
+            ]
+        limit = radius * radius
+        hits = []
+        for robot_id in candidates:
+            p = self.positions[robot_id]
+            d2 = (p.x - x) ** 2 + (p.y - y) ** 2
+            if d2 <= limit:
+                hits.append((d2, p))
+        hits.sort(key=lambda hit: hit[0])
+        return [p for _, p in hits]
+
+    def in_frame(
+        self, coordinate_frame: str, bounds: tuple[float, float, float, float] | None = None
+    ) -> list[RobotPosition]:
+        """Robots in ``coordinate_frame``, optionally inside ``(min_x, min_y, max_x, max_y)``."""
+        positions = [self.positions[r] for r in self._frames.get(coordinate_frame, ())]
+        if bounds is None:
+            return positions
+        min_x, min_y, max_x, max_y = bounds
+        return [p for p in positions if min_x <= p.x <= max_x and min_y <= p.y <= max_y]
+
+    @property
+    def cells(self) -> int:
+        return len(self._cells)
+
+
+class LocationTracker:
+    """Bootstraps, tails and indexes a workspace's location events.
+
+    Args:
+        base_url: Control plane URL, e.g. ``"http://localhost:8080"``.
+        token: Workspace-scoped bearer token.
+        workspace_id: Workspace to track.
+        purpose: Location telemetry access purpose sent with every request.
+        asset_id: Narrow the live stream to one asset. The catch-up queries
+            are never narrowed, so other robots still update between streams.
+        history_seconds: How far back the bootstrap and catch-ups read. Capped
+            at seven days, the widest window the control plane serves.
+        cell_size: Grid cell edge in metres.
+        stale_after_seconds: ``positions()`` and the queries skip robots not
+            seen for this long; None keeps every robot.
+        reconnect_delay_seconds: Wait before reconnecting a stream that ended
+            cleanly; the server's ``retry:`` field overrides it. Failures back
+            off exponentially from this value.
+        recent_event_ids: Event IDs remembered for deduplication.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        workspace_id: str,
+        *,
+        purpose: str = "operations",
+        asset_id: str | None = None,
+        history_seconds: float = 3600.0,
+        cell_size: float = 5.0,
+        stale_after_seconds: float | None = None,
+        reconnect_delay_seconds: float = 1.0,
+        recent_event_ids: int = 10_000,
+    ) -> None:
+        self._http = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {token}", "X-Workspace-Id": workspace_id},
+            timeout=httpx.Timeout(30.0, read=None),  # SSE reads block until the next event
+        )
+        self._path = f"/v1/workspaces/{workspace_id}"
+        self._purpose = purpose
+        self._asset_id = asset_id
+        self._history_seconds = history_seconds
+        self._stale_after = stale_after_seconds
+        self._reconnect_delay = reconnect_delay_seconds
+        self._recent_limit = recent_event_ids
+
+        self._lock = threading.Lock()
+        self._index = GridIndex(cell_size)
+        self._recent: OrderedDict[str, None] = OrderedDict()
+        self._layers: dict[str, dict[str, Any]] = {}
+        self._stats = TrackerStats()
+        self._last_event_id: str | None = None
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._response: httpx.Response | None = None
+        self._thread: threading.Thread | None = None
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self, wait: bool = True, timeout: float = 60.0) -> "LocationTracker":
+        """Start the tail thread; by default, wait for the bootstrap to finish."""
+        self._thread = threading.Thread(target=self._run, name="location-tracker", daemon=True)
+        self._thread.start()
+        if wait and not self._ready.wait(timeout):
+            raise TimeoutError("location bootstrap did not finish in time")
+        return self
+
+    def close(self) -> None:
+        self._stopped.set()
+        response = self._response
+        if response is not None:
+            response.close()  # unblocks the SSE read
+        if self._thread is not None:
+            self._thread.join(5.0)
+        self._http.close()
+
+    def __enter__(self) -> "LocationTracker":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # -- queries -------------------------------------------------------------
+
+    def _fresh(self, positions: list[RobotPosition]) -> list[RobotPosition]:
+        if self._stale_after is None:
+            return positions
+        cutoff = time.time() - self._stale_after
+        return [p for p in positions if p.observed_at >= cutoff]
+
+    def position(self, robot_id: str) -> RobotPosition | None:
+        with self._lock:
+            return self._index.positions.get(robot_id)
+
+    def positions(self) -> list[RobotPosition]:
+        with self._lock:
+            return self._fresh(list(self._index.positions.values()))
+
+    def within_radius(self, coordinate_frame: str, x: float, y: float, radius: float) -> list[RobotPosition]:
+        """Robots within ``radius`` metres of (x, y) in a coordinate frame, nearest first."""
+        with self._lock:
+            return self._fresh(self._index.within_radius(coordinate_frame, x, y, radius))
+
+    def in_map_layer(
+        self, map_layer_id: str, bounds: tuple[float, float, float, float] | None = None
+    ) -> list[RobotPosition]:
+        """Robots in the layer's coordinate frame, optionally inside ``(min_x, min_y, max_x, max_y)``.
+
+        Map layers are fetched once and cached; call ``refresh_map_layers()``
+        after layers change.
+        """
+        if not self._layers:
+            self.refresh_map_layers()
+        layer = self._layers.get(map_layer_id)
+        if layer is None:
+            raise KeyError(f"unknown map layer {map_layer_id!r}")
+        with self._lock:
+            return self._fresh(self._index.in_frame(layer["coordinateFrame"], bounds))
+
+    def refresh_map_layers(self) -> dict[str, dict[str, Any]]:
+        layers: dict[str, dict[str, Any]] = {}
+        for item in self._list("map-layers", {}):
+            layers[item["mapLayerId"]] = item
+        self._layers = layers
+        return layers
+
+    def stats(self) -> TrackerStats:
+        with self._lock:
+            stats = TrackerStats(**{k: v for k, v in vars(self._stats).items()})
+            stats.robots = len(self._index)
+            stats.grid_cells = self._index.cells
+            stats.stream_metadata = dict(self._stats.stream_metadata)
+            return stats
+
+    # -- ingestion -----------------------------------------------------------
+
+    def _apply(self, event: dict[str, Any]) -> None:
+        try:
+            pose = event["pose"]
+            position = RobotPosition(
+                robot_id=event.get("robotId") or event["assetId"],
+                asset_id=event["assetId"],
+                coordinate_frame=event["coordinateFrame"],
+                x=float(pose["x"]),
+                y=float(pose["y"]),
+                z=float(pose.get("z", 0.0)),
+                yaw=float(pose.get("yawRadians", 0.0)),
+                observed_at=_epoch(event["observedAtIso"]),
+                location_event_id=event["locationEventId"],
+            )
+        except (KeyError, TypeError, ValueError):
+            with self._lock:
+                self._stats.events_invalid += 1
+            return
+        with self._lock:
+            stats = self._stats
+            if position.location_event_id in self._recent:
+                stats.events_duplicate += 1
+                return
+            self._recent[position.location_event_id] = None
+            if len(self._recent) > self._recent_limit:
+                self._recent.popitem(last=False)
+            if self._index.update(position):
+                stats.events_applied += 1
+            else:
+                stats.events_stale += 1
+            if stats.last_observed_at is None or position.observed_at > stats.last_observed_at:
+                stats.last_observed_at = position.observed_at
+
+    def _list(self, resource: str, params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        response = self._http.get(f"{self._path}/{resource}", params={"purpose": self._purpose, **params})
+        response.raise_for_status()
+        with self._lock:
+            self._stats.pages_fetched += 1
+        yield from response.json().get("items", [])
+
+    def _catch_up(self, since: float) -> None:
+        """Apply every event observed from ``since`` until now, a page at a time.
+
+        Pages are walked by ``observedAtIso`` rather than by cursor. The window
+        is inclusive, so the last timestamp of each page is read again and its
+        events are dropped as duplicates.
+        """
+        until_ts = time.time() + 1
+        until = _iso(until_ts)
+        since_iso = _iso(max(since, until_ts - MAX_HISTORY_SECONDS))
+        while not self._stopped.is_set():
+            page = list(self._list(
+                "location-events", {"fromIso": since_iso, "toIso": until, "limit": PAGE_LIMIT}
+            ))
+            with self._lock:
+                new = [e for e in page if e.get("locationEventId") not in self._recent]
+            for event in new:
+                self._apply(event)
+            if len(page) < PAGE_LIMIT:
+                return
+            if not new:
+                logger.warning("More than %d location events at %s; skipping ahead", PAGE_LIMIT, since_iso)
+                since_iso = _iso(_epoch(since_iso) + 0.001)
+                continue
+            since_iso = page[-1]["observedAtIso"]
+
+    def _stream(self) -> float | None:
+        """Tail the SSE stream until it ends; returns the server's retry hint, if any."""
+        params = {"purpose": self._purpose}
+        if self._asset_id:
+            params["assetId"] = self._asset_id
+        headers = {"Accept": "text/event-stream"}
+        if self._last_event_id:
+            headers["Last-Event-ID"] = self._last_event_id
+        retry = None
+        with self._http.stream("GET", f"{self._path}/location-events:stream", params=params, headers=headers) as response:
+            self._response = response
+            response.raise_for_status()
+            event, data = "message", []
+            for line in response.iter_lines():
+                if self._stopped.is_set():
+                    break
+                if not line:
+                    if data:
+                        self._dispatch(event, "\n".join(data))
+                    event, data = "message", []
+                elif line.startswith(":"):
+                    continue  # comment / keep-alive
+                else:
+                    name, _, value = line.partition(":")
+                    value = value[1:] if value.startswith(" ") else value
+                    if name == "event":
+                        event = value
+                    elif name == "data":
+                        data.append(value)
+                    elif name == "id":
+                        self._last_event_id = value
+                    elif name == "retry" and value.isdigit():
+                        retry = int(value) / 1000
+        self._response = None
+        return retry
+
+    def _dispatch(self, event: str, data: str) -> None:
+        try:
+            payload = json.loads(data)
+        except json.JSONDecodeError:
+            with self._lock:
+                self._stats.events_invalid += 1
+            return
+        if event == "stream-metadata" and isinstance(payload, dict):
+            with self._lock:
+                self._stats.stream_metadata = payload
+        elif event in ("location", "message") and isinstance(payload, dict):
+            self._apply(payload)
+
+    def _run(self) -> None:
+        backoff = self._reconnect_delay
+        while not self._stopped.is_set():
+            try:
+                # Catch up from the newest observation held, then tail live. An
+                # idle fleet's newest observation can be older than the window
+                # the server serves, so never reach back past the history window.
+                since = time.time() - min(self._history_seconds, MAX_HISTORY_SECONDS)
+                last = self._stats.last_observed_at
+                self._catch_up(max(last, since) if last is not None else since)
+                self._ready.set()
+                retry = self._stream()
+                backoff = self._reconnect_delay
+                delay = retry if retry is not None else self._reconnect_delay
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code in (401, 403, 404):
+                    logger.error("Location tracking stopped: HTTP %s", exc.response.status_code)
+                    self._ready.set()
+                    return
+                delay, backoff = backoff, min(backoff * 2, 30.0)
+                logger.warning("Location stream failed (HTTP %s); retrying in %.1fs",
+                               exc.response.status_code, delay)
+            except httpx.HTTPError as exc:
+                if self._stopped.is_set():
+                    return
+                delay, backoff = backoff, min(backoff * 2, 30.0)
+                logger.warning("Location stream interrupted (%s); retrying in %.1fs", exc, delay)
+            with self._lock:
+                self._stats.reconnects += 1
+            self._stopped.wait(delay)
@@ -0,0 +1,281 @@
+"""
+In-process stand-in for the Portarium gRPC services.
+
+Runs a real ``grpc.server`` on localhost so the gateway clients can be
+exercised end to end without a control plane: in tests, in load runs
+(``gateway.py --standin``) and while developing against the protos.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from concurrent import futures
+from dataclasses import dataclass, field
+from typing import Any
+
+import grpc
+from google.protobuf import timestamp_pb2
+
+from portarium.control.v1 import control_pb2, control_pb2_grpc
+from portarium.telemetry.v1 import telemetry_pb2, telemetry_pb2_grpc
+
+
+@dataclass
+class IngestStats:
+    streams: int = 0
+    frames: int = 0
+    bytes: int = 0
+    sequence_gaps: int = 0  # frames missing per (robot, type), e.g. dropped at the gateway
+    subscribers: int = 0  # open StreamTelemetry calls
+    fanout_dropped: int = 0  # frames not delivered to a subscriber that fell behind
+    by_type: dict[str, int] = field(default_factory=dict)
+    last_metadata: dict[str, str] = field(default_factory=dict)
+
+
+class StandinTelemetryService(telemetry_pb2_grpc.TelemetryServiceServicer):
+    """TelemetryService that counts what it receives.
+
+    Ingested frames are also fanned out to open StreamTelemetry calls whose
+    filters match, so one stand-in can sit between a gateway and a consumer.
+
+    Args:
+        clock_skew_seconds: Added to the server clock, to exercise drift correction.
+        frame_delay_seconds: Sleep per received frame, to simulate a slow consumer
+            and force backpressure onto the gateway.
+        subscriber_queue: Frames queued per StreamTelemetry call before new
+            frames for it are dropped.
+    """
+
+    def __init__(
+        self,
+        *,
+        clock_skew_seconds: float = 0.0,
+        frame_delay_seconds: float = 0.0,
+        subscriber_queue: int = 100_000,
+    ) -> None:
+        self.clock_skew_seconds = clock_skew_seconds
+        self.frame_delay_seconds = frame_delay_seconds
+        self.subscriber_queue = subscriber_queue
+        self._subscribers: list[tuple[telemetry_pb2.StreamTelemetryRequest, queue.Queue]] = []
+        self.stats = IngestStats()
+        self._lock = threading.Lock()
+        self._sequences: dict[tuple[str, str], int] = {}
+
+    def _now(self) -> timestamp_pb2.Timestamp:
+        ts = timestamp_pb2.Timestamp()
+        ts.FromNanoseconds(int((time.time() + self.clock_skew_seconds) * 1e9))
+        return ts
+
+    def IngestTelemetry(self, request_iterator, context):
+        accepted = 0
+        with self._lock:
+            self.stats.streams += 1
+            self.stats.last_metadata = dict(context.invocation_metadata())
+        for frame in request_iterator:
+            key = (frame.robot_id, frame.telemetry_type)
+            with self._lock:
+                previous = self._sequences.get(key, 0)
+                if frame.sequence > previous + 1:
+                    self.stats.sequence_gaps += frame.sequence - previous - 1
+                self._sequences[key] = max(previous, frame.sequence)
+                self.stats.frames += 1
+                self.stats.bytes += frame.ByteSize()
+                self.stats.by_type[frame.telemetry_type] = self.stats.by_type.get(frame.telemetry_type, 0) + 1
+                subscribers = self._subscribers
+            for request, frames in subscribers:
+                if _matches(request, frame):
+                    try:
+                        frames.put_nowait(frame)
+                    except queue.Full:
+                        with self._lock:
+                            self.stats.fanout_dropped += 1
+            accepted += 1
+            if self.frame_delay_seconds:
+                time.sleep(self.frame_delay_seconds)
+        return telemetry_pb2.IngestTelemetryResponse(
+            frames_accepted=accepted,
+            frames_rejected=0,
+            server_timestamp=self._now(),
+        )
+
+    def Heartbeat(self, request, context):
+        return telemetry_pb2.HeartbeatResponse(server_timestamp=self._now())
+
+    def StreamTelemetry(self, request, context):
+        frames: queue.Queue = queue.Queue(self.subscriber_queue)
+        subscriber = (request, frames)
+        with self._lock:
+            # Copy on write, so IngestTelemetry can iterate without the lock.
+            self._subscribers = [*self._subscribers, subscriber]
+            self.stats.subscribers += 1
+        try:
+            while context.is_active():
+                try:
+                    yield frames.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+        finally:
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not subscriber]
+                self.stats.subscribers -= 1
+
+
+def _matches(request: telemetry_pb2.StreamTelemetryRequest, frame: telemetry_pb2.TelemetryFrame) -> bool:
+    # fleet_id is not carried on frames, so the stand-in ignores it.
+    return (not request.robot_id or request.robot_id == frame.robot_id) and (
+        not request.telemetry_type or request.telemetry_type == frame.telemetry_type
+    )
+
+
+@dataclass
+class ControlStats:
+    streams: int = 0
+    commands_sent: int = 0
+    feedback_messages: int = 0
+    acks: int = 0  # MISSION_PHASE_QUEUED feedback
+    safety_events: int = 0
+    phases: dict[str, int] = field(default_factory=dict)  # terminal phase name -> count
+    # Seconds from sending a command to receiving its ack / its terminal phase.
+    ack_rtt: list[float] = field(default_factory=list)
+    completion_rtt: dict[str, list[float]] = field(default_factory=dict)  # per command type
+
+
+class StandinControlService(control_pb2_grpc.ControlServiceServicer):
+    """ControlService whose StreamFeedback calls are driven from the test side.
+
+    ``send_command()`` pushes a command down every open stream and the feedback
+    coming back is matched to it by the ``idempotency_key`` in the metadata,
+    which gives true command round-trip times on one clock.
+    """
+
+    def __init__(self) -> None:
+        self.stats = ControlStats()
+        self._lock = threading.Lock()
+        self._connected = threading.Condition(self._lock)
+        self._streams: list[queue.Queue] = []
+        self._sent: dict[str, tuple[float, str]] = {}  # idempotency_key -> (sent at, command type)
+        self._keys = itertools.count(1)
+
+    def wait_connected(self, timeout: float = 10.0) -> bool:
+        with self._connected:
+            return self._connected.wait_for(lambda: self._streams, timeout)
+
+    def _push(self, message: control_pb2.ControlMessage) -> None:
+        message.timestamp.GetCurrentTime()
+        with self._lock:
+            streams = list(self._streams)
+        for outgoing in streams:
+            outgoing.put(message)
+
+    def send_command(
+        self,
+        robot_id: str,
+        command_type: str,
+        *,
+        priority: int = control_pb2.COMMAND_PRIORITY_NORMAL,
+        mission_id: str = "",
+        parameters: dict[str, Any] | None = None,
+        idempotency_key: str | None = None,
+    ) -> str:
+        """Send a command to the connected gateways; returns its idempotency key."""
+        key = idempotency_key or f"cmd-{next(self._keys)}"
+        command = control_pb2.DispatchCommandRequest(
+            robot_id=robot_id,
+            mission_id=mission_id,
+            command_type=command_type,
+            priority=priority,
+            idempotency_key=key,
+        )
+        if parameters:
+            command.parameters.update(parameters)
+        with self._lock:
+            # A redelivery keeps the original send time.
+            self._sent.setdefault(key, (time.monotonic(), command_type))
+            self.stats.commands_sent += 1
+        self._push(control_pb2.ControlMessage(command=command))
+        return key
+
+    def cancel_mission(self, mission_id: str, reason: str = "") -> None:
+        self._push(control_pb2.ControlMessage(
+            cancellation=control_pb2.MissionCancellation(mission_id=mission_id, reason=reason)
+        ))
+
+    def _record(self, message: control_pb2.FeedbackMessage) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.stats.feedback_messages += 1
+            kind = message.WhichOneof("payload")
+            if kind == "safety_event":
+                self.stats.safety_events += 1
+            if kind != "mission_feedback":
+                return
+            feedback = message.mission_feedback
+            fields = feedback.metadata.fields
+            key = fields["idempotency_key"].string_value if "idempotency_key" in fields else ""
+            sent = self._sent.get(key)
+            if feedback.phase == control_pb2.MISSION_PHASE_QUEUED:
+                self.stats.acks += 1
+                if sent is not None:
+                    self.stats.ack_rtt.append(now - sent[0])
+            elif feedback.phase in (
+                control_pb2.MISSION_PHASE_COMPLETED,
+                control_pb2.MISSION_PHASE_FAILED,
+                control_pb2.MISSION_PHASE_CANCELLED,
+            ):
+                name = control_pb2.MissionPhase.Name(feedback.phase)
+                self.stats.phases[name] = self.stats.phases.get(name, 0) + 1
+                if sent is not None:
+                    self.stats.completion_rtt.setdefault(sent[1], []).append(now - sent[0])
+                    del self._sent[key]
+
+    def StreamFeedback(self, request_iterator, context):
+        outgoing: queue.Queue = queue.Queue()
+
+        def read() -> None:
+            try:
+                for message in request_iterator:
+                    self._record(message)
+            except grpc.RpcError:
+                pass
+
+        reader = threading.Thread(target=read, name="standin-feedback", daemon=True)
+        reader.start()
+        with self._connected:
+            self._streams.append(outgoing)
+            self.stats.streams += 1
+            self._connected.notify_all()
+        try:
+            while context.is_active() and (reader.is_alive() or not outgoing.empty()):
+                try:
+                    yield outgoing.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+        finally:
+            with self._lock:
+                self._streams.remove(outgoing)
+
+
+def start_standin(
+    port: int = 0,
+    *,
+    telemetry: StandinTelemetryService | None = None,
+    control: StandinControlService | None = None,
+    max_workers: int = 16,
+) -> tuple[grpc.Server, str, StandinTelemetryService]:
+    """Start the stand-in server on localhost.
+
+    ControlService is only served when a ``control`` servicer is passed in.
+
+    Returns:
+        The server (call ``server.stop(None)`` when done), its ``host:port``
+        target, and the telemetry servicer for inspecting what it received.
+    """
+    telemetry = telemetry or StandinTelemetryService()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    telemetry_pb2_grpc.add_TelemetryServiceServicer_to_server(telemetry, server)
+    if control is not None:
+        control_pb2_grpc.add_ControlServiceServicer_to_server(control, server)
+    bound = server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    return server, f"127.0.0.1:{bound}", telemetry
@@ -0,0 +1,508 @@
+"""
+Portarium telemetry ingest client for edge gateways.
+
+Streams robot telemetry to ``TelemetryService.IngestTelemetry`` over one
+long-lived client stream instead of one request per sample:
+
+- Producers call ``submit()``, which never blocks. Frames are serialized
+  once, up front, and land in a bounded ring buffer per ``telemetry_type``
+  with its own drop policy, so a burst of lidar scans cannot push out
+  battery readings.
+- A sender thread drains the buffers in batches under a byte budget and a
+  latency budget. Each batch is grouped by robot and type before it is
+  written to the stream as pre-serialized bytes. gRPC flow control pulls batches only as fast as the
+  server accepts them, and backpressure shows up as drops, never as blocked
+  producers.
+- A heartbeat thread estimates the offset between the gateway and server
+  clocks, NTP-style, from the lowest-RTT recent sample. The offset is applied
+  to every ``gateway_timestamp``.
+- ``metrics()`` reports throughput, drops, stream reconnects and the clock
+  estimate. A non-retryable stream status (bad credentials, for example)
+  stops the sender; it is reported in ``metrics().failed`` and ``submit()``
+  raises ``TelemetryStreamFailed`` from then on.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Any, Iterator
+
+import grpc
+from google.protobuf import struct_pb2, timestamp_pb2
+
+from portarium.telemetry.v1 import telemetry_pb2, telemetry_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"  # keep the newest frames; right for streams of samples
+DROP_NEWEST = "drop_newest"  # keep what is queued; right for ordered event logs
+CONFLATE = "conflate"  # keep only the latest frame per robot; right for state like pose
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, CONFLATE)
+
+RETRYABLE_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+INGEST_METHOD = "/portarium.telemetry.v1.TelemetryService/IngestTelemetry"
+
+
+class TelemetryStreamFailed(RuntimeError):
+    """The ingest stream ended with a non-retryable status and the sender stopped."""
+
+
+@dataclass
+class BufferPolicy:
+    capacity: int = 10_000  # frames (robots, for CONFLATE) held per telemetry type
+    drop_policy: str = DROP_OLDEST
+
+
+@dataclass
+class ClockEstimate:
+    offset_seconds: float = 0.0  # server clock minus gateway clock
+    rtt_seconds: float | None = None  # round trip of the sample the offset came from
+    samples: int = 0
+
+
+@dataclass
+class TelemetryMetrics:
+    frames_submitted: int = 0
+    frames_sent: int = 0
+    bytes_sent: int = 0
+    batches_sent: int = 0
+    frames_accepted: int = 0  # as reported by the server when a stream closes
+    frames_rejected: int = 0
+    frames_buffered: int = 0
+    dropped: dict[str, int] = field(default_factory=dict)  # per telemetry type
+    reconnects: int = 0
+    frames_per_second: float = 0.0  # sent, since the previous metrics() call
+    clock: ClockEstimate = field(default_factory=ClockEstimate)
+    failed: str | None = None  # non-retryable status that stopped the sender
+
+
+class _TypeBuffer:
+    """Bounded buffer of ((robot_id, type), data, enqueued_at) for one telemetry type."""
+
+    def __init__(self, policy: BufferPolicy) -> None:
+        if policy.drop_policy not in DROP_POLICIES:
+            raise ValueError(f"unknown drop policy {policy.drop_policy!r}")
+        self.policy = policy
+        self.frames: deque = deque()
+        self.latest: dict[tuple, tuple] = {}  # CONFLATE: key -> entry, in arrival order
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.latest) if self.policy.drop_policy == CONFLATE else len(self.frames)
+
+    def push(self, entry: tuple) -> int:
+        """Add an entry; returns the net change in buffered bytes."""
+        key, data, _ = entry
+        size = len(data)
+        if self.policy.drop_policy == CONFLATE:
+            replaced = self.latest.pop(key, None)
+            if replaced is not None:
+                self.dropped += 1
+                self.latest[key] = entry
+                return size - len(replaced[1])
+            if len(self.latest) >= self.policy.capacity:
+                self.dropped += 1
+                return 0
+            self.latest[key] = entry
+            return size
+        if len(self.frames) < self.policy.capacity:
+            self.frames.append(entry)
+            return size
+        self.dropped += 1
+        if self.policy.drop_policy == DROP_NEWEST:
+            return 0
+        evicted = self.frames.popleft()
+        self.frames.append(entry)
+        return size - len(evicted[1])
+
+    def restore(self, entries: list) -> int:
+        """Put unsent entries back in front, in order; returns the net change in buffered bytes.
+
+        A restored entry is older than anything buffered, so capacity is enforced
+        as if it had never left: DROP_OLDEST drops restored entries first,
+        DROP_NEWEST the newest buffered ones, and CONFLATE keeps a newer sample
+        of the same key over the restored one.
+        """
+        added = 0
+        if self.policy.drop_policy == CONFLATE:
+            restored = {}
+            for entry in entries:
+                if entry[0] in self.latest or len(restored) + len(self.latest) >= self.policy.capacity:
+                    self.dropped += 1
+                    continue
+                restored[entry[0]] = entry
+                added += len(entry[1])
+            restored.update(self.latest)
+            self.latest = restored
+            return added
+        self.frames.extendleft(reversed(entries))
+        added = sum(len(entry[1]) for entry in entries)
+        while len(self.frames) > self.policy.capacity:
+            evicted = self.frames.popleft() if self.policy.drop_policy == DROP_OLDEST else self.frames.pop()
+            self.dropped += 1
+            added -= len(evicted[1])
+        return added
+
+    def oldest(self) -> float | None:
+        if self.policy.drop_policy == CONFLATE:
+            return next(iter(self.latest.values()))[2] if self.latest else None
+        return self.frames[0][2] if self.frames else None
+
+    def take(self, budget: int) -> tuple[list, int]:
+        """Remove entries in arrival order until ``budget`` bytes are used."""
+        taken, used = [], 0
+        if self.policy.drop_policy == CONFLATE:
+            while self.latest and (used < budget or not taken):
+                entry = self.latest.pop(next(iter(self.latest)))
+                taken.append(entry)
+                used += len(entry[1])
+            return taken, used
+        while self.frames and (used < budget or not taken):
+            entry = self.frames.popleft()
+            taken.append(entry)
+            used += len(entry[1])
+        return taken, used
+
+
+class _Stream:
+    """One IngestTelemetry call's in-flight frames.
+
+    Entries of ``batch`` from ``sent`` on were taken for the call but gRPC
+    has not asked past them yet. When the call ends they go back to their buffers, so a dead call
+    never keeps frames the next one should send.
+    """
+
+    def __init__(self, deadline: float) -> None:
+        self.deadline = deadline
+        self.ended = False
+        self.batch: list = []
+        self.sent = 0
+
+
+def _timestamp(seconds: float) -> timestamp_pb2.Timestamp:
+    whole = int(seconds)
+    return timestamp_pb2.Timestamp(seconds=whole, nanos=int((seconds - whole) * 1e9))
+
+
+class TelemetryIngestClient:
+    """Batched, backpressure-aware client for TelemetryService.IngestTelemetry.
+
+    Args:
+        target: gRPC target such as ``"localhost:50051"``; ignored if ``channel`` is given.
+        workspace_id: Workspace the frames belong to.
+        gateway_id: Identifier of this edge gateway.
+        token: Workspace-scoped bearer token sent as call metadata.
+        channel: An existing channel (e.g. a secure one) to use instead of ``target``.
+        buffer_policies: ``BufferPolicy`` per telemetry type; others use ``default_policy``.
+        default_policy: Policy for telemetry types without an explicit entry.
+        batch_max_bytes: Serialized bytes written to the stream per batch.
+        batch_max_delay_seconds: Longest time a frame waits for its batch to fill.
+        heartbeat_interval_seconds: Heartbeat period; 0 disables heartbeats.
+        stream_rotate_seconds: Close and reopen the stream this often, so the
+            server's accepted/rejected counts are collected regularly.
+    """
+
+    def __init__(
+        self,
+        target: str | None,
+        workspace_id: str,
+        gateway_id: str,
+        token: str,
+        *,
+        channel: grpc.Channel | None = None,
+        buffer_policies: dict[str, BufferPolicy] | None = None,
+        default_policy: BufferPolicy | None = None,
+        batch_max_bytes: int = 64 * 1024,
+        batch_max_delay_seconds: float = 0.05,
+        heartbeat_interval_seconds: float = 5.0,
+        stream_rotate_seconds: float = 60.0,
+    ) -> None:
+        if channel is None:
+            channel = grpc.insecure_channel(
+                target,
+                options=[
+                    ("grpc.keepalive_time_ms", 30_000),
+                    ("grpc.keepalive_permit_without_calls", 1),
+                ],
+            )
+            self._owns_channel = True
+        else:
+            self._owns_channel = False
+        self._channel = channel
+        self._stub = telemetry_pb2_grpc.TelemetryServiceStub(channel)
+        # Frames are serialized in submit(), so the stream writes bytes as-is.
+        self._ingest = channel.stream_unary(
+            INGEST_METHOD,
+            request_serializer=None,
+            response_deserializer=telemetry_pb2.IngestTelemetryResponse.FromString,
+        )
+        self._metadata = (("authorization", f"Bearer {token}"), ("x-workspace-id", workspace_id))
+        self._workspace_id = workspace_id
+        self._gateway_id = gateway_id
+        self._policies = dict(buffer_policies or {})
+        self._default_policy = default_policy or BufferPolicy()
+        self._batch_max_bytes = batch_max_bytes
+        self._batch_max_delay = batch_max_delay_seconds
+        self._heartbeat_interval = heartbeat_interval_seconds
+        self._stream_rotate = stream_rotate_seconds
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._buffers: dict[str, _TypeBuffer] = {}
+        self._buffered_bytes = 0
+        self._sequences: dict[tuple[str, str], int] = {}
+        self._metrics = TelemetryMetrics()
+        self._clock_samples: deque[tuple[float, float]] = deque(maxlen=8)  # (rtt, offset)
+        self._rate_mark = (time.monotonic(), 0)
+        self._closing = False
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self) -> "TelemetryIngestClient":
+        self._threads = [threading.Thread(target=self._send_loop, name="telemetry-send", daemon=True)]
+        if self._heartbeat_interval > 0:
+            self._threads.append(
+                threading.Thread(target=self._heartbeat_loop, name="telemetry-heartbeat", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self, timeout: float = 30.0) -> TelemetryMetrics:
+        """Flush buffered frames, close the stream and return final metrics.
+
+        Args:
+            timeout: Longest time to wait for the flush. Frames still buffered
+                afterwards are discarded and counted in ``frames_buffered``.
+        """
+        with self._ready:
+            self._closing = True
+            self._ready.notify_all()
+        self._stopped.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        final = self.metrics()
+        if final.frames_buffered:
+            logger.warning("Closing with %d telemetry frames unsent", final.frames_buffered)
+        if self._owns_channel:
+            self._channel.close()
+        return final
+
+    def __enter__(self) -> "TelemetryIngestClient":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # -- producer API --------------------------------------------------------
+
+    def submit(
+        self,
+        robot_id: str,
+        telemetry_type: str,
+        payload: dict[str, Any] | struct_pb2.Struct,
+        *,
+        source_time: float | None = None,
+        correlation_id: str = "",
+    ) -> None:
+        """Queue one sample. Never blocks; a full buffer drops per its policy.
+
+        Raises ``TelemetryStreamFailed`` once the sender has stopped on a
+        non-retryable status, since the sample could never be sent.
+
+        Args:
+            robot_id: Source robot.
+            telemetry_type: e.g. ``"pose"``, ``"battery"``, ``"lidar_scan"``.
+            payload: Sample data as a dict or a prebuilt ``Struct``.
+            source_time: Robot-clock epoch seconds; defaults to the corrected gateway time.
+            correlation_id: Optional mission/run correlation ID.
+        """
+        if not isinstance(payload, struct_pb2.Struct):
+            struct = struct_pb2.Struct()
+            struct.update(payload)
+            payload = struct
+        now = time.time() + self._metrics.clock.offset_seconds
+        frame = telemetry_pb2.TelemetryFrame(
+            workspace_id=self._workspace_id,
+            robot_id=robot_id,
+            gateway_id=self._gateway_id,
+            telemetry_type=telemetry_type,
+            source_timestamp=_timestamp(source_time if source_time is not None else now),
+            gateway_timestamp=_timestamp(now),
+            payload=payload,
+            correlation_id=correlation_id,
+        )
+        key = (robot_id, telemetry_type)
+        with self._lock:
+            if self._metrics.failed is not None:
+                raise TelemetryStreamFailed(f"telemetry stream failed: {self._metrics.failed}")
+            # Serialize under the lock so buffer order matches sequence order.
+            sequence = self._sequences.get(key, 0) + 1
+            self._sequences[key] = sequence
+            frame.sequence = sequence
+            buffer = self._buffers.get(telemetry_type)
+            if buffer is None:
+                policy = self._policies.get(telemetry_type, self._default_policy)
+                buffer = self._buffers[telemetry_type] = _TypeBuffer(policy)
+            was_empty = self._buffered_bytes == 0
+            self._buffered_bytes += buffer.push((key, frame.SerializeToString(), time.monotonic()))
+            self._metrics.frames_submitted += 1
+            # Wake the sender to start the batch timer, or to send a full batch now.
+            if was_empty or self._buffered_bytes >= self._batch_max_bytes:
+                self._ready.notify()
+
+    # -- metrics -------------------------------------------------------------
+
+    def metrics(self) -> TelemetryMetrics:
+        with self._lock:
+            now = time.monotonic()
+            mark_time, mark_sent = self._rate_mark
+            elapsed = now - mark_time
+            if elapsed > 0:
+                self._metrics.frames_per_second = (self._metrics.frames_sent - mark_sent) / elapsed
+            self._rate_mark = (now, self._metrics.frames_sent)
+            return replace(
+                self._metrics,
+                dropped={t: b.dropped for t, b in self._buffers.items() if b.dropped},
+                frames_buffered=sum(len(b) for b in self._buffers.values()),
+                clock=replace(self._metrics.clock),
+            )
+
+    # -- sending -------------------------------------------------------------
+
+    def _next_batch(self, stream: _Stream) -> list | None:
+        """Wait until a batch is due, then take it for ``stream``.
+
+        Returns None once closed and drained, or once the stream has ended.
+        """
+        with self._ready:
+            while True:
+                if stream.ended:
+                    return None
+                oldest = min(
+                    (t for t in (b.oldest() for b in self._buffers.values()) if t is not None),
+                    default=None,
+                )
+                if oldest is None:
+                    if self._closing:
+                        return None
+                    self._ready.wait()
+                    continue
+                wait = oldest + self._batch_max_delay - time.monotonic()
+                if self._buffered_bytes >= self._batch_max_bytes or wait <= 0 or self._closing:
+                    break
+                self._ready.wait(wait)
+
+            batch, budget = [], self._batch_max_bytes
+            # Oldest types first, so a chatty type cannot starve the others.
+            for buffer in sorted(self._buffers.values(), key=lambda b: b.oldest() or float("inf")):
+                if budget <= 0:
+                    break
+                taken, used = buffer.take(budget)
+                batch.extend(taken)
+                budget -= used
+                self._buffered_bytes -= used
+            # Group by robot and type; sort is stable, so sequences stay in order.
+            batch.sort(key=lambda entry: entry[0])
+            stream.batch, stream.sent = batch, 0
+        return batch
+
+    def _end_stream(self, stream: _Stream) -> None:
+        """Mark ``stream`` ended and return the frames it never sent to their buffers."""
+        with self._ready:
+            stream.ended = True
+            unsent = stream.batch[stream.sent:]
+            stream.batch, stream.sent = [], 0
+            by_type: dict[str, list] = {}
+            for entry in unsent:
+                by_type.setdefault(entry[0][1], []).append(entry)
+            for telemetry_type, entries in by_type.items():
+                self._buffered_bytes += self._buffers[telemetry_type].restore(entries)
+            self._ready.notify_all()
+
+    def _frames(self, stream: _Stream) -> Iterator[bytes]:
+        """Request iterator for one stream; ends at its deadline, on close, or when the call ends."""
+        while time.monotonic() < stream.deadline:
+            batch = self._next_batch(stream)
+            if batch is None:
+                return
+            for _, data, _ in batch:
+                yield data
+                # gRPC asks for the next frame once this one is written.
+                with self._lock:
+                    if stream.ended:
+                        return
+                    stream.sent += 1
+                    self._metrics.frames_sent += 1
+                    self._metrics.bytes_sent += len(data)
+            with self._lock:
+                self._metrics.batches_sent += 1
+
+    def _send_loop(self) -> None:
+        backoff = 0.5
+        while True:
+            with self._lock:
+                if self._closing and not any(len(b) for b in self._buffers.values()):
+                    return
+            stream = _Stream(time.monotonic() + self._stream_rotate)
+            try:
+                response = self._ingest(self._frames(stream), metadata=self._metadata, wait_for_ready=True)
+            except grpc.RpcError as exc:
+                self._end_stream(stream)
+                if exc.code() not in RETRYABLE_CODES:
+                    logger.error("Telemetry stream failed: %s %s", exc.code(), exc.details())
+                    with self._ready:
+                        self._metrics.failed = f"{exc.code().name}: {exc.details()}"
+                        self._closing = True
+                    return
+                with self._lock:
+                    self._metrics.reconnects += 1
+                logger.warning("Telemetry stream interrupted (%s); reconnecting in %.1fs", exc.code(), backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            self._end_stream(stream)
+            backoff = 0.5
+            with self._lock:
+                self._metrics.frames_accepted += response.frames_accepted
+                self._metrics.frames_rejected += response.frames_rejected
+
+    # -- heartbeat -----------------------------------------------------------
+
+    def heartbeat(self) -> ClockEstimate:
+        """Send one heartbeat and update the clock-offset estimate."""
+        sent = time.time()
+        response = self._stub.Heartbeat(
+            telemetry_pb2.HeartbeatRequest(
+                workspace_id=self._workspace_id,
+                gateway_id=self._gateway_id,
+                client_timestamp=_timestamp(sent),
+            ),
+            metadata=self._metadata,
+            timeout=5.0,
+        )
+        received = time.time()
+        server = response.server_timestamp.seconds + response.server_timestamp.nanos / 1e9
+        rtt = received - sent
+        # Assume a symmetric path; the lowest-RTT sample has the least queueing error.
+        self._clock_samples.append((rtt, server - (sent + rtt / 2)))
+        best_rtt, best_offset = min(self._clock_samples)
+        with self._lock:
+            clock = self._metrics.clock
+            clock.offset_seconds, clock.rtt_seconds = best_offset, best_rtt
+            clock.samples += 1
+            return replace(clock)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.heartbeat()
+            except grpc.RpcError as exc:
+                logger.warning("Heartbeat failed: %s", exc.code())
+            self._stopped.wait(self._heartbeat_interval)
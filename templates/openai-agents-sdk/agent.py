@@ -6,7 +6,7 @@ policy evaluation, approval, and audit.
 """
 
 from agents import Agent, Runner, function_tool
-from portarium_tools import portarium_tool
+from portarium_tools import get_retrieval_client, portarium_tool
 
 
 # Define tools that route through Portarium
@@ -26,6 +26,12 @@ def update_ticket(ticket_id: str, status: str, comment: str = "") -> dict:
     ...
 
 
+@function_tool
+def search_context(query: str, top_k: int = 5) -> list[dict]:
+    """Search workspace runs and evidence for context. Repeated queries are served from cache."""
+    return get_retrieval_client().search(query, top_k=top_k)["hits"]
+
+
 # Create the agent
 agent = Agent(
     name="Portarium Demo Agent",
@@ -33,7 +39,7 @@ agent = Agent(
         "You are a helpful assistant that can create invoices and update tickets. "
         "All actions are governed by Portarium policies and may require approval."
     ),
-    tools=[create_invoice, update_ticket],
+    tools=[create_invoice, update_ticket, search_context],
 )
 
 
@@ -0,0 +1,236 @@
+"""
+Bulk evidence export for audits.
+
+Pages through ``/evidence`` (or ``/runs/:runId/evidence``) with a background
+thread that fetches the next page while the caller is still consuming the
+current one. Records are yielded as they arrive and can be written straight
+to JSON Lines or Parquet with bounded memory. Exports checkpoint the cursor
+after every page, so an interrupted export resumes where it stopped.
+"""
+
+import json
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+from portarium_client import AuthenticatedClient
+
+# Columns written to Parquet in addition to the full JSON record.
+PARQUET_COLUMNS = (
+    "evidenceId",
+    "workspaceId",
+    "correlationId",
+    "occurredAtIso",
+    "category",
+    "summary",
+    "hashSha256",
+)
+
+
+@dataclass
+class EvidencePage:
+    items: list[dict[str, Any]]
+    cursor: str | None  # cursor this page was fetched with (None for the first page)
+    next_cursor: str | None  # None when this is the last page
+
+
+class EvidenceStream:
+    """
+    Iterator over evidence entries with background page prefetch.
+
+    Cursor pagination means page N+1 can only be requested once page N has
+    arrived, so prefetch pipelines requests with consumption: up to
+    ``prefetch_pages`` pages are fetched ahead of the caller and held in a
+    bounded queue. Memory is bounded by ``(prefetch_pages + 1) * page_size``.
+    """
+
+    def __init__(
+        self,
+        client: AuthenticatedClient,
+        workspace_id: str,
+        *,
+        run_id: str | None = None,
+        category: str | None = None,
+        page_size: int = 200,
+        prefetch_pages: int = 2,
+        cursor: str | None = None,
+    ) -> None:
+        self._http = client.get_httpx_client()
+        if run_id is not None and category is None:
+            self._path = f"/v1/workspaces/{workspace_id}/runs/{run_id}/evidence"
+            self._params: dict[str, Any] = {"limit": page_size}
+        else:
+            self._path = f"/v1/workspaces/{workspace_id}/evidence"
+            self._params = {"limit": page_size, "runId": run_id, "category": category}
+            self._params = {k: v for k, v in self._params.items() if v is not None}
+        self._prefetch = max(1, prefetch_pages)
+        self._start_cursor = cursor
+
+    def pages(self) -> Iterator[EvidencePage]:
+        """Yield pages in order while later pages are fetched in the background."""
+        pages: queue.Queue = queue.Queue(maxsize=self._prefetch)
+        stop = threading.Event()
+
+        def put(item: object) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            cursor = self._start_cursor
+            try:
+                while not stop.is_set():
+                    params = dict(self._params, cursor=cursor) if cursor else self._params
+                    resp = self._http.get(self._path, params=params)
+                    resp.raise_for_status()
+                    data = resp.json()
+                    page = EvidencePage(data["items"], cursor, data.get("nextCursor"))
+                    if not put(page) or page.next_cursor is None:
+                        break
+                    cursor = page.next_cursor
+            except Exception as exc:  # surfaced to the consumer below
+                put(exc)
+                return
+            put(None)
+
+        producer = threading.Thread(target=produce, name="evidence-prefetch", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                if item.next_cursor is None:
+                    return
+        finally:
+            stop.set()
+            producer.join(timeout=5)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for page in self.pages():
+            yield from page.items
+
+
+def _read_checkpoint(path: Path) -> dict[str, Any]:
+    """Return the saved export state, or an empty dict for a fresh export."""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_checkpoint(path: Path, cursor: str | None, written: int, **extra: Any) -> None:
+    state = {"cursor": cursor, "done": cursor is None, "written": written, **extra}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def export_jsonl(
+    client: AuthenticatedClient,
+    workspace_id: str,
+    out_path: Path,
+    **stream_kwargs: Any,
+) -> int:
+    """
+    Export evidence to a JSON Lines file, resuming from ``<out>.checkpoint``.
+
+    Each page is flushed and fsynced before its cursor and the file offset are
+    checkpointed. On resume the file is truncated back to that offset, so
+    records of a partially written page are neither lost nor duplicated.
+    Returns the number of records written by this call.
+    """
+    checkpoint = out_path.with_name(out_path.name + ".checkpoint")
+    state = _read_checkpoint(checkpoint)
+    if state.get("done"):
+        return 0
+    cursor = state.get("cursor")
+    total = state.get("written", 0)
+    written = 0
+    stream = EvidenceStream(client, workspace_id, cursor=cursor, **stream_kwargs)
+    with out_path.open("r+b" if cursor else "wb") as out:
+        out.truncate(state.get("offset", 0) if cursor else 0)
+        out.seek(0, os.SEEK_END)
+        for page in stream.pages():
+            out.writelines(
+                json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+                for record in page.items
+            )
+            out.flush()
+            os.fsync(out.fileno())
+            written += len(page.items)
+            _write_checkpoint(
+                checkpoint, page.next_cursor, total + written, offset=out.tell()
+            )
+    return written
+
+
+def export_parquet(
+    client: AuthenticatedClient,
+    workspace_id: str,
+    out_dir: Path,
+    *,
+    rows_per_file: int = 50_000,
+    **stream_kwargs: Any,
+) -> int:
+    """
+    Export evidence as numbered Parquet part files in ``out_dir``.
+
+    Requires ``pyarrow``. Each fetched page is written to the open part file as
+    one row group, so no more than a page is held in memory. A part file is
+    closed once it has ``rows_per_file`` rows (or more), and then the cursor of
+    its last page is checkpointed; a resumed export overwrites any part file that
+    was never checkpointed and keeps the completed ones. Returns the number of
+    records written by this call.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = out_dir / "_checkpoint.json"
+    state = _read_checkpoint(checkpoint)
+    if state.get("done"):
+        return 0
+    cursor = state.get("cursor")
+    total = state.get("written", 0)
+    part = state.get("parts", 0)
+    written = 0
+    schema = pa.schema([(name, pa.string()) for name in (*PARQUET_COLUMNS, "record")])
+    writer: pq.ParquetWriter | None = None
+    part_rows = 0
+
+    def close_part(next_cursor: str | None) -> None:
+        nonlocal writer, part, part_rows
+        if writer is not None:
+            writer.close()
+            writer = None
+            part += 1
+            part_rows = 0
+        _write_checkpoint(checkpoint, next_cursor, total + written, parts=part)
+
+    stream = EvidenceStream(client, workspace_id, cursor=cursor, **stream_kwargs)
+    try:
+        for page in stream.pages():
+            if page.items:
+                if writer is None:
+                    writer = pq.ParquetWriter(out_dir / f"part-{part:05d}.parquet", schema)
+                columns = {name: [r.get(name) for r in page.items] for name in PARQUET_COLUMNS}
+                columns["record"] = [json.dumps(r, separators=(",", ":")) for r in page.items]
+                writer.write_table(pa.table(columns, schema=schema))
+                part_rows += len(page.items)
+                written += len(page.items)
+            if part_rows >= rows_per_file or page.next_cursor is None:
+                close_part(page.next_cursor)
+    finally:
+        if writer is not None:  # interrupted: the part is rewritten on resume
+            writer.close()
+    return written
@@ -0,0 +1,202 @@
+"""
+Streaming access to run outputs.
+
+Run responses are downloaded in chunks into a spooled temporary file rather
+than parsed in one piece. Small responses are decoded as usual; responses
+above a size threshold are handed back as a ``LazyRunOutput`` that stays on
+disk and is parsed incrementally, so peak memory is bounded by the threshold
+and chunk size instead of the size of the output.
+"""
+
+import json
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Any, Iterator
+
+import ijson
+
+from portarium_client import AuthenticatedClient
+
+# Outputs above this size are returned as a LazyRunOutput handle.
+DEFAULT_OUTPUT_THRESHOLD_BYTES = 1024 * 1024
+
+_CHUNK_BYTES = 64 * 1024
+
+# Size of the output excerpt a tool hands to the model instead of a large output.
+DEFAULT_EXCERPT_BYTES = 4 * 1024
+
+
+class LazyRunOutput:
+    """
+    Handle to a large run output spooled to a temporary file.
+
+    The output is never loaded as a whole unless ``load()`` is called.
+    Close the handle (or use it as a context manager) to delete the file.
+    """
+
+    def __init__(self, run_id: str, body: IO[bytes], size_bytes: int) -> None:
+        self.run_id = run_id
+        self.size_bytes = size_bytes
+        self._body = body
+
+    def items(self, prefix: str = "") -> Iterator[Any]:
+        """
+        Yield JSON values under ``prefix`` one at a time.
+
+        ``prefix`` uses ijson notation relative to the output object, e.g.
+        ``"rows.item"`` yields each element of ``output["rows"]``.
+        """
+        path = f"output.{prefix}" if prefix else "output"
+        self._body.seek(0)
+        yield from ijson.items(self._body, path, use_float=True)
+
+    def lines(self, prefix: str = "") -> Iterator[str]:
+        """Yield the values under ``prefix`` as JSON Lines, one per value."""
+        for value in self.items(prefix):
+            yield json.dumps(value)
+
+    def chunks(self, size: int = _CHUNK_BYTES) -> Iterator[bytes]:
+        """Yield the raw run response body in chunks of ``size`` bytes."""
+        self._body.seek(0)
+        while chunk := self._body.read(size):
+            yield chunk
+
+    def summary(self, excerpt_bytes: int = DEFAULT_EXCERPT_BYTES) -> dict:
+        """
+        Bounded stand-in for the output, safe to return to a model.
+
+        Lists the output's top-level keys and the first ``excerpt_bytes`` of
+        its compact JSON. The output is parsed once, incrementally.
+        """
+        keys: list[str] = []
+        excerpt = _JsonExcerpt(excerpt_bytes)
+        self._body.seek(0)
+        for prefix, event, value in ijson.parse(self._body, use_float=True):
+            if prefix != "output" and not prefix.startswith("output."):
+                continue
+            if prefix == "output" and event == "map_key":
+                keys.append(value)
+            excerpt.feed(event, value)
+        return {
+            "run_id": self.run_id,
+            "size_bytes": self.size_bytes,
+            "truncated": excerpt.truncated,
+            "keys": keys,
+            "excerpt": excerpt.text(),
+        }
+
+    def load(self) -> dict:
+        """Materialize the whole output. Defeats the purpose for huge outputs."""
+        return next(self.items(), None) or {}
+
+    def close(self) -> None:
+        self._body.close()
+
+    def __enter__(self) -> "LazyRunOutput":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"LazyRunOutput(run_id={self.run_id!r}, size_bytes={self.size_bytes})"
+
+
+class _JsonExcerpt:
+    """Re-serializes ijson events as compact JSON until a byte budget is spent."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.parts: list[str] = []
+        self.size = 0
+        self.truncated = False
+        self._first = [True]  # per open container: nothing written in it yet
+        self._after_key = False
+
+    def feed(self, event: str, value: Any) -> None:
+        if self.truncated:
+            return
+        if event in ("end_map", "end_array"):
+            self._first.pop()
+            self._write("}" if event == "end_map" else "]")
+            return
+        token = "" if self._after_key or self._first[-1] else ","
+        self._first[-1] = False
+        if event == "map_key":
+            self._after_key = True
+            self._write(token + json.dumps(value) + ":")
+            return
+        self._after_key = False
+        if event in ("start_map", "start_array"):
+            self._first.append(True)
+            self._write(token + ("{" if event == "start_map" else "["))
+        else:
+            self._write(token + json.dumps(value))
+
+    def _write(self, text: str) -> None:
+        room = self.limit - self.size
+        if len(text) > room:
+            self.parts.append(text[:room])
+            self.size = self.limit
+            self.truncated = True
+            return
+        self.parts.append(text)
+        self.size += len(text)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+@dataclass
+class RunSnapshot:
+    run_id: str
+    status: str
+    output: dict | None  # decoded output for responses under the threshold
+    large_output: LazyRunOutput | None  # set instead of output above the threshold
+
+
+def fetch_run(
+    client: AuthenticatedClient,
+    workspace_id: str,
+    run_id: str,
+    threshold_bytes: int = DEFAULT_OUTPUT_THRESHOLD_BYTES,
+) -> RunSnapshot:
+    """
+    Fetch a run, streaming the response body instead of buffering it.
+
+    The body is copied chunk by chunk into a spooled temporary file that
+    stays in memory up to ``threshold_bytes`` and rolls over to disk above it.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=threshold_bytes)
+    size = 0
+    try:
+        with client.get_httpx_client().stream(
+            "GET",
+            f"/v1/workspaces/{workspace_id}/runs/{run_id}",
+        ) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_bytes(_CHUNK_BYTES):
+                body.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        body.close()
+        raise
+
+    body.seek(0)
+    if size <= threshold_bytes:
+        data = json.load(body)
+        body.close()
+        return RunSnapshot(
+            run_id=run_id,
+            status=data["status"],
+            output=data.get("output"),
+            large_output=None,
+        )
+
+    status = next(ijson.items(body, "status"))
+    return RunSnapshot(
+        run_id=run_id,
+        status=status,
+        output=None,
+        large_output=LazyRunOutput(run_id, body, size),
+    )
@@ -0,0 +1,593 @@
+"""
+Cached, batched access to retrieval search and graph queries.
+
+Agents ask Portarium for context on nearly every turn, often with the same
+query. ``RetrievalClient`` puts four layers in front of
+``/retrieval/search`` and ``/graph/query``:
+
+- A bounded LRU cache with a TTL, keyed by the normalized query and filters.
+  A cached answer also serves narrower requests: a search with a smaller
+  ``top_k`` or a higher ``min_score``, or a traversal with a smaller
+  ``max_depth``, is cut down from the cached result locally.
+- Single-flight: identical queries issued while one is in flight wait for
+  its response instead of sending their own.
+- Micro-batching of graph queries: queries arriving within a short window
+  are grouped by root node, direction and relations, and each group is sent
+  as one traversal at the deepest requested depth. If that traversal fails,
+  the other queries in the group are retried on their own.
+- Streaming iterators for result sets too large to hold or cache.
+
+``stats()`` reports cache hit rate, round trips saved and call latency.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Sequence
+
+import ijson
+
+from portarium_client import AuthenticatedClient
+
+DIRECTIONS = ("outbound", "inbound", "both")
+
+# Deepest traversal the control plane accepts (RETRIEVAL_LIMITS.maxDepth).
+MAX_GRAPH_DEPTH = 10
+
+_CHUNK_BYTES = 64 * 1024
+
+
+def normalize_query(text: str) -> str:
+    """Collapse runs of whitespace; case is kept, since embeddings see it."""
+    return " ".join(text.split())
+
+
+def _canonical_filters(filters: dict[str, Any] | None) -> str | None:
+    return json.dumps(filters, sort_keys=True, separators=(",", ":")) if filters else None
+
+
+@dataclass(frozen=True)
+class GraphQuery:
+    root_node_id: str
+    direction: str = "outbound"  # "outbound", "inbound" or "both"
+    max_depth: int = 3
+    relation_filter: tuple[str, ...] | None = None  # sorted, deduplicated
+
+    @classmethod
+    def build(
+        cls,
+        root_node_id: str,
+        direction: str = "outbound",
+        max_depth: int = 3,
+        relation_filter: Sequence[str] | None = None,
+    ) -> "GraphQuery":
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}, got {direction!r}")
+        # Checked here, not by the server: a batch sends only its deepest query,
+        # so one invalid depth would fail every caller merged with it.
+        if not 1 <= max_depth <= MAX_GRAPH_DEPTH:
+            raise ValueError(f"max_depth must be between 1 and {MAX_GRAPH_DEPTH}, got {max_depth}")
+        relations = tuple(sorted(set(relation_filter))) if relation_filter is not None else None
+        return cls(root_node_id, direction, max_depth, relations)
+
+    def family(self) -> tuple:
+        """Cache and batch key: everything but the depth."""
+        return ("graph", self.root_node_id, self.direction, self.relation_filter)
+
+    def body(self) -> dict[str, Any]:
+        body: dict[str, Any] = {
+            "rootNodeId": self.root_node_id,
+            "direction": self.direction,
+            "maxDepth": self.max_depth,
+        }
+        if self.relation_filter is not None:
+            body["relationFilter"] = list(self.relation_filter)
+        return body
+
+    def covers(self, other: "GraphQuery", result: dict[str, Any]) -> bool:
+        return other.max_depth <= self.max_depth
+
+    def narrow(self, result: dict[str, Any], other: "GraphQuery") -> dict[str, Any]:
+        """Cut a traversal down to ``other.max_depth`` hops from the root."""
+        if other.max_depth >= self.max_depth:
+            return {"nodes": list(result["nodes"]), "edges": list(result["edges"])}
+        forward, backward = self.direction != "inbound", self.direction != "outbound"
+        neighbours: dict[str, list[str]] = defaultdict(list)
+        for edge in result["edges"]:
+            if forward:
+                neighbours[edge["fromNodeId"]].append(edge["toNodeId"])
+            if backward:
+                neighbours[edge["toNodeId"]].append(edge["fromNodeId"])
+
+        depth = other.max_depth
+        hops = {self.root_node_id: 0}
+        frontier = [self.root_node_id]
+        for hop in range(1, depth + 1):
+            reached = []
+            for node_id in frontier:
+                for neighbour in neighbours[node_id]:
+                    if neighbour not in hops:
+                        hops[neighbour] = hop
+                        reached.append(neighbour)
+            frontier = reached
+
+        def walked(edge: dict[str, Any]) -> bool:
+            src, dst = hops.get(edge["fromNodeId"]), hops.get(edge["toNodeId"])
+            if src is None or dst is None:
+                return False
+            return (forward and src < depth) or (backward and dst < depth)
+
+        return {
+            "nodes": [node for node in result["nodes"] if node["nodeId"] in hops],
+            "edges": [edge for edge in result["edges"] if walked(edge)],
+        }
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    query: str  # normalized
+    top_k: int = 10
+    min_score: float | None = None
+    filters: str | None = None  # canonical JSON
+    strategy: str = "semantic"  # "semantic" or "hybrid"
+    graph: GraphQuery | None = None  # graph enrichment for hybrid searches
+
+    @classmethod
+    def build(
+        cls,
+        query: str,
+        top_k: int = 10,
+        min_score: float | None = None,
+        filters: dict[str, Any] | None = None,
+        strategy: str = "semantic",
+        graph: GraphQuery | None = None,
+    ) -> "SearchQuery":
+        if strategy not in ("semantic", "hybrid"):
+            raise ValueError("strategy must be 'semantic' or 'hybrid'; use graph() for traversals")
+        return cls(normalize_query(query), top_k, min_score, _canonical_filters(filters), strategy, graph)
+
+    def family(self) -> tuple:
+        """Cache key: everything but ``top_k`` and ``min_score``."""
+        return ("search", self.strategy, self.query, self.filters, self.graph)
+
+    def body(self) -> dict[str, Any]:
+        semantic: dict[str, Any] = {"query": self.query, "topK": self.top_k}
+        if self.min_score is not None:
+            semantic["minScore"] = self.min_score
+        if self.filters is not None:
+            semantic["filters"] = json.loads(self.filters)
+        body: dict[str, Any] = {"strategy": self.strategy, "semantic": semantic}
+        if self.graph is not None:
+            body["graph"] = self.graph.body()
+        return body
+
+    def covers(self, other: "SearchQuery", result: dict[str, Any]) -> bool:
+        if self.min_score is not None and (other.min_score is None or other.min_score < self.min_score):
+            return False
+        # Fewer hits than asked for means nothing else scored high enough.
+        return other.top_k <= self.top_k or len(result["hits"]) < self.top_k
+
+    def narrow(self, result: dict[str, Any], other: "SearchQuery") -> dict[str, Any]:
+        hits = result["hits"]
+        if other.min_score is not None:
+            hits = [hit for hit in hits if hit.get("score", 0.0) >= other.min_score]
+        return {**result, "hits": hits[: other.top_k]}
+
+
+@dataclass
+class RetrievalStats:
+    calls: int = 0  # search() and graph() calls, streaming excluded
+    cache_hits: int = 0
+    coalesced: int = 0  # joined an identical query already in flight
+    batched: int = 0  # graph queries answered by a deeper query in the same window
+    http_requests: int = 0
+    streamed: int = 0
+    evictions: int = 0
+    cached_entries: int = 0
+    hit_rate: float = 0.0  # cache hits / calls
+    round_trips_saved: float = 0.0  # 1 - http requests / calls
+    call_p50_ms: float | None = None
+    call_p99_ms: float | None = None
+    http_p50_ms: float | None = None
+    http_p99_ms: float | None = None
+
+
+class _ResultCache:
+    """LRU of query families; each entry remembers the query it answered."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._entries: OrderedDict[tuple, tuple[Any, dict[str, Any], float]] = OrderedDict()
+        self.evictions = 0
+
+    def get(self, query: Any) -> dict[str, Any] | None:
+        key = query.family()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        cached_query, result, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        if not cached_query.covers(query, result):
+            return None
+        self._entries.move_to_end(key)
+        return cached_query.narrow(result, query)
+
+    def put(self, query: Any, result: dict[str, Any]) -> None:
+        key = query.family()
+        current = self._entries.get(key)
+        # Keep the broader answer while it is fresh.
+        if current is not None and time.monotonic() < current[2] and current[0].covers(query, current[1]) \
+                and not query.covers(current[0], result):
+            return
+        self._entries[key] = (query, result, time.monotonic() + self._ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _ChunkReader:
+    """File-like view of an iterator of byte chunks, for ijson."""
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class RetrievalClient:
+    """
+    Retrieval search and graph queries with caching, coalescing and batching.
+
+    Results are shared between callers and with the cache; treat them as
+    read-only. Errors propagate to every caller waiting on the failed
+    request and are never cached.
+    """
+
+    def __init__(
+        self,
+        client: AuthenticatedClient,
+        workspace_id: str,
+        *,
+        max_entries: int = 1024,
+        ttl_seconds: float = 30.0,
+        max_cached_items: int = 2000,
+        batch_window_seconds: float = 0.005,
+        max_batch: int = 64,
+        max_concurrency: int = 8,
+    ) -> None:
+        """
+        Args:
+            client: Portarium client; its httpx client is shared.
+            workspace_id: Workspace to query.
+            max_entries: Query families kept in the cache.
+            ttl_seconds: How long a cached result is served.
+            max_cached_items: Results with more hits, nodes and edges than this
+                are returned but not cached. Use the ``iter_`` methods for them.
+            batch_window_seconds: How long the first graph query of a batch
+                waits for others to join it.
+            max_batch: Graph queries collected into one batch at most.
+            max_concurrency: Requests in flight at once.
+        """
+        self._http = client.get_httpx_client()
+        self._base = f"/v1/workspaces/{workspace_id}"
+        self._cache = _ResultCache(max_entries, ttl_seconds)
+        self._max_cached_items = max_cached_items
+        self._window = batch_window_seconds
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._inflight: dict[Any, Future] = {}
+        self._pending: queue.Queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_concurrency, thread_name_prefix="retrieval")
+        self._dispatcher: threading.Thread | None = None
+        self._closed = False
+        self._stats = RetrievalStats()
+        self._call_latency: deque[float] = deque(maxlen=4096)
+        self._http_latency: deque[float] = deque(maxlen=4096)
+
+    # -- queries -------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        *,
+        top_k: int = 10,
+        min_score: float | None = None,
+        filters: dict[str, Any] | None = None,
+        strategy: str = "semantic",
+        graph: GraphQuery | None = None,
+    ) -> dict[str, Any]:
+        """Semantic or hybrid search. Returns ``{"strategy", "hits", "graph"?}``."""
+        request = SearchQuery.build(query, top_k, min_score, filters, strategy, graph)
+        started = time.monotonic()
+        found = self._lookup(request, lambda r: self._pool.submit(self._fetch, r, "/retrieval/search"))
+        result = found.result() if isinstance(found, Future) else found
+        self._record_call(started, 1)
+        return result
+
+    def graph(
+        self,
+        root_node_id: str,
+        *,
+        direction: str = "outbound",
+        max_depth: int = 3,
+        relation_filter: Sequence[str] | None = None,
+    ) -> dict[str, Any]:
+        """Traverse from ``root_node_id``. Returns ``{"nodes", "edges"}``."""
+        return self.graph_many([GraphQuery.build(root_node_id, direction, max_depth, relation_filter)])[0]
+
+    def graph_many(self, queries: Sequence[GraphQuery]) -> list[dict[str, Any]]:
+        """Run several traversals as one batch; results are in input order."""
+        started = time.monotonic()
+        requests = [GraphQuery.build(q.root_node_id, q.direction, q.max_depth, q.relation_filter) for q in queries]
+        futures = [self._lookup(request, self._enqueue) for request in requests]
+        results = [f.result() if isinstance(f, Future) else f for f in futures]
+        self._record_call(started, len(queries))
+        return results
+
+    # -- streaming -----------------------------------------------------------
+
+    def iter_search(
+        self,
+        query: str,
+        *,
+        top_k: int = 10,
+        min_score: float | None = None,
+        filters: dict[str, Any] | None = None,
+        strategy: str = "semantic",
+    ) -> Iterator[dict[str, Any]]:
+        """Yield hits as they are parsed off the wire. Bypasses the cache."""
+        request = SearchQuery.build(query, top_k, min_score, filters, strategy)
+        for _, hit in self._stream("/retrieval/search", request.body(), ("hits.item",)):
+            yield hit
+
+    def iter_graph(
+        self,
+        root_node_id: str,
+        *,
+        direction: str = "outbound",
+        max_depth: int = 3,
+        relation_filter: Sequence[str] | None = None,
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Yield ``("node", node)`` and ``("edge", edge)`` pairs in response order. Bypasses the cache."""
+        request = GraphQuery.build(root_node_id, direction, max_depth, relation_filter)
+        kinds = {"nodes.item": "node", "edges.item": "edge"}
+        for prefix, item in self._stream("/graph/query", request.body(), tuple(kinds)):
+            yield kinds[prefix], item
+
+    # -- housekeeping --------------------------------------------------------
+
+    def invalidate(self) -> None:
+        """Drop every cached result, e.g. after a run produced new artifacts."""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> RetrievalStats:
+        with self._lock:
+            s = RetrievalStats(**vars(self._stats))
+            s.evictions = self._cache.evictions
+            s.cached_entries = len(self._cache)
+            calls, http = sorted(self._call_latency), sorted(self._http_latency)
+        if s.calls:
+            s.hit_rate = round(s.cache_hits / s.calls, 4)
+            s.round_trips_saved = round(1 - s.http_requests / s.calls, 4)
+        s.call_p50_ms, s.call_p99_ms = _percentile(calls, 50), _percentile(calls, 99)
+        s.http_p50_ms, s.http_p99_ms = _percentile(http, 50), _percentile(http, 99)
+        return s
+
+    def close(self) -> None:
+        self._closed = True
+        self._pending.put(None)
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=5)
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "RetrievalClient":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # -- internals -----------------------------------------------------------
+
+    def _lookup(self, request: Any, start: Callable[[Any], Future | None]) -> dict[str, Any] | Future:
+        """
+        Serve from the cache, join an identical in-flight request, or start one.
+
+        ``start`` returns a future for the response, or ``None`` when the
+        request was handed to the batcher, which settles it itself.
+        """
+        if self._closed:
+            raise RuntimeError("RetrievalClient is closed")
+        with self._lock:
+            cached = self._cache.get(request)
+            if cached is not None:
+                self._stats.cache_hits += 1
+                return cached
+            future = self._inflight.get(request)
+            if future is not None:
+                self._stats.coalesced += 1
+                return future
+            future = Future()
+            self._inflight[request] = future
+        try:
+            source = start(request)
+        except BaseException as exc:
+            self._settle(request, future, exc=exc)
+            raise
+        if source is not None:
+            source.add_done_callback(lambda done: self._settle(request, future, done=done))
+        return future
+
+    def _settle(
+        self,
+        request: Any,
+        future: Future,
+        *,
+        result: dict[str, Any] | None = None,
+        exc: BaseException | None = None,
+        done: Future | None = None,
+    ) -> None:
+        if done is not None:
+            exc = done.exception()
+            result = None if exc else done.result()
+        with self._lock:
+            self._inflight.pop(request, None)
+            if exc is None and result is not None and self._size(result) <= self._max_cached_items:
+                self._cache.put(request, result)
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    def _size(result: dict[str, Any]) -> int:
+        graph = result.get("graph") or result
+        return len(result.get("hits") or ()) + len(graph.get("nodes") or ()) + len(graph.get("edges") or ())
+
+    def _fetch(self, request: Any, path: str) -> dict[str, Any]:
+        started = time.monotonic()
+        resp = self._http.post(self._base + path, json=request.body())
+        resp.raise_for_status()
+        result = resp.json()
+        with self._lock:
+            self._stats.http_requests += 1
+            self._http_latency.append(time.monotonic() - started)
+        return result
+
+    def _stream(self, path: str, body: dict[str, Any], prefixes: tuple[str, ...]) -> Iterator[tuple[str, Any]]:
+        with self._lock:
+            self._stats.streamed += 1
+        with self._http.stream("POST", self._base + path, json=body) as resp:
+            resp.raise_for_status()
+            builder = current = None
+            for prefix, event, value in ijson.parse(_ChunkReader(resp.iter_bytes(_CHUNK_BYTES)), use_float=True):
+                if builder is None:
+                    if prefix in prefixes and event == "start_map":
+                        builder, current = ijson.ObjectBuilder(), prefix
+                        builder.event(event, value)
+                    continue
+                builder.event(event, value)
+                if prefix == current and event == "end_map":
+                    yield current, builder.value
+                    builder = None
+
+    def _record_call(self, started: float, calls: int) -> None:
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._stats.calls += calls
+            self._call_latency.extend([elapsed] * calls)
+
+    # -- graph batching ------------------------------------------------------
+
+    def _enqueue(self, request: GraphQuery) -> None:
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="retrieval-batcher", daemon=True)
+                self._dispatcher.start()
+        self._pending.put(request)
+
+    def _dispatch(self) -> None:
+        while True:
+            first = self._pending.get()
+            if first is None:
+                self._drain()
+                return
+            batch = [first]
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pending.put(None)
+                    break
+                batch.append(item)
+
+            groups: dict[tuple, list[GraphQuery]] = defaultdict(list)
+            for request in batch:
+                groups[request.family()].append(request)
+            for members in groups.values():
+                with self._lock:
+                    self._stats.batched += len(members) - 1
+                self._send_group(members)
+
+    def _send_group(self, members: list[GraphQuery]) -> None:
+        """Send one traversal at the group's deepest depth and fan its result out."""
+        deepest = max(members, key=lambda q: q.max_depth)
+        try:
+            self._pool.submit(self._fetch, deepest, "/graph/query").add_done_callback(
+                lambda done: self._fan_out(deepest, members, done)
+            )
+        except RuntimeError as exc:  # pool shut down
+            for request in members:
+                self._fail(request, exc)
+
+    def _drain(self) -> None:
+        """Fail graph queries still queued when the client closes."""
+        while True:
+            try:
+                request = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None:
+                self._fail(request, RuntimeError("RetrievalClient is closed"))
+
+    def _fan_out(self, deepest: GraphQuery, members: list[GraphQuery], done: Future) -> None:
+        exc = done.exception()
+        if exc is not None:
+            self._fail(deepest, exc)
+            # The error may be specific to the merged request, so the rest of
+            # the group gets its own round trips rather than this error.
+            others = [request for request in members if request is not deepest]
+            with self._lock:
+                self._stats.batched -= len(others)
+            for request in others:
+                self._send_group([request])
+            return
+        result = done.result()
+        for request in members:
+            with self._lock:
+                future = self._inflight.get(request)
+            if future is not None:
+                self._settle(request, future, result=deepest.narrow(result, request))
+
+    def _fail(self, request: GraphQuery, exc: BaseException) -> None:
+        with self._lock:
+            future = self._inflight.get(request)
+        if future is not None:
+            self._settle(request, future, exc=exc)
+
+
+def _percentile(sorted_seconds: list[float], p: float) -> float | None:
+    if not sorted_seconds:
+        return None
+    index = min(int(len(sorted_seconds) * p / 100), len(sorted_seconds) - 1)
+    return round(sorted_seconds[index] * 1000, 2)
@@ -6,12 +6,33 @@ policy evaluation, approval gates, and evidence capture.
 """
 
 import os
+import time
+import asyncio
 import functools
-from typing import Any, Callable
+from dataclasses import dataclass
+from typing import Any, Callable, Sequence
 
+import httpx
 from portarium_client import AuthenticatedClient
 from portarium_client.api.runs import start_run, get_run
 from portarium_client.models import StartRunRequest
+from portarium_outputs import (
+    DEFAULT_OUTPUT_THRESHOLD_BYTES,
+    LazyRunOutput,
+    RunSnapshot,
+    fetch_run,
+)
+from portarium_retrieval import RetrievalClient
+from portarium_workflows import WorkflowCache, compile_validator, schema_from_signature
+
+# Run statuses that mean the run has not reached a terminal state yet.
+PENDING_STATUSES = ("Pending", "Running", "WaitingApproval")
+
+_workflow_cache: WorkflowCache | None = None
+_retrieval_client: RetrievalClient | None = None
+# Argument validators of every portarium_tool, keyed by (workflow_id, tool_name),
+# so batch submissions are checked like single calls.
+_validators: dict[tuple[str, str], Callable[[Any], str | None]] = {}
 
 
 def get_portarium_client() -> AuthenticatedClient:
@@ -23,9 +44,89 @@ def get_portarium_client() -> AuthenticatedClient:
     )
 
 
+def get_workflow_cache() -> WorkflowCache:
+    """Return the process-wide workflow definition cache."""
+    global _workflow_cache
+    if _workflow_cache is None:
+        _workflow_cache = WorkflowCache(
+            client=get_portarium_client(),
+            workspace_id=os.environ["PORTARIUM_WORKSPACE_ID"],
+        )
+    return _workflow_cache
+
+
+def get_retrieval_client() -> RetrievalClient:
+    """Return the process-wide retrieval client, so every agent shares one cache."""
+    global _retrieval_client
+    if _retrieval_client is None:
+        _retrieval_client = RetrievalClient(
+            client=get_portarium_client(),
+            workspace_id=os.environ["PORTARIUM_WORKSPACE_ID"],
+        )
+    return _retrieval_client
+
+
+def build_run_request(
+    workflow_id: str,
+    action_type: str,
+    tool_name: str,
+    parameters: dict[str, Any],
+) -> StartRunRequest:
+    """Build the StartRunRequest that represents a single tool call."""
+    return StartRunRequest(
+        workflow_id=workflow_id,
+        input={
+            "action_type": action_type,
+            "tool_name": tool_name,
+            "parameters": parameters,
+        },
+    )
+
+
+def check_call(workflow_id: str, tool_name: str, parameters: dict[str, Any]) -> str | None:
+    """
+    Run the local checks that precede every run; return the problem, if any.
+
+    Arguments are validated against the schema of the ``portarium_tool``
+    registered for ``(workflow_id, tool_name)``, if there is one, and the
+    workflow must be loadable and active.
+    """
+    validate = _validators.get((workflow_id, tool_name))
+    problem = validate(parameters) if validate else None
+    if problem:
+        return f"Invalid parameters for {tool_name}: {problem}"
+    try:
+        workflow = get_workflow_cache().get(workflow_id)
+    except (httpx.HTTPError, ValueError) as exc:
+        return f"Could not load workflow {workflow_id}: {exc}"
+    if not workflow.get("active", True):
+        return f"Workflow {workflow_id} is not active"
+    return None
+
+
+def run_result(run: Any) -> dict:
+    """Convert a terminal run into the dict returned to the agent."""
+    if run.status == "Succeeded":
+        return run.output or {"status": "completed"}
+    return {"error": f"Run {run.id} ended with status: {run.status}"}
+
+
+def snapshot_result(snapshot: RunSnapshot) -> dict | LazyRunOutput:
+    """Like ``run_result``, but passes large outputs through as a lazy handle."""
+    if snapshot.status == "Succeeded" and snapshot.large_output is not None:
+        return snapshot.large_output
+    if snapshot.large_output is not None:
+        snapshot.large_output.close()
+    if snapshot.status == "Succeeded":
+        return snapshot.output or {"status": "completed"}
+    return {"error": f"Run {snapshot.run_id} ended with status: {snapshot.status}"}
+
+
 def portarium_tool(
     workflow_id: str,
     action_type: str,
+    input_schema: dict[str, Any] | None = None,
+    output_threshold_bytes: int = DEFAULT_OUTPUT_THRESHOLD_BYTES,
 ) -> Callable:
     """
     Decorator that routes a tool call through Portarium.
@@ -35,14 +136,31 @@ def portarium_tool(
     itself is never called -- Portarium's execution plane handles the actual
     SoR interaction.
 
+    Arguments are validated locally before anything is sent: invalid calls
+    and calls to inactive workflows return an error without starting a run.
+
     Args:
         workflow_id: The Portarium workflow definition to invoke.
         action_type: The action type for policy evaluation (e.g., "invoice:create").
+        input_schema: JSON Schema for the tool arguments. Defaults to a schema
+            derived from the tool function's signature.
+        output_threshold_bytes: Run responses larger than this are not decoded.
+            The tool returns a bounded summary of the output (see
+            ``LazyRunOutput.summary``); Python callers can use
+            ``<tool>.open_output(...)`` to get a ``LazyRunOutput`` that streams
+            the whole output from disk instead.
     """
 
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(**kwargs: Any) -> dict:
+        _validators[(workflow_id, func.__name__)] = compile_validator(
+            input_schema or schema_from_signature(func)
+        )
+
+        def open_output(**kwargs: Any) -> dict | LazyRunOutput:
+            problem = check_call(workflow_id, func.__name__, kwargs)
+            if problem:
+                return {"error": problem}
+
             client = get_portarium_client()
             workspace_id = os.environ["PORTARIUM_WORKSPACE_ID"]
 
@@ -50,32 +168,131 @@ def portarium_tool(
             run = start_run.sync(
                 client=client,
                 workspace_id=workspace_id,
-                body=StartRunRequest(
-                    workflow_id=workflow_id,
-                    input={
-                        "action_type": action_type,
-                        "tool_name": func.__name__,
-                        "parameters": kwargs,
-                    },
-                ),
+                body=build_run_request(workflow_id, action_type, func.__name__, kwargs),
             )
 
-            # Poll for completion (in production, use webhooks or SSE)
-            import time
-
-            while run.status in ("Pending", "Running", "WaitingApproval"):
+            # Poll for completion (in production, use webhooks or SSE).
+            # Polls stream the response so large outputs never sit in memory.
+            if run.status not in PENDING_STATUSES:
+                return run_result(run)
+            while True:
                 time.sleep(2)
-                run = get_run.sync(
-                    client=client,
-                    workspace_id=workspace_id,
-                    run_id=run.id,
+                snapshot = fetch_run(
+                    client, workspace_id, run.id, threshold_bytes=output_threshold_bytes
                 )
+                if snapshot.status not in PENDING_STATUSES:
+                    return snapshot_result(snapshot)
 
-            if run.status == "Succeeded":
-                return run.output or {"status": "completed"}
-            else:
-                return {"error": f"Run {run.id} ended with status: {run.status}"}
+        @functools.wraps(func)
+        def wrapper(**kwargs: Any) -> dict:
+            # Tool results are stringified for the model, so a file handle
+            # would reach it as a repr and never be closed.
+            result = open_output(**kwargs)
+            if isinstance(result, LazyRunOutput):
+                with result:
+                    return result.summary()
+            return result
 
+        wrapper.open_output = open_output
         return wrapper
 
     return decorator
+
+
+# ---------------------------------------------------------------------------
+# Batch submission
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class RunOutcome:
+    run_id: str | None  # None when the run could not be started
+    status: str | None  # last observed run status
+    result: dict | None  # same shape a single portarium_tool call returns
+    error: str | None  # submission/polling failure or deadline expiry
+
+
+async def submit_runs(
+    requests: Sequence[StartRunRequest],
+    *,
+    max_concurrency: int = 8,
+    timeout_seconds: float = 300,
+    poll_interval_seconds: float = 2,
+    client: AuthenticatedClient | None = None,
+) -> list[RunOutcome]:
+    """
+    Submit several runs at once and wait for all of them together.
+
+    All runs are started and polled concurrently; ``max_concurrency`` bounds
+    the number of in-flight HTTP calls, not the number of active runs, so a
+    run parked in ``WaitingApproval`` never blocks the others. Every run
+    shares one deadline, so the batch takes roughly as long as its slowest
+    run. Outcomes are returned in the same order as ``requests``; a failure
+    of one run is recorded on its outcome and never raised.
+
+    Each request gets the same local checks as a single tool call
+    (``check_call``) before it is started; a request that fails them is
+    never submitted and its outcome carries the problem as ``error``.
+
+    Args:
+        requests: Run requests, e.g. built with ``build_run_request``.
+        max_concurrency: Maximum concurrent calls to the control plane.
+        timeout_seconds: Shared deadline for the whole batch.
+        poll_interval_seconds: Delay between status polls of a single run.
+        client: Optional client to reuse; defaults to ``get_portarium_client()``.
+    """
+    client = client or get_portarium_client()
+    workspace_id = os.environ["PORTARIUM_WORKSPACE_ID"]
+    limit = asyncio.Semaphore(max(1, max_concurrency))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout_seconds
+
+    async def call(fn: Callable, **kwargs: Any) -> Any:
+        async with limit:
+            return await asyncio.wait_for(
+                fn(client=client, workspace_id=workspace_id, **kwargs),
+                timeout=max(0.0, deadline - loop.time()),
+            )
+
+    async def drive(request: StartRunRequest) -> RunOutcome:
+        run = None
+        try:
+            inputs = request.input.to_dict() if hasattr(request.input, "to_dict") else request.input
+            # The workflow cache may block on a fetch, so keep it off the loop.
+            problem = await asyncio.to_thread(
+                check_call, request.workflow_id, inputs.get("tool_name", ""), inputs.get("parameters") or {}
+            )
+            if problem:
+                return RunOutcome(run_id=None, status=None, result=None, error=problem)
+            run = await call(start_run.asyncio, body=request)
+            while run.status in PENDING_STATUSES:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.sleep(min(poll_interval_seconds, remaining))
+                run = await call(get_run.asyncio, run_id=run.id)
+        except asyncio.TimeoutError:
+            return RunOutcome(
+                run_id=run.id if run else None,
+                status=run.status if run else None,
+                result=None,
+                error=f"Deadline of {timeout_seconds}s exceeded",
+            )
+        except Exception as exc:  # per-run isolation: never fail the batch
+            return RunOutcome(
+                run_id=run.id if run else None,
+                status=run.status if run else None,
+                result=None,
+                error=f"{type(exc).__name__}: {exc}",
+            )
+        return RunOutcome(run_id=run.id, status=run.status, result=run_result(run), error=None)
+
+    return list(await asyncio.gather(*(drive(r) for r in requests)))
+
+
+def submit_runs_sync(
+    requests: Sequence[StartRunRequest],
+    **kwargs: Any,
+) -> list[RunOutcome]:
+    """Blocking variant of ``submit_runs`` for synchronous callers."""
+    return asyncio.run(submit_runs(requests, **kwargs))
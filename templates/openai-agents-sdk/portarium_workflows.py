@@ -0,0 +1,153 @@
+"""
+Workflow metadata cache and local parameter validation for Portarium tools.
+
+Workflow definitions are fetched once and revalidated with conditional GETs
+(ETag / If-None-Match), so repeated tool calls rarely touch the network.
+Tool arguments are checked against a compiled JSON Schema before any run is
+submitted, so malformed calls fail locally instead of after a run round-trip
+or an approval.
+"""
+
+import time
+import inspect
+import threading
+import typing
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import fastjsonschema
+import httpx
+
+from portarium_client import AuthenticatedClient
+
+# JSON Schema types for the annotations tool functions commonly use.
+_JSON_TYPES: dict[Any, str] = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    dict: "object",
+    list: "array",
+}
+
+
+@dataclass
+class CachedWorkflow:
+    definition: dict[str, Any]  # WorkflowV1 body
+    etag: str | None
+    fetched_at: float  # monotonic time of last fetch or revalidation
+
+
+class WorkflowCache:
+    """
+    Process-local cache of workflow definitions.
+
+    Entries younger than ``max_age_seconds`` are served without a request.
+    Older entries are revalidated with ``If-None-Match``; a ``304`` response
+    only refreshes the timestamp, so the body is transferred once per change.
+    If revalidation fails, the stale definition is served and the next call
+    retries.
+    """
+
+    def __init__(
+        self,
+        client: AuthenticatedClient,
+        workspace_id: str,
+        max_age_seconds: float = 60.0,
+    ) -> None:
+        self._client = client
+        self._workspace_id = workspace_id
+        self._max_age = max_age_seconds
+        self._entries: dict[str, CachedWorkflow] = {}
+        self._lock = threading.Lock()
+
+    def get(self, workflow_id: str) -> dict[str, Any]:
+        """
+        Return the workflow definition, fetching or revalidating as needed.
+
+        Raises:
+            httpx.HTTPError: The fetch failed and nothing is cached to fall back on.
+        """
+        with self._lock:
+            entry = self._entries.get(workflow_id)
+        if entry and time.monotonic() - entry.fetched_at < self._max_age:
+            return entry.definition
+
+        headers = {"If-None-Match": entry.etag} if entry and entry.etag else {}
+        try:
+            resp = self._client.get_httpx_client().get(
+                f"/v1/workspaces/{self._workspace_id}/workflows/{workflow_id}",
+                headers=headers,
+            )
+            if resp.status_code == 304 and entry:
+                entry.fetched_at = time.monotonic()
+                return entry.definition
+            resp.raise_for_status()
+            definition = resp.json()
+        except (httpx.HTTPError, ValueError):  # ValueError: body is not JSON
+            if entry:
+                return entry.definition
+            raise
+
+        entry = CachedWorkflow(
+            definition=definition,
+            etag=resp.headers.get("ETag"),
+            fetched_at=time.monotonic(),
+        )
+        with self._lock:
+            self._entries[workflow_id] = entry
+        return entry.definition
+
+    def invalidate(self, workflow_id: str | None = None) -> None:
+        """Drop one cached workflow, or all of them."""
+        with self._lock:
+            if workflow_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(workflow_id, None)
+
+
+def schema_from_signature(func: Callable) -> dict[str, Any]:
+    """
+    Derive a JSON Schema for a tool's keyword arguments from its signature.
+
+    Parameters without a default are required, unknown arguments are
+    rejected, and simple annotations (str, int, float, bool, dict, list)
+    become type constraints.
+    """
+    hints = typing.get_type_hints(func)
+    properties: dict[str, Any] = {}
+    required: list[str] = []
+    for name, param in inspect.signature(func).parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        annotation = hints.get(name)
+        json_type = _JSON_TYPES.get(typing.get_origin(annotation) or annotation)
+        properties[name] = {"type": json_type} if json_type else {}
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": required,
+        "additionalProperties": False,
+    }
+
+
+def compile_validator(schema: dict[str, Any]) -> Callable[[dict[str, Any]], str | None]:
+    """
+    Compile a JSON Schema into a validator.
+
+    The returned callable returns ``None`` for valid input, or a short error
+    message. Compilation happens once; each call runs generated Python code.
+    """
+    validate = fastjsonschema.compile(schema)
+
+    def check(params: dict[str, Any]) -> str | None:
+        try:
+            validate(params)
+        except fastjsonschema.JsonSchemaValueException as exc:
+            return exc.message
+        return None
+
+    return check
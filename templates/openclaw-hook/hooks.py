@@ -2,25 +2,59 @@
 OpenClaw before_tool_call / after_tool_call hooks for Portarium integration.
 
 These hooks intercept tool invocations and route them through the Portarium
-control plane for policy evaluation and evidence capture.
+control plane for policy evaluation and evidence capture. Every call to
+Portarium is admitted through the governor's pools, so bursts of approval
+waits or a single busy agent cannot exhaust the gateway's workers.
 """
 
 import os
 import logging
 from typing import Any
 
+from portarium_governor import (
+    APPROVAL_WAIT,
+    EVALUATE,
+    EVIDENCE,
+    HIGH,
+    LOW,
+    AdmissionController,
+    GovernorConfig,
+    Overloaded,
+    PoolStats,
+)
 from portarium_policy import PortariumPolicyClient
 
 logger = logging.getLogger(__name__)
 
+
+def _tool_list(name: str) -> list[str]:
+    return [tool.strip() for tool in os.environ.get(name, "").split(",") if tool.strip()]
+
+
+# Admission control for all Portarium traffic (singleton per gateway process)
+_governor = AdmissionController(
+    GovernorConfig(
+        tool_priorities={
+            **{tool: LOW for tool in _tool_list("PORTARIUM_LOW_PRIORITY_TOOLS")},
+            **{tool: HIGH for tool in _tool_list("PORTARIUM_HIGH_PRIORITY_TOOLS")},
+        }
+    )
+)
+
 # Initialize the policy client (singleton per gateway process)
 _policy_client = PortariumPolicyClient(
     base_url=os.environ.get("PORTARIUM_BASE_URL", "http://localhost:3000"),
     token=os.environ["PORTARIUM_TOKEN"],
     workspace_id=os.environ["PORTARIUM_WORKSPACE_ID"],
+    max_connections=_governor.config.max_connections,
 )
 
 
+def governor_stats() -> dict[str, PoolStats]:
+    """Queue depths, in-flight calls and wait times per pool, for gateway metrics."""
+    return _governor.stats()
+
+
 def before_tool_call(
     tool_name: str,
     tool_args: dict[str, Any],
@@ -44,14 +78,22 @@ def before_tool_call(
         run_id,
     )
 
-    # Evaluate policy
-    result = _policy_client.evaluate_tool_call(
-        tool_name=tool_name,
-        tool_args=tool_args,
-        agent_id=agent_id,
-        run_id=run_id,
-        correlation_id=correlation_id,
-    )
+    # Evaluate policy. Without a verdict the call is denied, never allowed.
+    try:
+        with _governor.slot(EVALUATE, agent_id=agent_id, run_id=run_id, tool_name=tool_name):
+            result = _policy_client.evaluate_tool_call(
+                tool_name=tool_name,
+                tool_args=tool_args,
+                agent_id=agent_id,
+                run_id=run_id,
+                correlation_id=correlation_id,
+            )
+    except Overloaded as exc:
+        return {
+            "allow": False,
+            "reason": f"{exc}; retry {tool_name} later",
+            "modified_args": None,
+        }
 
     if result.decision == "Deny":
         logger.warning(
@@ -72,10 +114,18 @@ def before_tool_call(
             result.approval_id,
         )
         # Block until approval is granted (or timeout)
-        approved = _policy_client.wait_for_approval(
-            approval_id=result.approval_id,
-            timeout_seconds=300,
-        )
+        try:
+            with _governor.slot(APPROVAL_WAIT, agent_id=agent_id, run_id=run_id, tool_name=tool_name):
+                approved = _policy_client.wait_for_approval(
+                    approval_id=result.approval_id,
+                    timeout_seconds=300,
+                )
+        except Overloaded as exc:
+            return {
+                "allow": False,
+                "reason": f"{exc}; approval {result.approval_id} is still pending",
+                "modified_args": None,
+            }
         if not approved:
             return {
                 "allow": False,
@@ -112,13 +162,22 @@ def after_tool_call(
         run_id,
     )
 
-    _policy_client.record_evidence(
-        tool_name=tool_name,
-        tool_args=tool_args,
-        tool_result=tool_result if success else None,
-        agent_id=agent_id,
-        run_id=run_id,
-        success=success,
-        error=error,
-        correlation_id=correlation_id,
-    )
+    try:
+        with _governor.slot(EVIDENCE, agent_id=agent_id, run_id=run_id, tool_name=tool_name):
+            _policy_client.record_evidence(
+                tool_name=tool_name,
+                tool_args=tool_args,
+                tool_result=tool_result if success else None,
+                agent_id=agent_id,
+                run_id=run_id,
+                success=success,
+                error=error,
+                correlation_id=correlation_id,
+            )
+    except Overloaded as exc:
+        logger.error(
+            "Evidence NOT recorded: tool=%s run=%s reason=%s",
+            tool_name,
+            run_id,
+            exc,
+        )
@@ -0,0 +1,255 @@
+"""
+Admission control for the gateway's traffic to Portarium.
+
+Hook calls are sorted into three pools, each with its own concurrency limit,
+so a wave of approval waits cannot starve policy evaluation and evidence
+recording of workers and HTTP connections:
+
+- ``evaluate``: policy evaluation in ``before_tool_call``
+- ``approval_wait``: polling for a ``HumanApprove`` decision
+- ``evidence``: evidence recording in ``after_tool_call``
+
+Within a pool, each agent and each run may only hold a quota of the slots.
+When a slot frees up, it goes to the highest-priority waiter that fits its
+quotas, and among equals to the agent served least recently, so one runaway
+agent queues behind everyone else instead of taking the whole pool. Full
+queues shed load: low-priority tools first, then everything.
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+EVALUATE = "evaluate"
+APPROVAL_WAIT = "approval_wait"
+EVIDENCE = "evidence"
+
+LOW = 0
+NORMAL = 1
+HIGH = 2
+
+
+class Overloaded(Exception):
+    """Raised when a call is shed or times out waiting for a slot."""
+
+    def __init__(self, pool: str, reason: str) -> None:
+        super().__init__(f"Portarium {pool} capacity exhausted: {reason}")
+        self.pool = pool
+        self.reason = reason
+
+
+@dataclass
+class PoolConfig:
+    max_concurrent: int  # calls in flight at once
+    per_agent: int  # of those, at most this many for one agent
+    per_run: int  # ... and for one run
+    max_queue: int = 256  # waiting calls before everything is shed
+    max_queue_per_agent: int = 32  # waiting calls per agent before that agent is shed
+    shed_low_priority_at: int | None = 64  # queue depth at which low-priority tools are shed
+    wait_timeout_seconds: float = 10.0  # longest wait for a slot
+
+
+@dataclass
+class GovernorConfig:
+    pools: dict[str, PoolConfig] = field(default_factory=lambda: {
+        EVALUATE: PoolConfig(max_concurrent=32, per_agent=8, per_run=4),
+        # Approval waits are long and cheap to hold, but each one pins a gateway worker.
+        APPROVAL_WAIT: PoolConfig(max_concurrent=64, per_agent=8, per_run=2, shed_low_priority_at=16,
+                                  wait_timeout_seconds=5.0),
+        # Evidence is the audit trail: never shed by priority, wait longer for a slot.
+        EVIDENCE: PoolConfig(max_concurrent=16, per_agent=4, per_run=4, max_queue=1024,
+                             max_queue_per_agent=256, shed_low_priority_at=None, wait_timeout_seconds=30.0),
+    })
+    tool_priorities: dict[str, int] = field(default_factory=dict)  # tool name -> LOW / NORMAL / HIGH
+    default_priority: int = NORMAL
+
+    @property
+    def max_connections(self) -> int:
+        """HTTP connections needed for every pool to run at its limit."""
+        return sum(pool.max_concurrent for pool in self.pools.values())
+
+
+@dataclass
+class PoolStats:
+    in_flight: int = 0
+    queue_depth: int = 0
+    admitted: int = 0
+    shed: int = 0
+    timed_out: int = 0
+    wait_p50_ms: float | None = None
+    wait_p99_ms: float | None = None
+    wait_max_ms: float | None = None
+    by_agent: dict[str, int] = field(default_factory=dict)  # in flight + queued
+
+
+class _Waiter:
+    __slots__ = ("agent_id", "run_id", "priority", "enqueued_at", "granted")
+
+    def __init__(self, agent_id: str, run_id: str, priority: int) -> None:
+        self.agent_id = agent_id
+        self.run_id = run_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class _Pool:
+    def __init__(self, name: str, config: PoolConfig) -> None:
+        self.name = name
+        self.config = config
+        self.cond = threading.Condition()
+        self.waiters: list[_Waiter] = []
+        self.in_flight = 0
+        self.by_agent: dict[str, int] = {}
+        self.by_run: dict[str, int] = {}
+        self.queued_by_agent: dict[str, int] = {}
+        self.last_served: dict[str, float] = {}
+        self.stats = PoolStats()
+        self.waits: deque[float] = deque(maxlen=2048)
+
+    def _fits(self, waiter: _Waiter) -> bool:
+        return (
+            self.by_agent.get(waiter.agent_id, 0) < self.config.per_agent
+            and self.by_run.get(waiter.run_id, 0) < self.config.per_run
+        )
+
+    def _grant(self, agent_id: str, run_id: str) -> None:
+        self.in_flight += 1
+        self.by_agent[agent_id] = self.by_agent.get(agent_id, 0) + 1
+        self.by_run[run_id] = self.by_run.get(run_id, 0) + 1
+        self.last_served[agent_id] = time.monotonic()
+        self.stats.admitted += 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters; callers hold the lock."""
+        granted = False
+        while self.in_flight < self.config.max_concurrent:
+            eligible = [w for w in self.waiters if self._fits(w)]
+            if not eligible:
+                break
+            waiter = min(
+                eligible,
+                key=lambda w: (-w.priority, self.last_served.get(w.agent_id, 0.0), w.enqueued_at),
+            )
+            self._dequeue(waiter)
+            waiter.granted = True
+            self._grant(waiter.agent_id, waiter.run_id)
+            granted = True
+        if granted:
+            self.cond.notify_all()
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        self.waiters.remove(waiter)
+        left = self.queued_by_agent[waiter.agent_id] - 1
+        if left:
+            self.queued_by_agent[waiter.agent_id] = left
+        else:
+            del self.queued_by_agent[waiter.agent_id]
+        self.waits.append(time.monotonic() - waiter.enqueued_at)
+
+    def _shed(self, reason: str) -> Overloaded:
+        self.stats.shed += 1
+        if self.stats.shed % 100 == 1:  # one line per hundred, not a log storm
+            logger.warning("Shedding Portarium %s calls (%d so far): %s", self.name, self.stats.shed, reason)
+        return Overloaded(self.name, reason)
+
+    def acquire(self, agent_id: str, run_id: str, priority: int) -> None:
+        config = self.config
+        with self.cond:
+            if not self.waiters and self.in_flight < config.max_concurrent:
+                waiter = _Waiter(agent_id, run_id, priority)
+                if self._fits(waiter):
+                    self._grant(agent_id, run_id)
+                    self.waits.append(0.0)
+                    return
+            depth = len(self.waiters)
+            if depth >= config.max_queue:
+                raise self._shed(f"{depth} calls queued")
+            if self.queued_by_agent.get(agent_id, 0) >= config.max_queue_per_agent:
+                raise self._shed(f"agent {agent_id} has {config.max_queue_per_agent} calls queued")
+            if priority <= LOW and config.shed_low_priority_at is not None and depth >= config.shed_low_priority_at:
+                raise self._shed(f"{depth} calls queued; low-priority tools are shed")
+            waiter = _Waiter(agent_id, run_id, priority)
+            self.waiters.append(waiter)
+            self.queued_by_agent[agent_id] = self.queued_by_agent.get(agent_id, 0) + 1
+            self._dispatch()
+            deadline = waiter.enqueued_at + config.wait_timeout_seconds
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._dequeue(waiter)
+                    self.stats.timed_out += 1
+                    raise Overloaded(self.name, f"no slot within {config.wait_timeout_seconds:g}s")
+                self.cond.wait(remaining)
+
+    def release(self, agent_id: str, run_id: str) -> None:
+        with self.cond:
+            self.in_flight -= 1
+            for counts, key in ((self.by_agent, agent_id), (self.by_run, run_id)):
+                left = counts[key] - 1
+                if left:
+                    counts[key] = left
+                else:
+                    del counts[key]
+            if agent_id not in self.by_agent and agent_id not in self.queued_by_agent:
+                self.last_served.pop(agent_id, None)  # keep memory bounded by active agents
+            self._dispatch()
+
+    def snapshot(self) -> PoolStats:
+        with self.cond:
+            waits = sorted(self.waits)
+            by_agent = dict(self.by_agent)
+            for agent_id, queued in self.queued_by_agent.items():
+                by_agent[agent_id] = by_agent.get(agent_id, 0) + queued
+
+            def pct(p: float) -> float | None:
+                if not waits:
+                    return None
+                return round(waits[min(int(len(waits) * p / 100), len(waits) - 1)] * 1000, 2)
+
+            return PoolStats(
+                in_flight=self.in_flight,
+                queue_depth=len(self.waiters),
+                admitted=self.stats.admitted,
+                shed=self.stats.shed,
+                timed_out=self.stats.timed_out,
+                wait_p50_ms=pct(50),
+                wait_p99_ms=pct(99),
+                wait_max_ms=pct(100),
+                by_agent=by_agent,
+            )
+
+
+class AdmissionController:
+    """Per-pool concurrency limits with agent/run quotas and load shedding."""
+
+    def __init__(self, config: GovernorConfig | None = None) -> None:
+        self.config = config or GovernorConfig()
+        self._pools = {name: _Pool(name, pool) for name, pool in self.config.pools.items()}
+
+    def priority(self, tool_name: str) -> int:
+        return self.config.tool_priorities.get(tool_name, self.config.default_priority)
+
+    @contextmanager
+    def slot(self, pool: str, *, agent_id: str, run_id: str, tool_name: str = "") -> Iterator[None]:
+        """Hold a slot in ``pool`` for the duration of the block.
+
+        Raises:
+            Overloaded: The call was shed, or no slot freed up in time.
+        """
+        target = self._pools[pool]
+        target.acquire(agent_id, run_id, self.priority(tool_name))
+        try:
+            yield
+        finally:
+            target.release(agent_id, run_id)
+
+    def stats(self) -> dict[str, PoolStats]:
+        """Queue depth, in-flight calls and wait times per pool."""
+        return {name: pool.snapshot() for name, pool in self._pools.items()}
@@ -22,7 +22,7 @@ class PolicyResult:
 class PortariumPolicyClient:
     """Client for Portarium policy evaluation and evidence recording."""
 
-    def __init__(self, base_url: str, token: str, workspace_id: str) -> None:
+    def __init__(self, base_url: str, token: str, workspace_id: str, max_connections: int = 100) -> None:
         self._base_url = base_url.rstrip("/")
         self._workspace_id = workspace_id
         self._http = httpx.Client(
@@ -33,6 +33,8 @@ class PortariumPolicyClient:
                 "Content-Type": "application/json",
             },
             timeout=30.0,
+            # Sized to the governor's pools, so admitted calls never queue for a connection.
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
         )
 
     def evaluate_tool_call(